@@ -0,0 +1,41 @@
+"""
+Latency of autocomplete suggestions and of recording a query, on an index built
+from a synthetic query log.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_autocomplete [--phrases 100000]
+"""
+
+import sys
+import time
+import random
+import argparse
+from src.autocomplete import PrefixIndex
+from benchmarks.fakes import WORDS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phrases", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    phrases = [" ".join(rng.choices(WORDS, k=rng.randint(1, 4))) for _ in range(args.phrases)]
+    index = PrefixIndex()
+    startTime = time.perf_counter()
+    for phrase in phrases:
+        index.add(phrase)
+    addTime = (time.perf_counter() - startTime) / len(phrases)
+
+    # Every prefix a user typing the phrase would send
+    prefixes = [phrase[:rng.randint(1, len(phrase))] for phrase in rng.choices(phrases, k=args.lookups)]
+    startTime = time.perf_counter()
+    for prefix in prefixes:
+        index.suggest(prefix)
+    suggestTime = (time.perf_counter() - startTime) / len(prefixes)
+
+    print(f"phrases: {len(index)}  add: {addTime * 1e6:.1f}us  suggest: {suggestTime * 1e6:.2f}us")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
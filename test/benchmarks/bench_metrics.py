@@ -0,0 +1,67 @@
+"""
+Overhead of the latency instrumentation (src.metrics): the cost of one span, one
+timed() block, one observe() and one whole Trace, measured against an empty loop.
+Pass --max-span-us to use it as a regression guard; the exit status is 1 if a span
+costs more.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_metrics [--iterations 200000] [--max-span-us 3]
+"""
+
+import sys
+import time
+import argparse
+from src.metrics import MetricsRegistry, Trace, setMetrics, timed, observe
+
+def perIteration(body, iterations):
+    startTime = time.perf_counter()
+    body(iterations)
+    return (time.perf_counter() - startTime) / iterations
+
+def emptyLoop(iterations):
+    for _ in range(iterations):
+        pass
+
+def spanLoop(iterations):
+    trace = Trace("bench", profile=False)
+    for _ in range(iterations):
+        with trace.span("parse"):
+            pass
+
+def timedLoop(iterations):
+    for _ in range(iterations):
+        with timed("mongo"):
+            pass
+
+def observeLoop(iterations):
+    for _ in range(iterations):
+        observe("rank", 0.001)
+
+def traceLoop(iterations):
+    for _ in range(iterations):
+        trace = Trace("bench", profile=False)
+        with trace.span("parse"):
+            pass
+        trace.finish()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--max-span-us", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    setMetrics(MetricsRegistry())
+    baseline = perIteration(emptyLoop, args.iterations)
+    results = {}
+    for name, body in [("span", spanLoop), ("timed", timedLoop), ("observe", observeLoop),
+                       ("trace + span", traceLoop)]:
+        results[name] = max(perIteration(body, args.iterations) - baseline, 0.0)
+        print(f"{name:<14} {results[name] * 1e6:6.3f}us")
+
+    if args.max_span_us is not None and results["span"] * 1e6 > args.max_span_us:
+        print(f"FAIL: a span costs {results['span'] * 1e6:.3f}us (limit {args.max_span_us}us)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Offline benchmark suite for the search pipeline. Seeds an in-memory document store
+(mongomock) with a synthetic corpus, ranks through a local fake ranking HTTP server
+(or the in-process fake), and measures throughput and latency of each stage under
+concurrency:
+
+    parseSearchQuery   query normalization
+    generateSnippet    best-sentence snippet of one document
+    generatePassage    highlighted passage of one document
+    getDocuments       one document store lookup, with the hot document cache off
+    getDocuments (hot cache)
+                       one lookup of a document held in the hot document cache
+    retrieveDocuments  one page, fetched in concurrent $in batches
+    queue              receiveQuery() to getQueryResult() through the worker pool
+
+Unless --cached is given, the result cache and the hot document cache are off outside
+the hot cache scenario, so every call does the work it measures. Results are printed
+and can be written as JSON. Given a baseline from an earlier run,
+the exit status is 1 if any scenario's p50 latency or throughput regressed by more
+than the tolerance.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_pipeline [--documents 2000] [--sentences 20]
+        [--concurrency 8] [--iterations 2000] [--ranking http|inprocess]
+        [--ranking-latency 0] [--cached] [--output results.json]
+        [--baseline baseline.json --tolerance 0.2] [--scenarios queue,getDocuments]
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from src import api, documentStore
+from src.api import parseSearchQuery, retrieveDocuments
+from src.snippetEngine import generateSnippet, generatePassage
+from src.documentStore import getDocuments
+from src.rankingClient import RankingClient, setRankingClient
+from src.resultCache import ResultCache
+from benchmarks.fakes import WORDS, makeCorpus, SampledRankingClient, FakeRankingServer
+from pipelineFixtures import installDocuments
+
+TEMPLATES = ["{0}", "{0} {1}", "Where is the {0} {1}?", "{0} {1} {2}", "How do I find {0} {1} hours?",
+             "{0}, {1} and {2}"]
+
+"""
+    Generates realistic raw queries from the corpus vocabulary.
+"""
+def makeQueries(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(*rng.choices(WORDS, k=3)) for _ in range(count)]
+
+"""
+    Runs operation over inputs from concurrency threads and measures each call.
+
+    Returns:
+        result (dict): ops, throughput (ops/s) and mean/p50/p95/p99 latency in ms.
+"""
+def runScenario(operation, inputs, concurrency, iterations, warmup=20):
+    for item in inputs[:warmup]:
+        operation(item)
+
+    def worker(offset):
+        latencies = []
+        for i in range(offset, iterations, concurrency):
+            startTime = time.perf_counter()
+            operation(inputs[i % len(inputs)])
+            latencies.append(time.perf_counter() - startTime)
+        return latencies
+
+    startTime = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [latency for result in pool.map(worker, range(concurrency)) for latency in result]
+    elapsed = time.perf_counter() - startTime
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "ops": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "mean": statistics.fmean(latencies) * 1000,
+        "p50": percentiles[49] * 1000,
+        "p95": percentiles[94] * 1000,
+        "p99": percentiles[98] * 1000,
+    }
+
+HOT_CACHE_SCENARIO = "getDocuments (hot cache)"
+
+"""
+    Runs the block with a fresh hot document cache, or with none if enabled is False.
+"""
+@contextmanager
+def hotDocumentCache(enabled):
+    cacheBytes = documentStore.HOT_DOCUMENT_CACHE_BYTES
+    if not enabled:
+        documentStore.HOT_DOCUMENT_CACHE_BYTES = 0
+    documentStore.setDocumentCache(None)
+    try:
+        yield
+    finally:
+        documentStore.HOT_DOCUMENT_CACHE_BYTES = cacheBytes
+        documentStore.setDocumentCache(None)
+
+def buildScenarios(documents, queries, pageSize=10, seed=0):
+    rng = random.Random(seed)
+    docIds = [document["_id"] for document in documents]
+    tokenized = [parseSearchQuery(query) for query in queries]
+    snippetInputs = [(rng.choice(documents)["text"], tokens) for tokens in tokenized]
+    pages = [rng.sample(docIds, min(pageSize, len(docIds))) for _ in range(len(queries))]
+    # Few enough for runScenario's warmup to load them all into the cache
+    hotDocIds = rng.sample(docIds, min(20, len(docIds)))
+
+    def queuedQuery(item):
+        userId, query = item
+        ticketId = api.receiveQuery(query, userId)
+        if not ticketId:
+            raise RuntimeError("query was rejected by the processing queue")
+        api.getQueryResult(ticketId, timeout=60)
+
+    # Spread queue clients over users so per-user fairness limits don't reject them
+    users = [(f"user{i % 64}", query) for i, query in enumerate(queries)]
+    return {
+        "parseSearchQuery": (parseSearchQuery, queries),
+        "generateSnippet": (lambda item: generateSnippet(*item), snippetInputs),
+        "generatePassage": (lambda item: generatePassage(*item), snippetInputs),
+        "getDocuments": (getDocuments, docIds),
+        HOT_CACHE_SCENARIO: (getDocuments, hotDocIds),
+        "retrieveDocuments": (retrieveDocuments, pages),
+        "queue": (queuedQuery, users),
+    }
+
+"""
+    Compares results with a baseline run.
+
+    Returns:
+        regressions (list): Messages for scenarios whose p50 latency rose or throughput
+        fell by more than tolerance (a fraction).
+"""
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        if result["p50"] > before["p50"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50']:.3f}ms -> {result['p50']:.3f}ms")
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']:.1f} -> {result['throughput']:.1f} ops/s")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--sentences", type=int, default=20, help="sentences per document")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per scenario")
+    parser.add_argument("--ranking", choices=["http", "inprocess"], default="http")
+    parser.add_argument("--ranking-latency", type=float, default=0.0, help="seconds per ranking call")
+    parser.add_argument("--cached", action="store_true",
+                        help="keep the result and hot document caches on in every scenario")
+    parser.add_argument("--scenarios", default=None, help="comma-separated subset to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    documents = makeCorpus(args.documents, args.sentences, seed=args.seed)
+    docIds = [document["_id"] for document in documents]
+    installDocuments(documents)
+    server = None
+    if args.ranking == "http":
+        server = FakeRankingServer(docIds, latency=args.ranking_latency).start()
+        setRankingClient(RankingClient(server.url, poolSize=max(args.concurrency, 8)))
+    else:
+        setRankingClient(SampledRankingClient(docIds))
+    # Expired on arrival unless --cached, so every queued query runs the whole pipeline
+    originalCache = api.resultCache
+    api.resultCache = ResultCache() if args.cached else ResultCache(rankingTtl=0, cacheDocuments=False)
+
+    scenarios = buildScenarios(documents, makeQueries(args.queries, args.seed), seed=args.seed)
+    if args.scenarios:
+        scenarios = {name: scenarios[name] for name in args.scenarios.split(",")}
+
+    results = {}
+    try:
+        api.processQueue()
+        for name, (operation, inputs) in scenarios.items():
+            with hotDocumentCache(args.cached or name == HOT_CACHE_SCENARIO):
+                results[name] = runScenario(operation, inputs, args.concurrency, args.iterations)
+            result = results[name]
+            print(f"{name:<24} {result['throughput']:10.1f} ops/s  mean={result['mean']:8.3f}ms  "
+                  f"p50={result['p50']:8.3f}ms  p95={result['p95']:8.3f}ms  p99={result['p99']:8.3f}ms")
+    finally:
+        api.processingQueue.shutdown()
+        api.resultCache = originalCache
+        setRankingClient(None)
+        if server is not None:
+            server.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
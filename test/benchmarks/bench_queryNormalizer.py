@@ -0,0 +1,91 @@
+"""
+Micro-benchmark for query parsing and snippet generation before/after the shared
+QueryNormalizer. The "before" functions are the original implementations, which
+rebuilt the stopword set and the PorterStemmer on every call. The parseSearchQueries
+row compares a replayed query log parsed one query at a time and as one batch.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_queryNormalizer
+"""
+
+import timeit
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+from src.api import parseSearchQuery, parseSearchQueries
+from src.snippetEngine import generateSnippet
+
+QUERIES = [
+    "Where is DCC?",
+    "I can't find West Hall.",
+    "Professor Goldschmidt OFfice hours",
+    "computer science course registration deadlines",
+    "dining hall hours on weekends",
+]
+
+DOCUMENT = " ".join([
+    "Darrin Communications Center (DCC) is located on the academic campus.",
+    "Office hours for computer science professors are posted on the department website.",
+    "West Hall houses the School of Humanities, Arts, and Social Sciences.",
+    "Course registration for the spring semester opens in November.",
+    "The dining halls are open on weekends with reduced hours.",
+] * 20)
+
+def parseSearchQueryBefore(query):
+    tokens = nltk.word_tokenize(query)
+    tokens = [word.lower() for word in tokens if word.isalnum()]
+    stopWords = set(stopwords.words('english'))
+    tokens = [word for word in tokens if word not in stopWords]
+    stemmer = PorterStemmer()
+    return [stemmer.stem(word) for word in tokens]
+
+def generateSnippetBefore(documentContent, tokenizedQuery):
+    snippet = ""
+    maxWordCount = 0
+    for sentence in nltk.sent_tokenize(documentContent):
+        wordCount = 0
+        words = nltk.word_tokenize(sentence)
+        words = [word.lower() for word in words if word.isalnum()]
+        stemmer = PorterStemmer()
+        words = [stemmer.stem(word) for word in words]
+        for queryWord in tokenizedQuery:
+            for docWord in words:
+                if queryWord == docWord:
+                    wordCount = wordCount + 1
+        if wordCount > maxWordCount:
+            snippet = sentence
+            maxWordCount = wordCount
+    return snippet
+
+def perCall(function, repeat, number):
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+def main():
+    tokenized = [parseSearchQuery(query) for query in QUERIES]
+    for before, after in zip(map(parseSearchQueryBefore, QUERIES), tokenized):
+        assert before == after
+    # Query logs repeat popular queries; 100 distinct queries, each seen 10 times
+    replayLog = [f"{query} {i}" for i in range(20) for query in QUERIES] * 10
+    assert parseSearchQueries(replayLog) == [parseSearchQuery(query) for query in replayLog]
+
+    results = {
+        "parseSearchQuery": (
+            perCall(lambda: [parseSearchQueryBefore(query) for query in QUERIES], 5, 20) / len(QUERIES),
+            perCall(lambda: [parseSearchQuery(query) for query in QUERIES], 5, 20) / len(QUERIES),
+        ),
+        "generateSnippet": (
+            perCall(lambda: [generateSnippetBefore(DOCUMENT, tokens) for tokens in tokenized], 3, 2) / len(QUERIES),
+            perCall(lambda: [generateSnippet(DOCUMENT, tokens) for tokens in tokenized], 3, 2) / len(QUERIES),
+        ),
+        "parseSearchQueries": (
+            perCall(lambda: [parseSearchQuery(query) for query in replayLog], 3, 1) / len(replayLog),
+            perCall(lambda: parseSearchQueries(replayLog), 3, 1) / len(replayLog),
+        ),
+    }
+
+    print(f"{'function':<20}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, (before, after) in results.items():
+        print(f"{name:<20}{before * 1e6:>14.1f}{after * 1e6:>14.1f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Multi-core scaling of the CPU-bound query work: parsing a query and building the
+snippets of one page of results, in 1 to N pre-forked worker processes (see
+src.server). The corpus and the NLP state are loaded once in the parent and shared
+copy-on-write, as when serving. For each process count, every worker answers queries
+for a fixed time and reports how many it answered and its memory: private (USS) and
+proportional (PSS) kilobytes, from /proc/self/smaps_rollup. Throughput should grow
+close to linearly up to the number of cores while private memory per worker stays flat.
+
+Pass --min-efficiency to use it as a regression guard; the exit status is 1 if the
+throughput per process at the largest count falls below that fraction of the
+single-process throughput.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_scaling [--processes 1,2,4,8] [--seconds 3]
+        [--documents 500] [--page-size 10] [--output scaling.json] [--min-efficiency 0.7]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from src import server
+from src.queryModel import parseQuery, queryTerms
+from src.snippetEngine import generatePassage
+from benchmarks.fakes import makeCorpus
+from benchmarks.bench_pipeline import makeQueries
+
+def memoryKb():
+    try:
+        with open("/proc/self/smaps_rollup") as file:
+            fields = dict(line.split()[:2] for line in file if line.split()[0].endswith(":"))
+        private = int(fields["Private_Clean:"]) + int(fields["Private_Dirty:"])
+        return {"ussKb": private, "pssKb": int(fields["Pss:"]), "rssKb": int(fields["Rss:"])}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+"""
+    Worker body: answers queries against the shared corpus until seconds have passed and
+    writes its count and memory to writer.
+"""
+def queryWorker(index, writer, corpus, queries, pageSize, seconds):
+    rng = random.Random(index)
+    answered = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        tokens = queryTerms(parseQuery(rng.choice(queries)))
+        start = rng.randrange(len(corpus) - pageSize)
+        for document in corpus[start:start + pageSize]:
+            generatePassage(document["text"], tokens)
+        answered += 1
+    report = {"index": index, "queries": answered}
+    report.update(memoryKb())
+    os.write(writer, (json.dumps(report) + "\n").encode())
+
+def runCount(processes, corpus, queries, pageSize, seconds):
+    reader, writer = os.pipe()
+    startTime = time.perf_counter()
+    statuses = server.superviseWorkers(processes, queryWorker, writer, corpus, queries, pageSize, seconds,
+                                       restart=False)
+    elapsed = time.perf_counter() - startTime
+    os.close(writer)
+    with os.fdopen(reader) as output:
+        reports = [json.loads(line) for line in output]
+    if len(reports) != processes or any(statuses.values()):
+        raise RuntimeError(f"{processes - len(reports)} of {processes} worker(s) failed")
+
+    total = sum(report["queries"] for report in reports)
+    result = {"processes": processes, "queries": total, "throughput": total / elapsed}
+    if all("ussKb" in report for report in reports):
+        result["ussKbPerWorker"] = sum(report["ussKb"] for report in reports) / processes
+        result["pssKbPerWorker"] = sum(report["pssKb"] for report in reports) / processes
+        result["rssKbPerWorker"] = sum(report["rssKb"] for report in reports) / processes
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", default=None,
+                        help="comma-separated process counts; defaults to powers of 2 up to the core count")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--min-efficiency", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    if args.processes:
+        counts = [int(count) for count in args.processes.split(",")]
+    else:
+        counts = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    corpus = makeCorpus(args.documents, args.sentences)
+    queries = makeQueries(1000)
+    print(f"Preloaded: {server.preloadSharedState(warmStems=False)}")
+    print(f"{'processes':>9} {'queries/s':>10} {'speedup':>8} {'efficiency':>10} {'USS MB':>8} {'PSS MB':>8}")
+
+    results = []
+    for count in counts:
+        result = runCount(count, corpus, queries, args.page_size, args.seconds)
+        single = results[0]["throughput"] / results[0]["processes"] if results else result["throughput"] / count
+        result["speedup"] = result["throughput"] / single
+        result["efficiency"] = result["speedup"] / count
+        results.append(result)
+        print(f"{count:>9} {result['throughput']:>10.1f} {result['speedup']:>8.2f} {result['efficiency']:>10.2f} "
+              f"{result.get('ussKbPerWorker', 0) / 1024:>8.1f} {result.get('pssKbPerWorker', 0) / 1024:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"python": platform.python_version(), "cores": cores, "results": results}, file, indent=2)
+
+    if args.min_efficiency is not None and results[-1]["efficiency"] < args.min_efficiency:
+        print(f"FAIL: efficiency {results[-1]['efficiency']:.2f} at {results[-1]['processes']} processes "
+              f"(limit {args.min_efficiency})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Benchmark for the /search endpoint through FastAPI's in-process test client, with a
+mongomock document store and an in-process ranking fake.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_searchEndpoint
+"""
+
+import time
+import statistics
+from fastapi.testclient import TestClient
+from src import api
+from src.rankingClient import setRankingClient
+from benchmarks.fakes import makeCorpus, SampledRankingClient
+from pipelineFixtures import installDocuments
+
+QUERIES = ["library hours", "computer science office", "parking map", "dining hall events",
+           "course registration semester"]
+
+def main(numDocuments=2000, rounds=20):
+    documents = makeCorpus(numDocuments)
+    installDocuments(documents)
+    setRankingClient(SampledRankingClient([document["_id"] for document in documents]))
+    client = TestClient(api.api)
+
+    latencies = []
+    startTime = time.perf_counter()
+    for _ in range(rounds):
+        # Clear the cache so every request runs the whole pipeline
+        api.resultCache.clear()
+        for query in QUERIES:
+            requestStart = time.perf_counter()
+            response = client.get("/search", params={"q": query})
+            assert response.status_code == 200
+            latencies.append(time.perf_counter() - requestStart)
+    elapsed = time.perf_counter() - startTime
+
+    print(f"requests: {len(latencies)}  throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50={statistics.median(latencies) * 1000:.2f}ms  "
+          f"p95={statistics.quantiles(latencies, n=20)[-1] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
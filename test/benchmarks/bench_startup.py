@@ -0,0 +1,59 @@
+"""
+Import-time and memory benchmark for the query pipeline. Each measurement runs in a
+fresh interpreter and reports wall time and peak RSS. Pass limits to use it as a
+regression guard; the exit status is 1 if any limit is exceeded.
+
+Run from the test/ directory:
+    python -m benchmarks.bench_startup [--runs 5] [--max-import-ms 1500] [--max-rss-mb 150]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+SCENARIOS = {
+    # Importing the module, as every worker, test process and CLI invocation does
+    "import": "import src.api",
+    # Import plus the first query, which loads the NLTK backends on demand
+    "first query": "import src.api; src.api.parseSearchQuery('Where is DCC?')",
+}
+
+def measure(code):
+    startTime = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=os.getcwd())
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - startTime
+    if status != 0:
+        raise RuntimeError(f"benchmark process failed: {code}")
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        samples = [measure(code) for _ in range(args.runs)]
+        results[name] = (statistics.median(elapsed for elapsed, _ in samples),
+                         max(rss for _, rss in samples))
+        print(f"{name:<12} time p50={results[name][0] * 1000:8.1f}ms  peak RSS={results[name][1]:7.1f}MB")
+
+    failed = False
+    importTime, importRss = results["import"]
+    if args.max_import_ms is not None and importTime * 1000 > args.max_import_ms:
+        print(f"FAIL: import took {importTime * 1000:.1f}ms (limit {args.max_import_ms}ms)")
+        failed = True
+    if args.max_rss_mb is not None and importRss > args.max_rss_mb:
+        print(f"FAIL: import peak RSS {importRss:.1f}MB (limit {args.max_rss_mb}MB)")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
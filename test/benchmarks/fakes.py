@@ -0,0 +1,121 @@
+"""
+A synthetic corpus and local stand-ins for the Index/Ranking service, used by the
+benchmarks so they can run offline. The document store is seeded with
+pipelineFixtures.installDocuments, as in the tests.
+"""
+
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from src.rankingClient import ScoredDocument
+from pipelineFixtures import FakeRankingClient
+
+WORDS = ("campus student library union dining hall course professor office hours "
+         "research lab computer science engineering registration semester building "
+         "map parking shuttle housing athletics gym events club tuition advising").split()
+
+"""
+    Generates a synthetic corpus with random text drawn from a small campus vocabulary.
+
+    Args:
+        numDocuments (int): Number of documents.
+        sentencesPerDocument (int): Sentences per document.
+        seed (int): Random seed, so runs are reproducible.
+
+    Returns:
+        documents (list): Documents shaped like the RAW collection.
+"""
+def makeCorpus(numDocuments=1000, sentencesPerDocument=20, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for i in range(numDocuments):
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(6, 18))).capitalize() + "."
+                     for _ in range(sentencesPerDocument)]
+        text = " ".join(sentences)
+        documents.append({
+            "_id": f"doc{i:06d}",
+            "url": f"https://rpi.edu/page/{i}",
+            "title": " ".join(rng.choices(WORDS, k=3)).title(),
+            "type": "html" if i % 2 else "txt",
+            "text": text,
+            "text_length": len(text),
+        })
+    return documents
+
+"""
+    In-process ranking client: returns a deterministic pseudo-random top-K for each
+    query, drawn from the corpus IDs.
+"""
+class SampledRankingClient(FakeRankingClient):
+    def __init__(self, docIds, resultsPerQuery=10):
+        super().__init__(docIds)
+        self.resultsPerQuery = resultsPerQuery
+
+    def getDocumentScores(self, userId, query):
+        if not query:
+            return []
+        rng = random.Random(query)
+        chosen = rng.sample(self.docIds, min(self.resultsPerQuery, len(self.docIds)))
+        return [ScoredDocument(docId, float(self.resultsPerQuery - rank)) for rank, docId in enumerate(chosen)]
+
+"""
+    Local HTTP stand-in for the Index/Ranking service, so the benchmarks exercise the
+    real RankingClient (connection pool, JSON decoding) without the RPI host. Answers
+    GET /getDocumentScores like SampledRankingClient, after an optional delay.
+
+    Args:
+        docIds (list): Corpus IDs to rank.
+        resultsPerQuery (int): Results per query.
+        latency (float): Seconds to wait before answering, to model the network and
+        the ranking service's own work.
+"""
+class FakeRankingServer:
+    def __init__(self, docIds, resultsPerQuery=10, latency=0.0):
+        self.ranker = SampledRankingClient(docIds, resultsPerQuery)
+        self.latency = latency
+        self.server = None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                scores = fake.ranker.getDocumentScores(params.get("id", [None])[0], params.get("text", [""])[0])
+                payload = json.dumps([[scored.docId, scored.score] for scored in scores]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="fake-ranking").start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
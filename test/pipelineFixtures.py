@@ -0,0 +1,68 @@
+import time
+import unittest
+import mongomock
+from src import api, documentStore
+from src.rankingClient import ScoredDocument, setRankingClient
+from src.resultCache import ResultCache
+
+"""
+    Ranking client stand-in that ranks the given document IDs, in order, for every query
+    with one of terms (every query if terms is None) and ranks nothing for the rest.
+"""
+class FakeRankingClient:
+    def __init__(self, docIds, terms=None):
+        self.docIds = list(docIds)
+        self.terms = set(terms) if terms is not None else None
+
+    def getDocumentScores(self, userId, query):
+        if self.terms is not None and not self.terms & set(query.split()):
+            return []
+        return [ScoredDocument(docId, float(len(self.docIds) - rank)) for rank, docId in enumerate(self.docIds)]
+
+    def close(self):
+        pass
+
+"""
+    Seeds an in-memory document store (mongomock) with documents and installs it.
+
+    Returns:
+        client (mongomock.MongoClient): The installed client.
+"""
+def installDocuments(documents):
+    client = mongomock.MongoClient()
+    collection = client[documentStore.MONGO_DATABASE][documentStore.MONGO_COLLECTION]
+    if documents:
+        collection.insert_many([dict(document) for document in documents])
+    documentStore.setClient(client)
+    return client
+
+"""
+    Base class for tests that run queries through the pipeline: each test gets the
+    class's documents in a fresh document store, a ranking client that ranks them in
+    order (or rankedIds, if set), and an empty result cache. All are put back in
+    tearDown, once background prefetches are done with them.
+
+    Attributes:
+        documents (list): Documents to seed the store with.
+        rankedIds (list): Ranking for every query; None ranks all documents in order.
+        rankedTerms (set): Query terms that get the ranking; None ranks every query.
+"""
+class PipelineTestCase(unittest.TestCase):
+    documents = []
+    rankedIds = None
+    rankedTerms = None
+
+    def setUp(self):
+        installDocuments(self.documents)
+        rankedIds = self.rankedIds if self.rankedIds is not None else [document["_id"] for document in self.documents]
+        setRankingClient(FakeRankingClient(rankedIds, self.rankedTerms))
+        self.originalCache, api.resultCache = api.resultCache, ResultCache()
+
+    def tearDown(self):
+        # Let background prefetches finish before their store and cache go away
+        waitUntil = time.monotonic() + 2.0
+        while api._prefetching and time.monotonic() < waitUntil:
+            time.sleep(0.01)
+        api.resultCache = self.originalCache
+        setRankingClient(None)
+        documentStore.closeClient()
@@ -0,0 +1,207 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+from src.queryModel import parseQuery, queryTerms
+
+# Sustained queries per second and burst allowed per user
+USER_RATE_LIMIT = float(os.environ.get("USER_RATE_LIMIT", "5"))
+USER_BURST = float(os.environ.get("USER_BURST", "20"))
+# Users whose bucket is remembered; the least recently seen are forgotten first
+MAX_TRACKED_USERS = int(os.environ.get("MAX_TRACKED_USERS", "100000"))
+# Shed new queries while this many are queued or running...
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "500"))
+# ...or while the oldest queued query has waited this many seconds
+SHED_QUEUE_WAIT = float(os.environ.get("SHED_QUEUE_WAIT", "2.0"))
+
+# Reasons admit() turns a query away
+EMPTY = "empty"
+RATE_LIMITED = "rate_limited"
+SHED = "shed"
+
+"""
+    Decides whether receiveQuery, /search or /search/batch takes a query, before it
+    costs a ticket, a queue slot or a ranking call. A query is turned away when:
+        - the pipeline is overloaded: MAX_IN_FLIGHT queries are queued, running or
+          being streamed (see begin()), or the oldest queued one has waited
+          SHED_QUEUE_WAIT seconds (load shedding, so queueing latency stays bounded for
+          the queries that are taken);
+        - it has no query terms after normalization ("", "to", "type:pdf"), as the
+          ranking service would have nothing to rank;
+        - its user is over their rate: each user has a token bucket refilled at rate
+          tokens per second up to burst, and a query takes one token. Queries without a
+          userId are only limited by the shared checks.
+    Safe to share between threads. Workers of one server that share their state (see
+    share()) keep the buckets and the in-flight count together, so the limits hold for
+    the server as a whole rather than per worker.
+
+    Args:
+        rate (float): Tokens added per user per second.
+        burst (float): Tokens a user can hold.
+        maxInFlight (int): Queued plus running queries above which new ones are shed.
+        shedQueueWait (float): Queue wait in seconds above which new queries are shed.
+        maxUsers (int): Buckets kept.
+        clock (function): Monotonic time source, replaceable in tests.
+"""
+class AdmissionController:
+    def __init__(self, rate=USER_RATE_LIMIT, burst=USER_BURST, maxInFlight=MAX_IN_FLIGHT,
+                 shedQueueWait=SHED_QUEUE_WAIT, maxUsers=MAX_TRACKED_USERS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.maxInFlight = maxInFlight
+        self.shedQueueWait = shedQueueWait
+        self.maxUsers = maxUsers
+        self.clock = clock
+        self.buckets = OrderedDict()
+        self.running = 0
+        self.lock = threading.Lock()
+        self.counts = {"accepted": 0, SHED: 0, RATE_LIMITED: 0, EMPTY: 0, "rejected": 0}
+        self.shared = None
+        self.worker = None
+        self.pool = None
+
+    """
+        Keeps the buckets and this worker's in-flight count in shared from now on.
+
+        Args:
+            shared (SharedState): State shared by the server's workers.
+            worker (int): This worker's index.
+            pool (QueryWorkerPool): This worker's queue, counted in its in-flight count.
+    """
+    def share(self, shared, worker, pool=None):
+        self.shared, self.worker, self.pool = shared, worker, pool
+        self.publish()
+
+    """
+        Records this worker's queued, running and streamed queries in the shared state.
+        Called on every admission, by begin() and end(), and by the pool whenever its
+        load changes (see QueryWorkerPool.onLoadChange).
+
+        Returns:
+            inFlight (int): Queries in flight across all workers.
+    """
+    def publish(self, pool=None):
+        pool = pool if pool is not None else self.pool
+        inFlight = (pool.load()[0] if pool is not None else 0) + self.running
+        if self.shared is None:
+            return inFlight
+        return self.shared.publishLoad(self.worker, inFlight)
+
+    """
+        Checks a query against the load, its terms and its user's rate.
+
+        Args:
+            userId: User the query is from.
+            query (str): Raw query string.
+            pool (QueryWorkerPool): Queue whose load is checked; None only counts
+            queries being streamed.
+
+        Returns:
+            reason (str): SHED, EMPTY or RATE_LIMITED, or None if the query is admitted.
+    """
+    def admit(self, userId, query, pool=None):
+        return self.admitMany(userId, [query], pool)
+
+    """
+        admit() for a batch of queries, taken or turned away together. Queries without
+        query terms are not charged for; the batch is EMPTY if none has any.
+
+        Returns:
+            reason (str): SHED, EMPTY or RATE_LIMITED, or None if the batch is admitted.
+    """
+    def admitMany(self, userId, queries, pool=None):
+        if self.overloaded(pool):
+            return self.record(SHED)
+        cost = sum(1 for query in queries if queryTerms(parseQuery(query)))
+        if not cost:
+            return self.record(EMPTY)
+        if userId is not None and not self.take(userId, cost):
+            return self.record(RATE_LIMITED)
+        return None
+
+    """
+        Whether new queries are shed: too many queued, running or streamed, or a
+        queued one has waited too long.
+    """
+    def overloaded(self, pool=None):
+        oldestWait = pool.load()[1] if pool is not None else 0.0
+        return self.publish(pool) >= self.maxInFlight or oldestWait >= self.shedQueueWait
+
+    """
+        Takes cost tokens from a user's bucket, all or none.
+
+        Returns:
+            True if the user had the tokens.
+    """
+    def take(self, userId, cost=1):
+        now = self.clock()
+        if self.shared is not None:
+            return self.shared.takeTokens(userId, cost, self.rate, self.burst, now)[0]
+        with self.lock:
+            tokens = self._refill(userId, now)
+            taken = tokens >= cost
+            self.buckets[userId] = (tokens - cost if taken else tokens, now)
+            if len(self.buckets) > self.maxUsers:
+                self.buckets.popitem(last=False)
+            return taken
+
+    # Removes a user's bucket and returns its tokens as of now; call with the lock held
+    def _refill(self, userId, now):
+        tokens, updatedAt = self.buckets.pop(userId, (self.burst, now))
+        return min(self.burst, tokens + (now - updatedAt) * self.rate)
+
+    """
+        Seconds a client turned away for reason should wait before retrying, for the
+        Retry-After header: until the user's bucket holds cost tokens again when
+        RATE_LIMITED, and SHED_QUEUE_WAIT when SHED.
+
+        Returns:
+            seconds (int): At least 1.
+    """
+    def retryAfter(self, reason, userId=None, cost=1):
+        if reason == RATE_LIMITED and userId is not None and self.rate > 0:
+            now = self.clock()
+            if self.shared is not None:
+                tokens = self.shared.takeTokens(userId, 0, self.rate, self.burst, now)[1]
+            else:
+                with self.lock:
+                    tokens = self._refill(userId, now)
+                    self.buckets[userId] = (tokens, now)
+            return max(1, math.ceil((min(cost, self.burst) - tokens) / self.rate))
+        return max(1, math.ceil(self.shedQueueWait))
+
+    """
+        Counts queries that run outside the processing queue (/search streams and
+        batches) as in flight until end() is called with the same count.
+    """
+    def begin(self, count=1):
+        with self.lock:
+            self.running += count
+        if self.shared is not None:
+            self.publish()
+
+    def end(self, count=1):
+        with self.lock:
+            self.running -= count
+        if self.shared is not None:
+            self.publish()
+
+    """
+        Counts an outcome: "accepted", a reason from admit(), or "rejected" for queries
+        refused for anything else (an invalid cursor, a full queue).
+
+        Returns:
+            outcome (str): The outcome, or None for "accepted".
+    """
+    def record(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+        return outcome if outcome != "accepted" else None
+
+    """
+        Returns the outcome counters.
+    """
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
@@ -1,50 +1,469 @@
+import os
 import time
 import queue
+import asyncio
 import threading
-import json
 import logging
-import nltk
-import spacy
-import requests
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from pymongo import MongoClient
-from fastapi import FastAPI
-
-processingQueue = queue.Queue()
-api = FastAPI()
-nlp = spacy.load("en_core_web_sm")
+from contextlib import asynccontextmanager
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
+from src.documentStore import getDocuments, getDocumentsMany, getDocumentCache
+from src.retrieval import getExecutor, getPrefetchExecutor, fetchConcurrently, FETCH_BATCH_SIZE
+from src.rankingClient import getRankingClient
+from src.localIndex import getLocalIndex, hedge, RANKING_DEADLINE
+from src.queryModel import parseQuery, queryTerms, queryKey, mongoFilter, needsVerification, matchesDocument
+from src.queryNormalizer import getNormalizer, ensureNLTKData, normalizeMany
+from src.resultCache import ResultCache, cacheKey
+from src.pagination import resolvePage, nextPage, pageInfo, pageCacheKey, MAX_RESULTS, PREFETCH_NEXT_PAGE
+from src.workerPool import QueryWorkerPool
+from src.admission import AdmissionController, SHED, EMPTY
+from src.singleFlight import SingleFlight
+from src.deadline import Deadline, DeadlineExceeded, callWithin, flightWithin
+from src.metrics import Trace, getMetrics, timed
+from src.tickets import TicketRegistry, MAX_RESULT_WAIT
+from src.serialization import encodeJson, encodeJsonLine
+from src.searchResult import SearchResult
+from src.autocomplete import getAutocomplete, recordQuery, SUGGESTION_LIMIT
+from src.snippetEngine import generatePassage, SNIPPET_SCAN_CHARS
+from src.snippetIndex import getSnippetIndex, SNIPPET_INDEX_ON_READ
 
-def getNLTKData(): 
+# Queries a /search/batch request may hold, and how many of them run at once
+MAX_BATCH_QUERIES = int(os.environ.get("MAX_BATCH_QUERIES", "20"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+processingQueue = QueryWorkerPool()
+tickets = TicketRegistry()
+resultCache = ResultCache()
+# Concurrent identical queries share one ranking call and one fetch per page
+rankingFlights = SingleFlight()
+retrievalFlights = SingleFlight()
+admission = AdmissionController()
+
+"""
+    Starts the query workers with the app and drains them when it stops, so every
+    process serving the API (including each pre-forked worker, see src.server) answers
+    the tickets it hands out. A pool that is already running is left to its owner.
+"""
+@asynccontextmanager
+async def lifespan(app):
+    pool = processingQueue
+    started = not pool.workers
+    if started:
+        processQueue()
     try:
-        nltk.data.find('tokenizers/punkt_tab')
-    except LookupError:
-        nltk.download('punkt_tab')
-        nltk.download('wordnet')
-        nltk.download('omw-1.4')
+        yield
+    finally:
+        if started:
+            await run_in_threadpool(pool.shutdown)
+
+api = FastAPI(lifespan=lifespan)
+
+"""
+    Makes this process one of several pre-forked workers serving the API together (see
+    src.server): tickets, rate limit buckets and the in-flight count are kept in shared
+    from now on, so a ticket can be collected from any worker and the limits hold for
+    the server as a whole.
+
+    Args:
+        shared (SharedState): State shared by the server's workers.
+        worker (int): This worker's index.
+"""
+def shareState(shared, worker):
+    tickets.share(shared)
+    admission.share(shared, worker, processingQueue)
+    processingQueue.onLoadChange = admission.publish
+
+_spacyModel = None
+# Page cache keys with a background prefetch in flight
+_prefetching = set()
+_prefetchLock = threading.Lock()
+
+"""
+    Installs and verifies the NLTK data used for text processing, downloading anything
+    that is missing. Call it once when setting up a machine or at process startup; the
+    request path only verifies and never downloads (see queryNormalizer.ensureNLTKData).
+"""
+def getNLTKData(): 
+    ensureNLTKData(download=True)
 
+"""
+    Loads the spaCy model on first use. Only parseSearchQueryStub needs it, so nothing
+    else pays for importing spaCy.
+"""
+def getSpacyModel():
+    global _spacyModel
+    if _spacyModel is None:
+        import spacy
+        _spacyModel = spacy.load("en_core_web_sm")
+    return _spacyModel
+
+"""
+    Processes one query taken from the processing queue by a worker and delivers the
+    response to the caller's ticket.
+
+    Args:
+        userId: User identifier for tracking.
+        query (str): Raw query string from receiveQuery().
+        ticketId (str): Ticket returned to the caller by receiveQuery().
+        page (Page): Slice of the results to send; defaults to the first page.
+        deadline (Deadline): The query's deadline from receiveQuery(), or None. If it
+        passes, whatever results are ready are sent with "partial": true.
+"""
+def processQuery(userId, query, ticketId=None, page=None, deadline=None):
     try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        nltk.download('stopwords')
+        if page is None:
+            page = resolvePage(query)
+        trace = Trace(query)
+        try:
+            if deadline is not None:
+                deadline.check("queue")
+            results, total = executeQuery(userId, page, trace, deadline)
+        except DeadlineExceeded:
+            results, total = [], 0
+        pagination = pageInfo(page, total)
+        if deadline is not None and deadline.exceeded:
+            pagination["partial"] = True
+        with trace.span("send"):
+            sendDocuments(results, ticketId, pagination)
+        trace.finish()
+        # Later pages of a query don't make it more popular
+        if results and page.offset == 0:
+            recordQuery(page.query, userId)
+
+    except Exception as e:
+        logging.error(f"Error in processQuery: {str(e)}")
+        if ticketId is not None:
+            tickets.fail(ticketId, e)
+
+"""
+    Starts the worker pool that drains the processing queue.
+
+    Args:
+        numWorkers (int): Number of workers; defaults to QUERY_WORKERS.
+"""
+def processQueue(numWorkers=None):
+    if numWorkers is not None:
+        processingQueue.numWorkers = numWorkers
+    processingQueue.start(processQuery)
+
+"""
+    Runs one page of a query through the pipeline: parse, rank and filter (see
+    rankPage), then fetch (see fetchPage). The ranking is narrowed to the documents
+    that match the query's filters, phrases and NOT clauses first, as far as the page
+    reaches, so pages are full; then only the page's slice is fetched from Mongo and
+    turned into results. Rankings are cached by normalized query and results by page
+    (see src.resultCache), so repeated queries skip the ranking call and, while the
+    document layer is fresh, the document fetch and snippets as well; the next page is
+    then built into the cache in the background (see prefetchPage). Phrases, OR, NOT
+    and field filters in the query are honored (see src.queryModel).
+
+    Args:
+        userId: User identifier for tracking.
+        page (Page): Query and slice from pagination.resolvePage().
+        trace (Trace): Trace to record the stage times in (see src.metrics); None
+        records them in the metrics only.
+        deadline (Deadline): Deadline every stage waits on at most (see src.deadline);
+        past it, documents not fetched yet are left out and results get no snippet.
+
+    Returns:
+        results (list): SearchResults of the page in rank order.
+        total (int): Number of ranked documents that match the query, at most MAX_RESULTS;
+        an upper bound while the ranking is only partly filtered (see filterPage).
+
+    Raises:
+        DeadlineExceeded: The deadline passed before the query was ranked and filtered.
+"""
+def executeQuery(userId, page, trace=None, deadline=None):
+    if trace is None:
+        trace = Trace(page.query)
+
+    with trace.span("parse"):
+        structuredQuery = generateQueries(page.query)
+    rankedDocumentIds, matchingIds, total = rankPage(userId, page, structuredQuery, trace, deadline)
+    results = fetchPage(page, structuredQuery, rankedDocumentIds, matchingIds, total, trace, deadline)
+
+    # Log per-stage query times
+    timings = ", ".join(f"{stage}={seconds * 1000:.2f}ms" for stage, seconds in trace.stages.items())
+    logging.info(f"Query '{queryKey(structuredQuery)}' page {page.offset}+{page.pageSize} from user {userId}: "
+                 f"{timings}")
+
+    return results, total
+
+"""
+    The rank and filter stages of a page: ranks the query (see rankQuery) and narrows
+    the ranking to the documents that match it as far as the page reaches (see
+    filterPage).
+
+    Args:
+        userId: User identifier for tracking.
+        page (Page): The page to fill.
+        structuredQuery (dict): Query tree from generateQueries().
+        trace (Trace): Trace to record the stage times in.
+        deadline (Deadline): Query deadline, or None.
+
+    Returns:
+        rankedDocumentIds (list): The ranking from rankQuery().
+        matchingIds (list): The matching IDs from filterPage().
+        total (int): The total from filterPage().
+
+    Raises:
+        DeadlineExceeded: The deadline passed before the page was ranked and filtered.
+"""
+def rankPage(userId, page, structuredQuery, trace, deadline=None):
+    # Rankings are usually cached, and are needed for the total and the next page
+    with trace.span("rank"):
+        rankedDocumentIds = rankQuery(userId, queryTerms(structuredQuery), structuredQuery, deadline)
+    with trace.span("filter"):
+        matchingIds, total = filterPage(structuredQuery, rankedDocumentIds, page, deadline)
+    return rankedDocumentIds, matchingIds, total
+
+"""
+    For queries with field filters, phrases or NOT clauses, narrows a ranking to the
+    matching documents as far as page and the match after it (see filterRanking).
+    What was checked is kept in the ranking layer of the result cache by query tree
+    while the query's ranking is cached, and later pages carry on from there; requests
+    that need the same stretch of the ranking checked share one check. Other queries
+    get their ranking back.
+
+    Args:
+        structuredQuery (dict): Query tree from generateQueries().
+        rankedDocumentIds (list): Ranking from rankQuery().
+        page (Page): The page to fill.
+        deadline (Deadline): Query deadline, or None.
+
+    Returns:
+        matchingIds (list): The matching IDs found so far, best first; every match
+        once the whole ranking has been checked.
+        total (int): Matches found plus the ranked documents not checked yet: the
+        number of matches once the whole ranking has been checked, at most that before.
+
+    Raises:
+        DeadlineExceeded: The deadline passed before the page was filled.
+"""
+def filterPage(structuredQuery, rankedDocumentIds, page, deadline=None):
+    if not rankedDocumentIds or not needsFiltering(structuredQuery):
+        return rankedDocumentIds, len(rankedDocumentIds)
+    key = f"{queryKey(structuredQuery)}#filtered"
+    needed = page.offset + page.pageSize + 1
+    matchingIds, checked = resultCache.rankings.get(key) or ([], 0)
+    if len(matchingIds) < needed and checked < len(rankedDocumentIds):
+        matchingIds, checked = flightWithin(rankingFlights, f"{key}@{needed}", filterRanking,
+                                            (structuredQuery, rankedDocumentIds, matchingIds, checked, needed,
+                                             page.pageSize), deadline, "filter")
+        # Fallback rankings aren't cached, so neither is what was checked of them
+        if resultCache.rankings.get(cacheKey(queryTerms(structuredQuery))) is not None:
+            cached = resultCache.rankings.get(key)
+            if cached is None or cached[1] < checked:
+                resultCache.rankings.set(key, (matchingIds, checked))
+    return matchingIds, len(matchingIds) + len(rankedDocumentIds) - checked
+
+"""
+    The fetch stage of a page: answers from the document layer of the result cache, or
+    fetches the page's slice of matchingIds (see fetchPageResults); concurrent requests
+    for the same page share one fetch. Then prefetches the next page (see prefetchPage).
+
+    Args:
+        page (Page): The page to fetch.
+        structuredQuery (dict): Query tree from generateQueries().
+        rankedDocumentIds (list): The ranking from rankQuery().
+        matchingIds (list): The matching IDs from rankPage().
+        total (int): The total from rankPage().
+        trace (Trace): Trace to record the stage time in.
+        deadline (Deadline): Query deadline, or None; a page not fetched by then has no
+        results.
+
+    Returns:
+        results (list): SearchResults in rank order.
+"""
+def fetchPage(page, structuredQuery, rankedDocumentIds, matchingIds, total, trace, deadline=None):
+    documentCache = resultCache.documents
+    pageKey = pageCacheKey(queryKey(structuredQuery), page)
+    results = documentCache.get(pageKey) if documentCache is not None else None
+    if results is None:
+        with trace.span("fetch"):
+            pageIds = matchingIds[page.offset:page.offset + page.pageSize]
+            try:
+                results = flightWithin(retrievalFlights, pageKey, fetchPageResults,
+                                       (pageIds, queryTerms(structuredQuery), pageKey), deadline, "fetch")
+            except DeadlineExceeded:
+                results = []
+
+    prefetchPage(nextPage(page, total), rankedDocumentIds, structuredQuery)
+    return results
 
 """
-    Processes queries from the processing queue.
+    Fetches a page of ranked documents and turns them into results, storing complete
+    pages in the document layer of the result cache under pageKey. Only the first
+    SNIPPET_SCAN_CHARS of each text are fetched, snippets are built concurrently on the
+    retrieval pool, and documents are dropped once their snippet is built, so memory
+    per page does not depend on document size.
+
+    Args:
+        pageIds (list): Document IDs of the page, best first, from rankPage() so that
+        they already match the query.
+        tokens (list): queryTerms() of the query.
+        pageKey (str): pageCacheKey() of the page, or None to not cache it.
+        deadline (Deadline): Query deadline, or None.
+
+    Returns:
+        results (list): SearchResults in rank order.
 """
-def processQueue():
-    while True:
+def fetchPageResults(pageIds, tokens, pageKey=None, deadline=None):
+    # The page may have been cached by a call that finished after the caller looked
+    documentCache = resultCache.documents if pageKey is not None else None
+    results = documentCache.get(pageKey) if documentCache is not None else None
+    if results is not None:
+        return results
+
+    documents, missed = retrieveDocuments(pageIds, maxTextChars=SNIPPET_SCAN_CHARS, deadline=deadline)
+    executor = getExecutor()
+    futures = [executor.submit(resultFromDocument, document, tokens, deadline) for document in documents]
+    results = []
+    for document, future in zip(documents, futures):
         try:
-            userId, query = processingQueue.get()
+            results.append(future.result())
+        except Exception as e:
+            logging.error(f"Error building result for document {document.get('_id')}: {str(e)}")
+            missed.append(document.get("_id"))
+    # Only cache complete pages so a timed-out document isn't missing for a whole TTL
+    if documentCache is not None and not missed and not (deadline is not None and deadline.exceeded):
+        documentCache.set(pageKey, results)
+    return results
 
-            tokens = ' '.join(parseSearchQuery(query))
-            print(tokens)
+"""
+    Builds a page's results into the document layer of the result cache in the
+    background, so that asking for it next is answered without waiting on Mongo. Does nothing if
+    PREFETCH_NEXT_PAGE is off, there is no document layer, or the page is cached or
+    already being fetched.
 
-            getDocumentScores(userId, tokens)
+    Args:
+        page (Page): Page to fetch, or None for no page.
+        rankedDocumentIds (list): The query's ranking from rankQuery(); the page is cut
+        from it after filterPage().
+        structuredQuery (dict): Query tree from generateQueries().
+"""
+def prefetchPage(page, rankedDocumentIds, structuredQuery):
+    documentCache = resultCache.documents
+    if page is None or documentCache is None or not PREFETCH_NEXT_PAGE:
+        return
+    pageKey = pageCacheKey(queryKey(structuredQuery), page)
+    with _prefetchLock:
+        if pageKey in _prefetching or documentCache.get(pageKey) is not None:
+            return
+        _prefetching.add(pageKey)
 
-            # Mark the task as done
-            processingQueue.task_done()
+    def prefetch():
+        try:
+            matchingIds = filterPage(structuredQuery, rankedDocumentIds, page)[0]
+            pageIds = matchingIds[page.offset:page.offset + page.pageSize]
+            # A request for the page while it is being prefetched waits for this fetch
+            flightWithin(retrievalFlights, pageKey, fetchPageResults, (pageIds, queryTerms(structuredQuery), pageKey),
+                         None, "fetch")
         except Exception as e:
-            logging.error(f"Error in processQueue: {str(e)}")
+            logging.error(f"Error in prefetchPage: {str(e)}")
+        finally:
+            with _prefetchLock:
+                _prefetching.discard(pageKey)
+
+    try:
+        getPrefetchExecutor().submit(prefetch)
+    except Exception as e:
+        logging.error(f"Error in prefetchPage: {str(e)}")
+        with _prefetchLock:
+            _prefetching.discard(pageKey)
+
+"""
+    Ranks a tokenized query, answering from the ranking layer of the result cache when
+    possible. Concurrent calls for the same query share one ranking call.
+
+    Args:
+        userId: User identifier for tracking.
+        tokens (list): Tokens from parseSearchQuery(), or queryTerms() of structuredQuery.
+        structuredQuery (dict): Query tree for the local index; defaults to an AND of tokens.
+        deadline (Deadline): Query deadline, or None.
+
+    Returns:
+        rankedDocumentIds (list): Document IDs, best first; at most MAX_RESULTS.
+
+    Raises:
+        DeadlineExceeded: The deadline passed before the query was ranked.
+"""
+def rankQuery(userId, tokens, structuredQuery=None, deadline=None):
+    key = cacheKey(tokens)
+    rankedDocumentIds = resultCache.rankings.get(key)
+    if rankedDocumentIds is None:
+        # Local index answers depend on the whole query tree, not only its tokens
+        flightKey = queryKey(structuredQuery) if structuredQuery is not None else key
+        rankedDocumentIds = flightWithin(rankingFlights, flightKey, rankUncached, (userId, key, structuredQuery),
+                                         deadline, "rank")
+    return rankedDocumentIds
+
+"""
+    Whether a query has field filters, phrases or NOT clauses, which the ranking service
+    does not apply (it only sees queryTerms()).
+"""
+def needsFiltering(structuredQuery):
+    return isinstance(structuredQuery, dict) and bool(structuredQuery.get("filters")) or \
+        needsVerification(structuredQuery)
+
+"""
+    Checks a ranking against a query's field filters, phrases and NOT clauses a batch
+    at a time, carrying on from checked, until needed matches are found or the ranking
+    runs out. Each batch is one $in query for the matching IDs; when phrases or NOT
+    clauses have to be checked, it returns the documents with their first
+    SNIPPET_SCAN_CHARS of text through the document cache (see
+    documentStore.getDocumentsMany), so the check reads what the snippets will and the
+    page fetch afterwards finds them cached. Each batch is waited on until the
+    deadline, and no batch is started after it.
+
+    Args:
+        structuredQuery (dict): Query tree from generateQueries().
+        rankedDocumentIds (list): Ranking from rankQuery().
+        matchedIds (list): Matches among the first checked IDs of the ranking.
+        checked (int): IDs of the ranking already checked.
+        needed (int): Matches wanted.
+        batchSize (int): Fewest IDs checked per batch.
+        deadline (Deadline): Query deadline, or None.
+
+    Returns:
+        matchedIds (list): Matches among the first checked IDs, best first.
+        checked (int): IDs of the ranking checked.
+
+    Raises:
+        DeadlineExceeded: The deadline passed first.
+"""
+def filterRanking(structuredQuery, rankedDocumentIds, matchedIds, checked, needed, batchSize, deadline=None):
+    verify = needsVerification(structuredQuery)
+    conditions = mongoFilter(structuredQuery)
+
+    def matching(batch):
+        if not verify:
+            return [document["_id"] for document in getDocumentsMany(batch, fields=["_id"], conditions=conditions)]
+        documents = getDocumentsMany(batch, conditions=conditions, maxTextChars=SNIPPET_SCAN_CHARS)
+        return [document["_id"] for document in documents if matchesDocument(structuredQuery, document)]
+
+    matchedIds = list(matchedIds)
+    while len(matchedIds) < needed and checked < len(rankedDocumentIds):
+        batch = rankedDocumentIds[checked:checked + max(needed - len(matchedIds), batchSize)]
+        matchedIds.extend(callWithin(lambda: matching(batch), deadline, "filter"))
+        checked += len(batch)
+    return matchedIds, checked
+
+"""
+    rankQuery() on a ranking cache miss: asks for scores and caches ranking service
+    answers.
+"""
+def rankUncached(userId, key, structuredQuery, deadline=None):
+    scores, fromRankingService = getDocumentScores(userId, key, structuredQuery, deadline)
+    rankedDocumentIds = [scored.docId for scored in scores[:MAX_RESULTS]]
+    # Fallback rankings are only cached until the ranking service answers again
+    if fromRankingService:
+        resultCache.rankings.set(key, rankedDocumentIds)
+    return rankedDocumentIds
 
 """
     Receives a search query string from the user via UI/UX, logs it, and adds it to the 
@@ -53,25 +472,419 @@ def processQueue():
     Args:
         query (str): The search query string from the user.
         userId (optional): User identifier for tracking.
+        page (int): Page number, from 1.
+        pageSize (int): Results per page; defaults to PAGE_SIZE (see src.pagination).
+        cursor (str): nextCursor of a previous response; overrides query, page and pageSize.
 
     Returns:
-        True if query was successfully added; otherwise false. 
+        ticketId (str): Ticket to collect the response with via getQueryResult(),
+        awaitQueryResult() or GET /results/{ticketId}; False if the query was not added:
+        when admission control turns it away (overload, no query terms, or the user is
+        over their rate; see src.admission), when the queue or the user's share of it is
+        full, or when the cursor is invalid. An added query has QUERY_DEADLINE seconds
+        from here to be answered (see src.deadline).
 """
-def receiveQuery(query, userId=None):
+def receiveQuery(query, userId=None, page=1, pageSize=None, cursor=None):
     try:
-        # Log the received query
-        logging.info(f"Received query from user {userId}: {query}")
+        ticketId, reason = submitQuery(query, userId, page, pageSize, cursor)
+        return ticketId if reason is None else False
 
-        # Add the query to the processing queue
-        processingQueue.put((userId, query))
-        
-        return True 
-    
     except Exception as e:
         logging.error(f"Error in receiveQuery: {str(e)}")
+        admission.record("rejected")
 
         return False
 
+"""
+    receiveQuery() that says why a query was turned away.
+
+    Returns:
+        ticketId (str): The query's ticket, or None if it was not added.
+        reason (str): None, or SHED (overload or a full queue), EMPTY or RATE_LIMITED
+        (see src.admission).
+
+    Raises:
+        ValueError: The cursor is invalid.
+"""
+def submitQuery(query, userId=None, page=1, pageSize=None, cursor=None):
+    requestedPage = resolvePage(query, page, pageSize, cursor)
+
+    # Log the received query
+    logging.info(f"Received query from user {userId}: {requestedPage.query}")
+
+    reason = admission.admit(userId, requestedPage.query, processingQueue)
+    if reason is not None:
+        logging.warning(f"Rejected query from user {userId}: {reason}")
+        return None, reason
+
+    # Add the query to the processing queue; its deadline includes the time queued
+    ticketId = tickets.create()
+    try:
+        processingQueue.submit(userId, (userId, requestedPage.query, ticketId, requestedPage, Deadline()))
+    except queue.Full:
+        logging.warning(f"Rejected query from user {userId}: processing queue is full")
+        tickets.discard(ticketId)
+        return None, admission.record(SHED)
+    except Exception:
+        tickets.discard(ticketId)
+        raise
+    admission.record("accepted")
+
+    return ticketId, None
+
+"""
+    Collects the response for a query submitted with receiveQuery().
+
+    Args:
+        ticketId (str): Ticket returned by receiveQuery().
+        timeout (float): Seconds to wait; 0 polls without blocking, None waits forever.
+
+    Returns:
+        response (dict): The response built by sendDocuments().
+
+    Raises:
+        KeyError: The ticket is unknown or expired.
+        concurrent.futures.TimeoutError: The query has not finished yet.
+"""
+def getQueryResult(ticketId, timeout=None):
+    return tickets.result(ticketId, timeout)
+
+"""
+    Awaitable version of getQueryResult() for async callers.
+
+    Raises:
+        KeyError: The ticket is unknown or expired.
+        asyncio.TimeoutError: The query did not finish within timeout.
+"""
+async def awaitQueryResult(ticketId, timeout=None):
+    return await tickets.awaitResult(ticketId, timeout)
+
+class QueryRequest(BaseModel):
+    query: str = ""
+    userId: Optional[str] = None
+    page: int = 1
+    pageSize: Optional[int] = None
+    cursor: Optional[str] = None
+
+"""
+    Query submission endpoint: queues the query with receiveQuery() and returns its
+    ticket, to collect the response from GET /results/{ticketId}.
+
+    Returns:
+        {"ticketId": ticketId}. 400 for an invalid cursor or a query without query
+        terms, 429 with Retry-After when the user is over their rate or the server is
+        overloaded.
+"""
+@api.post("/queries", status_code=202)
+async def postQuery(request: QueryRequest):
+    try:
+        ticketId, reason = submitQuery(request.query, request.userId, request.page, request.pageSize,
+                                       request.cursor)
+    except ValueError as e:
+        admission.record("rejected")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in postQuery: {str(e)}")
+        admission.record("rejected")
+        raise HTTPException(status_code=503, detail="The query could not be queued")
+    if reason is not None:
+        raise rejection(reason, request.userId)
+    return {"ticketId": ticketId}
+
+"""
+    The HTTP error for a query admission control turned away: 400 for a query without
+    query terms, otherwise 429 with a Retry-After header (see AdmissionController.retryAfter).
+
+    Args:
+        reason (str): Reason from admission.admit().
+        userId: User the query is from.
+        cost (int): Queries the request asked for.
+
+    Returns:
+        error (HTTPException): To raise.
+"""
+def rejection(reason, userId=None, cost=1):
+    if reason == EMPTY:
+        return HTTPException(status_code=400, detail="Query rejected: no query terms")
+    return HTTPException(status_code=429, detail=f"Query rejected: {reason}",
+                         headers={"Retry-After": str(admission.retryAfter(reason, userId, cost))})
+
+"""
+    Passes a stream through, counting its queries as in flight for admission control
+    until it finishes or the client goes away.
+"""
+async def admittedStream(stream, count=1):
+    admission.begin(count)
+    try:
+        async for line in stream:
+            yield line
+    finally:
+        admission.end(count)
+
+"""
+    Polling endpoint for query results. With wait > 0 the request is held open until
+    the result arrives or wait seconds pass (long polling).
+
+    Args:
+        ticketId (str): Ticket returned by receiveQuery() or POST /queries.
+        wait (float): Seconds to wait for the result, at most MAX_RESULT_WAIT.
+
+    Returns:
+        {"status": "Pending"} while the query runs; otherwise the query's response.
+        400 for a negative wait.
+"""
+@api.get("/results/{ticketId}")
+async def getResults(ticketId: str, wait: float = 0.0):
+    if not wait >= 0:
+        raise HTTPException(status_code=400, detail="wait must be at least 0")
+    wait = min(wait, MAX_RESULT_WAIT)
+    try:
+        return await awaitQueryResult(ticketId, wait) if wait > 0 else getQueryResult(ticketId, 0)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired ticket")
+    except (asyncio.TimeoutError, FutureTimeoutError):
+        return {"status": "Pending"}
+    except Exception as e:
+        logging.error(f"Error in getResults: {str(e)}")
+        return {
+            "status": "Error",
+            "message": "An error occurred while processing your request."
+        }
+
+"""
+    Turns a retrieved document into a search result with a highlighted passage (see
+    src.snippetEngine), scored from the document's precomputed index entry when one is
+    available (see src.snippetIndex). The full text is used for the snippet but not
+    returned.
+
+    Args:
+        document (dict): Document from retrieveDocuments().
+        tokens (list): Tokens from parseSearchQuery().
+        deadline (Deadline): Query deadline; once it has passed, the result is returned
+        without a snippet instead of being dropped.
+
+    Returns:
+        result (SearchResult): _id, url, title, type and snippet.
+"""
+def resultFromDocument(document, tokens, deadline=None):
+    if deadline is not None and deadline.expired():
+        deadline.expire("snippet")
+        return SearchResult.fromDocument(document)
+
+    with timed("snippet"):
+        text = document.get("text") or ""
+
+        # Use the precomputed sentence/stem index when there is one for this document
+        index = getSnippetIndex()
+        entry = index.lookup(document) if index is not None else None
+        if entry is None and index is not None and SNIPPET_INDEX_ON_READ:
+            entry = index.update(document)
+
+        snippet = entry.passage(text, tokens) if entry is not None else generatePassage(text, tokens)
+        return SearchResult.fromDocument(document, snippet)
+
+"""
+    Runs the parse, rank, retrieve and snippet pipeline for one page of a query, with
+    the same stages as executeQuery() (see rankPage and fetchPage), so /search shares
+    rankings and page fetches with queued queries. Yields a header with the number of
+    ranked documents and the page's pagination fields (see pagination.pageInfo) as soon
+    as the query is ranked, then one result per document of the page in rank order.
+
+    The query has QUERY_DEADLINE seconds (see src.deadline): a page not fetched by then
+    yields no results, and results built after it come without a snippet.
+
+    Args:
+        query (str): Raw query string.
+        userId: User identifier for tracking.
+        page (Page): Slice of the results; defaults to the first page of query.
+        deadline (Deadline): Deadline to use instead of a new one.
+
+    Yields:
+        header (dict), then result (dict) for each retrieved document. The header has
+        "partial": true if the query ran out of time while ranking or filtering. Its
+        total counts the ranked documents that match the query, or is an upper bound
+        on them while the ranking is only partly filtered (see filterPage).
+"""
+async def iterSearch(query, userId=None, page=None, deadline=None):
+    if page is None:
+        page = resolvePage(query)
+    if deadline is None:
+        deadline = Deadline()
+    trace = Trace(page.query, profile=False)
+    with trace.span("parse"):
+        structuredQuery = await run_in_threadpool(generateQueries, page.query)
+    try:
+        rankedDocumentIds, matchingIds, total = await run_in_threadpool(rankPage, userId, page, structuredQuery,
+                                                                        trace, deadline)
+    except DeadlineExceeded:
+        rankedDocumentIds, matchingIds, total = [], [], 0
+    header = {"status": "Success" if matchingIds else "No Results",
+              "query": queryKey(structuredQuery)}
+    header.update(pageInfo(page, total))
+    if deadline.exceeded:
+        header["partial"] = True
+    yield header
+    if matchingIds and page.offset == 0:
+        recordQuery(page.query, userId)
+
+    results = await run_in_threadpool(fetchPage, page, structuredQuery, rankedDocumentIds, matchingIds, total,
+                                      trace, deadline)
+    for result in results:
+        yield result
+    trace.finish()
+
+"""
+    Encodes iterSearch() as NDJSON lines.
+"""
+async def streamSearch(query, userId=None, page=None):
+    async for item in iterSearch(query, userId, page):
+        with timed("serialize"):
+            line = encodeJsonLine(item)
+        yield line
+
+"""
+    Runs a whole query and collects its results, for the batch endpoint.
+
+    Returns:
+        response (dict): query, status, documents and the pagination fields.
+"""
+async def collectSearch(query, userId=None, page=None):
+    items = [item async for item in iterSearch(query, userId, page)]
+    response = {"query": query, "status": items[0]["status"], "documents": items[1:]}
+    response.update({field: items[0][field] for field in ("page", "pageSize", "total", "nextCursor")})
+    return response
+
+"""
+    Search endpoint. Streams results as NDJSON (see streamSearch).
+
+    Args:
+        q (str): Raw query string.
+        userId (str): User identifier for tracking.
+        page (int): Page number, from 1.
+        pageSize (int): Results per page; defaults to PAGE_SIZE, capped at MAX_PAGE_SIZE.
+        cursor (str): nextCursor from a previous header; overrides q, page and pageSize.
+
+    Returns 400 for an invalid cursor or a query without query terms and 429 with
+    Retry-After when admission control turns the query away (see src.admission).
+"""
+@api.get("/search")
+async def search(q: str = "", userId: str = None, page: int = 1, pageSize: Optional[int] = None,
+                 cursor: Optional[str] = None):
+    try:
+        requestedPage = resolvePage(q, page, pageSize, cursor)
+    except ValueError as e:
+        admission.record("rejected")
+        raise HTTPException(status_code=400, detail=str(e))
+    logging.info(f"Received search from user {userId}: {requestedPage.query}")
+    reason = admission.admit(userId, requestedPage.query, processingQueue)
+    if reason is not None:
+        logging.warning(f"Rejected search from user {userId}: {reason}")
+        raise rejection(reason, userId)
+    admission.record("accepted")
+    return StreamingResponse(admittedStream(streamSearch(requestedPage.query, userId, requestedPage)),
+                             media_type="application/x-ndjson")
+
+"""
+    Search-as-you-type endpoint. Suggests the most popular earlier queries and document
+    titles starting with what has been typed (see src.autocomplete).
+
+    Args:
+        q (str): The partial query.
+        limit (int): Number of suggestions, at most SUGGESTION_LIMIT.
+
+    Returns:
+        {"query": q, "suggestions": [phrases, most popular first]}
+"""
+@api.get("/autocomplete")
+async def autocomplete(q: str = "", limit: int = SUGGESTION_LIMIT):
+    try:
+        return {"query": q, "suggestions": getAutocomplete().suggest(q, min(max(limit, 1), SUGGESTION_LIMIT))}
+    except Exception as e:
+        logging.error(f"Error in autocomplete: {str(e)}")
+        return {"query": q, "suggestions": []}
+
+# Stats that only ever grow, exported as counters (name_total) rather than gauges
+QUEUE_COUNTERS = {"accepted", "rejected", "completed", "failed"}
+CACHE_COUNTERS = {"hits", "misses"}
+FLIGHT_COUNTERS = {"executed", "coalesced"}
+DOCUMENT_CACHE_COUNTERS = {"hits", "missingHits", "misses", "evictions", "invalidations"}
+
+# Adds stats to counters or gauges under prefix
+def _export(prefix, stats, counterNames, gauges, counters):
+    for stat, value in stats.items():
+        if stat in counterNames:
+            counters[f"{prefix}_{stat}_total"] = value
+        else:
+            gauges[f"{prefix}_{stat}"] = value
+
+"""
+    Metrics endpoint in the Prometheus text format: per-stage latency histograms and
+    quantiles (see src.metrics), plus processing queue, admission control, result cache,
+    hot document cache and coalescing (calls executed vs. collapsed into another
+    caller's) metrics. Running totals are counters named ..._total, so rate() applies;
+    levels and ratios are gauges.
+"""
+@api.get("/metrics")
+async def metrics():
+    gauges, counters = {}, {}
+    _export("search_queue", processingQueue.metrics(), QUEUE_COUNTERS, gauges, counters)
+    _export("search_admission", admission.stats(), set(admission.stats()), gauges, counters)
+    for layer, stats in resultCache.stats().items():
+        gauges[f"search_cache_{layer}_hit_rate"] = stats.pop("hitRate")
+        _export(f"search_cache_{layer}", stats, CACHE_COUNTERS, gauges, counters)
+    for name, flights in (("ranking", rankingFlights), ("retrieval", retrievalFlights)):
+        _export(f"search_{name}_calls", flights.stats(), FLIGHT_COUNTERS, gauges, counters)
+    documentCache = getDocumentCache()
+    if documentCache is not None:
+        _export("search_document_cache", documentCache.stats(), DOCUMENT_CACHE_COUNTERS, gauges, counters)
+    return PlainTextResponse(getMetrics().render(gauges, counters), media_type="text/plain; version=0.0.4")
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    userId: Optional[str] = None
+    pageSize: Optional[int] = None
+
+"""
+    Batch search endpoint. Runs all queries concurrently and streams one NDJSON line
+    per query, in the order the queries finish; each line carries the query's index in
+    the request. Each query returns its first page of request.pageSize results.
+
+    At most BATCH_CONCURRENCY queries of a batch run at once. Batches of more than
+    MAX_BATCH_QUERIES queries are refused with 413. The batch is admitted or turned
+    away as a whole: each query with query terms takes one of the user's tokens (see
+    AdmissionController.admitMany). Returns 400 if no query has query terms and 429
+    with Retry-After otherwise.
+"""
+@api.post("/search/batch")
+async def searchBatch(request: BatchSearchRequest):
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        admission.record("rejected")
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    reason = admission.admitMany(request.userId, request.queries, processingQueue)
+    if reason is not None:
+        logging.warning(f"Rejected batch of {len(request.queries)} from user {request.userId}: {reason}")
+        raise rejection(reason, request.userId, len(request.queries))
+    admission.record("accepted")
+
+    async def streamBatch():
+        running = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def indexed(index, query):
+            async with running:
+                return index, await collectSearch(query, request.userId, resolvePage(query, 1, request.pageSize))
+
+        tasks = [asyncio.ensure_future(indexed(index, query)) for index, query in enumerate(request.queries)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                index, response = await task
+                response["index"] = index
+                yield encodeJsonLine(response)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(admittedStream(streamBatch(), len(request.queries)), media_type="application/x-ndjson")
+
 """
     Processes the raw query string, tokenizes it, removes stop words and punctuation,
     and applies stemming or lemmatization.
@@ -84,45 +897,64 @@ def receiveQuery(query, userId=None):
 """
 def parseSearchQuery(query):
     try:
-        # Tokenize the query
-        tokens = nltk.word_tokenize(query)
+        # Tokenize, remove punctuation and stop words, and stem with the shared normalizer
+        return getNormalizer().normalize(query)
 
-        # Remove punctuation and convert to lower case
-        tokens = [word.lower() for word in tokens if word.isalnum()]
+    except Exception as e:
+        logging.error(f"Error in parseSearchQuery: {str(e)}")
+        return []
 
-        # Remove stop words
-        stopWords = set(stopwords.words('english'))
-        tokens = [word for word in tokens if word not in stopWords]
+"""
+    Parses a batch of queries, e.g. for log replay or cache warming. Each distinct query
+    is parsed once, words are found with the regex tokenizer instead of word_tokenize
+    (same tokens, see QueryNormalizer.fastTokenize), and large batches can be spread
+    over a process pool.
 
-        # Apply stemming
-        stemmer = PorterStemmer()
-        tokens = [stemmer.stem(word) for word in tokens]
+    Args:
+        queries (list): Raw query strings.
+        processes (int): Worker processes for batches of at least PARALLEL_MIN_BATCH
+        distinct queries; None parses everything in this process.
 
-        return tokens
+    Returns:
+        tokenizedQueries (list): The parseSearchQuery() tokens of each query, in order.
+"""
+def parseSearchQueries(queries, processes=None):
+    try:
+        queries = list(queries)
+        distinct = list(dict.fromkeys(queries))
+        parsed = dict(zip(distinct, normalizeMany(distinct, fast=True, processes=processes)))
+        # Duplicates get their own copy so callers can modify one list safely
+        return [list(parsed[query]) for query in queries]
 
     except Exception as e:
-        logging.error(f"Error in parseSearchQuery: {str(e)}")
+        logging.error(f"Error in parseSearchQueries: {str(e)}")
         return []
 
 """
 Served as a stub while unit-testing during Team Deliverable 2.
 """
-def parseSearchQueryStub():
-    doc = nlp(query)
+def parseSearchQueryStub(query):
+    doc = getSpacyModel()(query)
     lemmatized = [token.lemma_ for token in doc if not token.is_stop or not token.pos_ == "ADP"]
     return lemmatized
 
 """
-    Formats the tokenized query into structured queries for ranking.
+    Formats the tokenized query into structured queries for ranking. Given the raw query
+    string instead, quoted phrases, OR, NOT (or -word) and type:/url:/title: filters are
+    parsed into a query tree (see src.queryModel.parseQuery).
 
     Args:
-        tokens (list): Tokenized and preprocessed query from parseSearchQuery().
+        tokens (list): Tokenized and preprocessed query from parseSearchQuery(), or the
+        raw query string.
 
     Returns:
         structuredQuery (dict): Formatted query ready for ranking.
 """
 def generateQueries(tokens):
     try:
+        if isinstance(tokens, str):
+            return parseQuery(tokens)
+
         # Create a structured query
         structuredQuery = {
             "operation": "AND",
@@ -133,86 +965,145 @@ def generateQueries(tokens):
 
     except Exception as e:
         logging.error(f"Error in generateQueries: {str(e)}")
-        return {}
+        return {"operation": "AND", "terms": []}
 
 
 """
-    Mock function to simulate interaction with the Ranking API.
+    Asks the Ranking API to score documents for a query, through the shared pooled
+    RankingClient (see src.rankingClient). When a local index is installed (see
+    src.localIndex), the ranking service gets RANKING_DEADLINE seconds and the local
+    BM25 index answers the generateQueries() query if it is late or down.
 
     Args:
         userID - ID of user performing query
         query - tokenized string to rank documents
+        structuredQuery (dict): Query tree for the local index; defaults to an AND of
+        the words of query.
+        deadline (Deadline): Query deadline the ranking service is waited on until, or
+        None. With a local index, it answers if the service is late for either deadline.
 
     Returns:
-        rankedDocumentIds (list): A list of ranked document IDs.
+        rankedDocuments (list): (docId, score) tuples, best first. Empty if the ranking
+        service could not be reached and there is no local index.
+        fromRankingService (bool): False for local index answers and failures.
+
+    Raises:
+        DeadlineExceeded: The deadline passed before the ranking service answered and
+        there is no local index.
 """
-def getDocumentScores(userId, query):
-    x = requests.get(f"http://lspt-index-ranking.cs.rpi.edu:6060/getDocumentScores?id={userId}&text={query}")
-    # print(x)
-    return x;
+def getDocumentScores(userId, query, structuredQuery=None, deadline=None):
+    try:
+        localIndex = getLocalIndex()
+        if localIndex is None:
+            return callWithin(lambda: getRankingClient().getDocumentScores(userId, query), deadline, "rank"), True
+        if structuredQuery is None:
+            structuredQuery = generateQueries(query.split())
+        return hedge(lambda: getRankingClient().getDocumentScores(userId, query),
+                     lambda: localIndex.search(structuredQuery),
+                     deadline.timeout(RANKING_DEADLINE) if deadline is not None else None)
+
+    except DeadlineExceeded:
+        # Running out of time is expected under load; the caller marks the query partial
+        raise
+    except Exception as e:
+        logging.error(f"Error in getDocumentScores: {str(e)}")
+        return [], False
 
 """
-    Function to fetch document metadata and content from the Document Data Store API.
+    Fetches documents with a single $in query (see documentStore.getDocumentsMany),
+    keeping their order. Field filters of structuredQuery are part of the Mongo lookup;
+    phrases and NOT clauses are checked against the text afterwards.
 
     Args:
-        docId (int): Document ID.
+        docIDs (list): Document IDs, best first.
+        structuredQuery (dict): Query tree from generateQueries(), or None.
+        maxTextChars (int): Characters of text to keep, or None for the whole text.
 
     Returns:
-        document (dict): Contains document metadata, title, link, and text content.
+        documents (list): The documents that exist and match, in the order of docIDs.
 """
-def getDocuments(docID):
-    client = MongoClient("mongodb://128.113.126.79:27017")
-    db = client.test
-    collection = db.RAW
-    result = collection.find()
-    filtered = [i for i in result if i['_id'] == docID]
-    MongoClient.close(client)
-    return filtered 
+def fetchDocumentsMany(docIDs, structuredQuery=None, maxTextChars=None):
+    if structuredQuery is None:
+        return getDocumentsMany(docIDs, maxTextChars=maxTextChars)
+
+    # Phrases and NOT clauses are checked against the whole text
+    verify = needsVerification(structuredQuery)
+    documents = getDocumentsMany(docIDs, conditions=mongoFilter(structuredQuery),
+                                 maxTextChars=None if verify else maxTextChars)
+    if verify:
+        documents = [document for document in documents if matchesDocument(structuredQuery, document)]
+        if maxTextChars is not None:
+            for document in documents:
+                document["text"] = (document.get("text") or "")[:maxTextChars]
+    return documents
 
 """
-    Retrieves documents based on ranked document IDs.
+    Retrieves documents based on ranked document IDs. The page is split into batches of
+    FETCH_BATCH_SIZE IDs, fetched concurrently with one $in query each (see
+    fetchDocumentsMany and retrieval.fetchConcurrently), so a slow batch only drops its
+    own documents instead of stalling the page.
 
     Args:
         rankedDocumentIds (list): A list of document IDs from the Ranking API.
+        documentTimeout (float): Seconds each batch may take; defaults to
+        DOCUMENT_TIMEOUT.
+        structuredQuery (dict): Query tree the documents must match (see
+        fetchDocumentsMany).
+        maxTextChars (int): Characters of text to keep per document, or None for the
+        whole text.
+        deadline (Deadline): Query deadline; documents not fetched by then are missed.
 
     Returns:
-        retrievedDocuments (list): Contains document metadata, titles, links, and text content.
+        retrievedDocuments (list): Documents in rank order, with metadata, titles, links,
+        and text content.
+        missed (list): IDs that timed out or failed, so callers can tell an incomplete
+        page from documents the query filtered out.
 """
-def retrieveDocuments():
+def retrieveDocuments(rankedDocumentIds, documentTimeout=None, structuredQuery=None, maxTextChars=None,
+                      deadline=None):
+    rankedDocumentIds = list(rankedDocumentIds)
     try:
-        startTime = time.time()
+        startTime = time.perf_counter()
+        if not rankedDocumentIds:
+            return [], []
 
-        # Fetch documents from the Document Data Store API
-        retrievedDocuments = []
-        for docID in getDocumentScores():
-            document = getDocuments(docID)
-            if document:
-                retrievedDocuments.append(document)
+        # Fetch the page from the Document Data Store API, a few round trips at once
+        batches = [rankedDocumentIds[i:i + FETCH_BATCH_SIZE]
+                   for i in range(0, len(rankedDocumentIds), FETCH_BATCH_SIZE)]
+        fetched, missedBatches = fetchConcurrently(
+            batches, lambda batch: fetchDocumentsMany(batch, structuredQuery, maxTextChars), documentTimeout,
+            deadline)
+        retrievedDocuments = [document for documents in fetched for document in documents]
+        missed = [docID for batch in missedBatches for docID in batch]
 
         # Log document retrieval times
-        retrievalTime = time.time() - startTime
-        logging.info(f"Document retrieval time: {retrievalTime:.2f} seconds")
-
-        sendDocuments(retrievedDocuments)
+        retrievalTime = time.perf_counter() - startTime
+        logging.info(f"Document retrieval: {len(retrievedDocuments)} fetched, {len(missed)} missed "
+                     f"in {len(batches)} batch(es) in {retrievalTime * 1000:.2f}ms")
 
-        return retrievedDocuments
+        return retrievedDocuments, missed
 
     except Exception as e:
         logging.error(f"Error in retrieveDocuments: {str(e)}")
-        return []
+        return [], list(rankedDocumentIds)
 
 """
     Sends the processed documents to the UI/UX for display.
 
     Args:
-        processedDocuments (list): Processed documents with title, snippet, and link.
+        processedDocuments (list): SearchResults (or result dicts) with title, snippet,
+        and link.
+        ticketId (str): Ticket to deliver the response to. Without one the response is
+        printed, as before.
+        pagination (dict): Pagination fields to add to the response (see
+        pagination.pageInfo), or None.
 
     Returns:
-        None
+        response (dict): The response that was sent.
 """
-def sendDocuments(processedDocuments):
+def sendDocuments(processedDocuments, ticketId=None, pagination=None):
     try:
-        startTime = time.time()
+        startTime = time.perf_counter()
 
         if not processedDocuments:
             logging.warning("No documents to send.")
@@ -224,16 +1115,22 @@ def sendDocuments(processedDocuments):
             # Format data into JSON
             response = {
                 "status": "Success",
-                "documents": processedDocuments
+                "documents": [document.toDict() if isinstance(document, SearchResult) else document
+                              for document in processedDocuments]
             }
+        if pagination is not None:
+            response.update(pagination)
 
-        # Simulate sending the response to UI/UX
-        responseJson = json.dumps(response, indent=2)
-        print(responseJson)
+        if ticketId is not None:
+            # Deliver the response to the waiting caller
+            tickets.resolve(ticketId, response)
+        else:
+            # Simulate sending the response to UI/UX
+            print(encodeJson(response).decode())
 
         # Log response times
-        responseTime = time.time() - startTime
-        logging.info(f"Response time: {responseTime:.2f} seconds")
+        responseTime = time.perf_counter() - startTime
+        logging.info(f"Response time: {responseTime * 1000:.2f}ms")
 
     except Exception as e:
         logging.error(f"Error in sendDocuments: {str(e)}")
@@ -241,46 +1138,12 @@ def sendDocuments(processedDocuments):
             "status": "Error",
             "message": "An error occurred while processing your request."
         }
-        responseJson = json.dumps(response, indent=2)
-        print(responseJson)
+        if ticketId is not None:
+            tickets.resolve(ticketId, response)
+        else:
+            print(encodeJson(response).decode())
 
-"""
-Generates snippet from document data
-Args:
-    documentContent: String containing the full content of the document.
-    tokenizedQuery (list): Tokenized and preprocessed query from parseSearchQuery().
-Returns:
-    snippet: Snippet string for document
-"""
-def generateSnippet(documentContent, tokenizedQuery):
-    try:
-        snippet = ""
-        maxWordCount = 0
-        # Get each individual sentence in document
-        sentences = nltk.sent_tokenize(documentContent)
-        
-        for sentence in sentences:
-            wordCount = 0
-            # tokenize sentence using same method as query
-            words = nltk.word_tokenize(sentence)
-            words = [word.lower() for word in words if word.isalnum()]
-            stemmer = PorterStemmer()
-            words = [stemmer.stem(word) for word in words]
-            # Count how many words in the query are in the current sentence
-            for queryWord in tokenizedQuery:
-                for docWord in words:
-                    if queryWord == docWord: 
-                        wordCount = wordCount + 1
-            # If sentence has more query words than current snippet, it is the new snippet
-            if wordCount > maxWordCount:
-                snippet = sentence
-                maxWordCount = wordCount
-        
-        return snippet
-    
-    except Exception as e:
-        logging.error(f"Error in generateSnippet: {str(e)}")
-        return ""
+    return response
 
 
 # Example usage
@@ -292,24 +1155,22 @@ if __name__ == "__main__":
     # setup text processing
     getNLTKData()
 
-    # Start the processing thread
-    #processingThread = threading.Thread(target=processQueue, daemon=True)
-    #processingThread.start()    
+    # Start the query workers
+    processQueue()
 
     ### TODO: setup UI/UX; the following is mock data
-    receiveQuery(1, "BIG CHUNGUS")
-    receiveQuery(2, "Where is DCC?")
-    receiveQuery(3, "I can't find West Hall.")
-    receiveQuery(4, "Professor Goldschmidt OFfice hours")
-    receiveQuery(5, "reddit.com")
-
-    while True:
-        try:
-            userId, query = processingQueue.get()
+    ticketIds = [
+        receiveQuery("BIG CHUNGUS", 1),
+        receiveQuery("Where is DCC?", 2),
+        receiveQuery("I can't find West Hall.", 3),
+        receiveQuery("Professor Goldschmidt OFfice hours", 4),
+        receiveQuery("reddit.com", 5),
+    ]
 
-            tokens = ' '.join(parseSearchQuery(query))
-            print(tokens)
-
-            getDocumentScores(userId, tokens)
-        except Exception as e:
-            logging.error(f"Error in processQueue: {str(e)}")
+    try:
+        for ticketId in ticketIds:
+            if ticketId:
+                print(encodeJson(getQueryResult(ticketId)).decode())
+    finally:
+        processingQueue.shutdown()
+        logging.info(f"Query queue metrics: {processingQueue.metrics()}")
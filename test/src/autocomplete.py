@@ -0,0 +1,289 @@
+import os
+import re
+import sys
+import heapq
+import bisect
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from src.documentStore import getCollection
+from src.config import DATA_DIR
+
+AUTOCOMPLETE_PATH = os.environ.get("AUTOCOMPLETE_PATH", os.path.join(DATA_DIR, "autocomplete.tsv"))
+# Suggestions kept per prefix, and so the most a request can ask for
+SUGGESTION_LIMIT = int(os.environ.get("SUGGESTION_LIMIT", "10"))
+# Longer queries and titles are not suggested
+MAX_PHRASE_CHARS = int(os.environ.get("MAX_PHRASE_CHARS", "64"))
+QUERY_WEIGHT = float(os.environ.get("QUERY_WEIGHT", "1.0"))
+TITLE_WEIGHT = float(os.environ.get("TITLE_WEIGHT", "1.0"))
+# Phrases kept; past this the least popular are dropped (down to PRUNE_TO of it)
+MAX_PHRASES = int(os.environ.get("MAX_PHRASES", "100000"))
+PRUNE_TO = float(os.environ.get("PRUNE_TO", "0.9"))
+# A query is only suggested once this many distinct users have searched for it, so
+# one user's queries are never shown to anyone else
+MIN_QUERY_USERS = int(os.environ.get("MIN_QUERY_USERS", "3"))
+# Queries still short of MIN_QUERY_USERS that are remembered; the least recent are forgotten
+MAX_PENDING_QUERIES = int(os.environ.get("MAX_PENDING_QUERIES", "100000"))
+
+# Lines written by receiveQuery and the /search endpoint
+_LOGGED_QUERY = re.compile(r"Received (?:query|search) from user (.*?): (.*)$")
+_WHITESPACE = re.compile(r"\s+")
+
+_index = None
+_indexLock = threading.Lock()
+
+"""
+    Canonical form of a phrase or typed prefix: lowercase with single spaces. A
+    trailing space is kept, so "west " completes "west hall" but not "western".
+"""
+def normalizePhrase(text):
+    return _WHITESPACE.sub(" ", text.lower()).lstrip()
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+"""
+    Popularity-weighted prefix index for search-as-you-type. A character trie whose
+    nodes each keep their best k phrases, so a suggestion is a walk down the typed
+    prefix and no search of the subtree. Weights only grow, which keeps every node's
+    top k exact when phrases are added one at a time. Safe to share between threads:
+    writes are serialized and readers see whole top lists.
+
+    The index is bounded: past maxPhrases phrases it is rebuilt from the most popular
+    PRUNE_TO of them. Queries (see addQuery) only become phrases once minUsers distinct
+    users have submitted them; titles are added directly.
+
+    Args:
+        k (int): Suggestions kept per prefix.
+        maxPhrases (int): Phrases kept.
+        minUsers (int): Distinct users before a query is suggested.
+        maxPending (int): Queries short of minUsers that are remembered.
+"""
+class PrefixIndex:
+    def __init__(self, k=SUGGESTION_LIMIT, maxPhrases=MAX_PHRASES, minUsers=MIN_QUERY_USERS,
+                 maxPending=MAX_PENDING_QUERIES):
+        self.k = k
+        self.maxPhrases = maxPhrases
+        self.minUsers = minUsers
+        self.maxPending = maxPending
+        self.root = _Node()
+        self.weights = {}
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.weights)
+
+    """
+        Adds weight to a phrase, inserting it if it is new.
+
+        Args:
+            phrase (str): Query or title; normalized with normalizePhrase().
+            weight (float): Popularity to add; must be positive.
+    """
+    def add(self, phrase, weight=1.0):
+        key = normalizePhrase(phrase).rstrip()
+        if not key or len(key) > MAX_PHRASE_CHARS or weight <= 0:
+            return
+        with self.lock:
+            self._add(key, weight)
+
+    # Adds weight to a normalized phrase; call with the lock held
+    def _add(self, key, weight):
+        total = self.weights.get(key, 0.0) + weight
+        self.weights[key] = total
+        self._insert(self.root, key, (-total, key))
+        if len(self.weights) > self.maxPhrases:
+            self._prune()
+
+    def _insert(self, node, key, entry):
+        self._offer(node, key, entry)
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+            self._offer(node, key, entry)
+
+    # Rebuilds the trie from the most popular phrases, then swaps it in for readers
+    def _prune(self):
+        kept = heapq.nsmallest(int(self.maxPhrases * PRUNE_TO),
+                               ((-weight, key) for key, weight in self.weights.items()))
+        root = _Node()
+        for entry in kept:
+            self._insert(root, entry[1], entry)
+        self.weights = {key: -negativeWeight for negativeWeight, key in kept}
+        self.root = root
+        logging.info(f"Pruned the autocomplete index to {len(kept)} phrases")
+
+    """
+        Counts a query a user submitted. It is added once minUsers distinct users have
+        submitted it, with weight for each of them, and counted directly after that.
+
+        Args:
+            query (str): Raw query; normalized with normalizePhrase().
+            userId: User who submitted it; queries without one count as one user.
+            weight (float): Popularity per submission.
+    """
+    def addQuery(self, query, userId=None, weight=QUERY_WEIGHT):
+        key = normalizePhrase(query).rstrip()
+        if not key or len(key) > MAX_PHRASE_CHARS or weight <= 0:
+            return
+        with self.lock:
+            if key in self.weights or self.minUsers <= 1:
+                self._add(key, weight)
+                return
+            users = self.pending.pop(key, None) or set()
+            users.add(str(userId))
+            if len(users) >= self.minUsers:
+                self._add(key, weight * len(users))
+                return
+            self.pending[key] = users
+            if len(self.pending) > self.maxPending:
+                self.pending.popitem(last=False)
+
+    def _offer(self, node, key, entry):
+        top = node.top
+        if len(top) >= self.k and entry >= top[-1] and top[-1][1] != key:
+            return
+        # Copy so readers never see a list mid-update
+        top = [existing for existing in top if existing[1] != key]
+        bisect.insort(top, entry)
+        node.top = top[:self.k]
+
+    """
+        Suggests the most popular phrases starting with prefix.
+
+        Args:
+            prefix (str): What the user has typed so far.
+            limit (int): Number of suggestions, at most k.
+
+        Returns:
+            suggestions (list): Phrases, most popular first (alphabetical on ties).
+    """
+    def suggest(self, prefix, limit=None):
+        node = self.root
+        for char in normalizePhrase(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [phrase for _, phrase in node.top[:limit or self.k]]
+
+    """
+        Adds the queries found in log lines written by receiveQuery and /search, with
+        addQuery() so that the same distinct-user threshold applies.
+
+        Returns:
+            count (int): Number of queries counted.
+    """
+    def addQueryLog(self, lines, weight=QUERY_WEIGHT):
+        count = 0
+        for line in lines:
+            match = _LOGGED_QUERY.search(line.rstrip("\n"))
+            if match:
+                self.addQuery(match.group(2), match.group(1), weight)
+                count += 1
+        return count
+
+    """
+        Adds the title of every document in a collection.
+
+        Returns:
+            count (int): Number of titles added.
+    """
+    def addTitles(self, collection, weight=TITLE_WEIGHT, batchSize=1000):
+        count = 0
+        for document in collection.find({}, {"title": 1}).batch_size(batchSize):
+            title = document.get("title")
+            if isinstance(title, str):
+                self.add(title, weight)
+                count += 1
+        return count
+
+    """
+        Writes the phrases and weights as tab-separated lines, creating the file's
+        directory if needed.
+    """
+    def save(self, path):
+        with self.lock:
+            weights = list(self.weights.items())
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            for phrase, weight in weights:
+                file.write(f"{weight:g}\t{phrase}\n")
+
+    """
+        Reads an index written by save().
+    """
+    @classmethod
+    def load(cls, path, k=SUGGESTION_LIMIT, maxPhrases=MAX_PHRASES):
+        index = cls(k, maxPhrases)
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                weight, _, phrase = line.rstrip("\n").partition("\t")
+                index.add(phrase, float(weight))
+        return index
+
+"""
+    Returns the shared PrefixIndex, loaded from AUTOCOMPLETE_PATH if it exists and
+    empty otherwise.
+"""
+def getAutocomplete():
+    global _index
+    if _index is None:
+        with _indexLock:
+            if _index is None:
+                _index = PrefixIndex.load(AUTOCOMPLETE_PATH) if os.path.exists(AUTOCOMPLETE_PATH) else PrefixIndex()
+    return _index
+
+"""
+    Replaces the shared PrefixIndex; None reloads it on next use.
+"""
+def setAutocomplete(index):
+    global _index
+    with _indexLock:
+        _index = index
+
+"""
+    Counts a query towards its suggestions (see PrefixIndex.addQuery). Call it only for
+    admitted queries that found results, so rejected, failed and empty searches are
+    never suggested.
+"""
+def recordQuery(query, userId=None):
+    try:
+        getAutocomplete().addQuery(query, userId, QUERY_WEIGHT)
+
+    except Exception as e:
+        logging.error(f"Error in recordQuery: {str(e)}")
+
+"""
+    Command line entry point. Run from the test/ directory:
+        python -m src.autocomplete build [--log FILE ...] [--no-titles] [--path FILE]
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the autocomplete index.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    buildParser = subcommands.add_parser("build", help="index document titles and logged queries")
+    buildParser.add_argument("--log", action="append", default=[], help="log file with received queries")
+    buildParser.add_argument("--no-titles", action="store_true", help="skip the RAW collection titles")
+    buildParser.add_argument("--path", default=AUTOCOMPLETE_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = PrefixIndex()
+    stats = {"titles": 0 if args.no_titles else index.addTitles(getCollection()), "queries": 0}
+    for path in args.log:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            stats["queries"] += index.addQueryLog(file)
+    index.save(args.path)
+    stats["phrases"] = len(index)
+    print(stats)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
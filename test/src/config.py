@@ -0,0 +1,5 @@
+import os
+
+# Directory the built indexes (local index, snippet index, autocomplete) are kept in by
+# default, relative to the working directory
+DATA_DIR = os.environ.get("SEARCH_DATA_DIR", "data")
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import logging
+import argparse
+from collections import deque
+from src.documentStore import getCollection, buildProjection
+from src.queryNormalizer import normalizeMany
+from src.serialization import encodeJsonLine
+
+CORPUS_BATCH_SIZE = int(os.environ.get("CORPUS_BATCH_SIZE", "1000"))
+# Fields written per document by exportCorpus, besides _id and tokens
+EXPORT_FIELDS = ["url", "title", "type", "text_length"]
+
+"""
+    Streams a collection in _id order through a batched cursor, so only one batch is
+    held in memory at a time. A scan can be resumed by passing the last _id it saw.
+
+    Args:
+        collection: Mongo collection; defaults to the RAW collection.
+        fields (list): Fields to return, or None for whole documents.
+        batchSize (int): Documents per cursor batch.
+        after: Only return documents with a greater _id.
+        query (dict): Extra Mongo filter.
+
+    Yields:
+        document (dict): Each document.
+"""
+def iterDocuments(collection=None, fields=None, batchSize=CORPUS_BATCH_SIZE, after=None, query=None):
+    if collection is None:
+        collection = getCollection()
+    conditions = dict(query or {})
+    if after is not None:
+        conditions["_id"] = {"$gt": after}
+    cursor = collection.find(conditions, buildProjection(fields)).sort("_id", 1).batch_size(batchSize)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+"""
+    Groups an iterable into lists of up to batchSize items.
+"""
+def iterBatches(items, batchSize=CORPUS_BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batchSize:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _normalizeTexts(texts):
+    return normalizeMany(texts, fast=True)
+
+"""
+    Normalizes the text of streamed documents like parseSearchQuery (see
+    queryNormalizer.normalizeMany). With processes > 1, batches are normalized by a
+    process pool that holds at most two batches per process at a time, so memory
+    stays constant however large the corpus is. Documents come out in input order.
+
+    Args:
+        documents (iterable): Documents, e.g. from iterDocuments().
+        batchSize (int): Documents per batch sent to a worker.
+        processes (int): Worker processes; None normalizes in this process.
+        field (str): Field holding the text.
+
+    Yields:
+        (document, tokens): Each document with the tokens of its text.
+"""
+def normalizeDocuments(documents, batchSize=CORPUS_BATCH_SIZE, processes=None, field="text"):
+    batches = iterBatches(documents, batchSize)
+    if not processes or processes <= 1:
+        for batch in batches:
+            yield from zip(batch, _normalizeTexts([document.get(field) or "" for document in batch]))
+        return
+
+    import multiprocessing
+    with multiprocessing.Pool(processes) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.apply_async(_normalizeTexts, ([document.get(field) or "" for document in batch],))))
+            if len(pending) >= processes * 2:
+                batch, result = pending.popleft()
+                yield from zip(batch, result.get())
+        while pending:
+            batch, result = pending.popleft()
+            yield from zip(batch, result.get())
+
+"""
+    Finds where an interrupted export stopped: drops a partly written last line and
+    returns the _id of the last complete one.
+
+    Returns:
+        lastId: _id of the last exported document, or None if there is none.
+"""
+def _resumePoint(path):
+    with open(path, "rb+") as file:
+        position = file.seek(0, os.SEEK_END)
+        tail = b""
+        # Read backwards until the last complete line is in tail
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+            end = tail.rfind(b"\n")
+            if end >= 0 and (position == 0 or tail.rfind(b"\n", 0, end) >= 0):
+                break
+
+        end = tail.rfind(b"\n")
+        if end < 0:
+            file.truncate(0)
+            return None
+        file.truncate(position + end + 1)
+        start = tail.rfind(b"\n", 0, end) + 1
+        return json.loads(tail[start:end])["_id"]
+
+"""
+    Converts an _id read back from JSON to the collection's type: exported ObjectIds
+    are strings.
+"""
+def _storedId(collection, value):
+    if isinstance(value, str) and collection.find_one({"_id": value}, {"_id": 1}) is None:
+        try:
+            from bson import ObjectId
+            if ObjectId.is_valid(value):
+                return ObjectId(value)
+        except ImportError:
+            pass
+    return value
+
+"""
+    Exports the corpus as NDJSON: one line per document with _id, the EXPORT_FIELDS
+    and the normalized tokens of its text (not the text itself), in _id order. Memory
+    use does not depend on the corpus size.
+
+    Args:
+        path (str): Output file.
+        collection: Mongo collection; defaults to the RAW collection.
+        batchSize (int): Documents per cursor batch and per normalization batch.
+        processes (int): Worker processes for normalization.
+        resume (bool): Continue an interrupted export of path after its last complete
+        line instead of starting over.
+        fields (list): Fields to write besides _id and tokens.
+
+    Returns:
+        stats (dict): Number of documents exported and the _id the export resumed after.
+"""
+def exportCorpus(path, collection=None, batchSize=CORPUS_BATCH_SIZE, processes=None, resume=False,
+                 fields=EXPORT_FIELDS):
+    if collection is None:
+        collection = getCollection()
+    after = None
+    if resume and os.path.exists(path):
+        after = _resumePoint(path)
+        if after is not None:
+            after = _storedId(collection, after)
+
+    stats = {"exported": 0, "resumedAfter": after}
+    documents = iterDocuments(collection, list(fields) + ["text"], batchSize, after)
+    with open(path, "ab" if resume else "wb") as output:
+        for document, tokens in normalizeDocuments(documents, batchSize, processes):
+            record = {"_id": document["_id"]}
+            for field in fields:
+                record[field] = document.get(field)
+            record["tokens"] = tokens
+            output.write(encodeJsonLine(record))
+            stats["exported"] += 1
+            if stats["exported"] % batchSize == 0:
+                output.flush()
+                logging.info(f"Corpus export: {stats['exported']} document(s)")
+    return stats
+
+"""
+    Reads an export back, one record at a time.
+"""
+def readExport(path):
+    with open(path, "rb") as file:
+        for line in file:
+            yield json.loads(line)
+
+"""
+    Command line entry point. Run from the test/ directory:
+        python -m src.corpus export FILE [--batch-size N] [--processes N] [--resume]
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream and preprocess the RAW collection.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    exportParser = subcommands.add_parser("export", help="write normalized documents as NDJSON")
+    exportParser.add_argument("path")
+    exportParser.add_argument("--batch-size", type=int, default=CORPUS_BATCH_SIZE)
+    exportParser.add_argument("--processes", type=int, default=os.cpu_count())
+    exportParser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(exportCorpus(args.path, batchSize=args.batch_size, processes=args.processes, resume=args.resume))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.metrics import getMetrics
+
+# Seconds a query gets from receiveQuery (or /search) to its response
+QUERY_DEADLINE = float(os.environ.get("QUERY_DEADLINE", "5.0"))
+# Threads for calls that are waited on with a deadline (see callWithin)
+DEADLINE_WORKERS = int(os.environ.get("DEADLINE_WORKERS", "20"))
+
+_executor = None
+_executorLock = threading.Lock()
+
+"""
+    Raised when a query's deadline passes before a stage could finish.
+
+    Attributes:
+        stage (str): The stage that ran out of time.
+        exceeded (list): Every stage that ran out of time on the way (see flightWithin).
+"""
+class DeadlineExceeded(Exception):
+    def __init__(self, stage):
+        super().__init__(f"deadline exceeded in {stage}")
+        self.stage = stage
+        self.exceeded = [stage]
+
+"""
+    The time by which a query must be answered. It is created when the query is
+    received and handed to every stage, which waits at most remaining() and, once it
+    has passed, skips what it can (see expire()) so the query returns what it has.
+
+    Args:
+        seconds (float): Time budget from now.
+        clock (function): Monotonic time source, replaceable in tests.
+
+    Attributes:
+        exceeded (list): Stages that ran out of time, in order.
+"""
+class Deadline:
+    __slots__ = ("expiresAt", "clock", "exceeded")
+
+    def __init__(self, seconds=QUERY_DEADLINE, clock=time.monotonic):
+        self.clock = clock
+        self.expiresAt = clock() + seconds
+        self.exceeded = []
+
+    """
+        Returns the seconds left, never less than 0.
+    """
+    def remaining(self):
+        return max(self.expiresAt - self.clock(), 0.0)
+
+    def expired(self):
+        return self.clock() >= self.expiresAt
+
+    """
+        Returns the seconds a wait may take: what is left, or limit if that is sooner.
+    """
+    def timeout(self, limit=None):
+        remaining = self.remaining()
+        return remaining if limit is None else min(remaining, limit)
+
+    """
+        Records that stage ran out of time, once per stage, in the shared metrics.
+    """
+    def expire(self, stage):
+        if stage not in self.exceeded:
+            self.exceeded.append(stage)
+            getMetrics().deadlineExceeded(stage)
+            logging.warning(f"Query deadline exceeded in {stage}")
+
+    """
+        Raises DeadlineExceeded for stage if the deadline has passed.
+    """
+    def check(self, stage):
+        if self.expired():
+            self.expire(stage)
+            raise DeadlineExceeded(stage)
+
+def _getExecutor():
+    global _executor
+    if _executor is None:
+        with _executorLock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix="deadline")
+    return _executor
+
+"""
+    Forgets the pool in a forked child: its threads stayed behind in the parent, so
+    the child starts its own on first use (see src.server).
+"""
+def _resetAfterFork():
+    global _executor, _executorLock
+    _executor = None
+    _executorLock = threading.Lock()
+
+os.register_at_fork(after_in_child=_resetAfterFork)
+
+"""
+    Runs function() in the background and waits for it until the deadline. A call that
+    is still running then is left to finish on its own and its result is discarded, as
+    for a hedged ranking call (see localIndex.hedge).
+
+    Args:
+        function (function): The call, e.g. to the ranking service.
+        deadline (Deadline): Deadline to wait until; None waits for the call.
+        stage (str): Stage recorded if the deadline passes.
+
+    Returns:
+        result: What function returned.
+
+    Raises:
+        DeadlineExceeded: The deadline passed first.
+        Exception: Whatever function raised.
+"""
+def callWithin(function, deadline, stage):
+    if deadline is None:
+        return function()
+    deadline.check(stage)
+    future = _getExecutor().submit(function)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        future.cancel()
+        deadline.expire(stage)
+        raise DeadlineExceeded(stage)
+
+"""
+    Runs function(*args, deadline) as one call of flights (see src.singleFlight), so
+    that concurrent callers with the same key share it, and waits for it until the
+    deadline. The call runs under the deadline of whichever caller started it; a caller
+    that shares its result also records the stages that call ran out of time in, so a
+    result that was cut short is marked partial for every query that gets it.
+
+    Args:
+        flights (SingleFlight): Flights to share the call in.
+        key: Identifies calls that are interchangeable.
+        function (function): The call; takes the deadline as its last argument.
+        args (tuple): Arguments before the deadline.
+        deadline (Deadline): Deadline to wait until; None waits for the call.
+        stage (str): Stage recorded if the deadline passes while waiting.
+
+    Returns:
+        result: What function returned.
+
+    Raises:
+        DeadlineExceeded: The deadline passed first, here or in the shared call.
+        Exception: Whatever function raised.
+"""
+def flightWithin(flights, key, function, args, deadline, stage):
+    def call():
+        start = len(deadline.exceeded) if deadline is not None else 0
+        try:
+            result = function(*args, deadline)
+        except DeadlineExceeded as e:
+            if deadline is not None:
+                e.exceeded = deadline.exceeded[start:] or e.exceeded
+            raise
+        return result, deadline.exceeded[start:] if deadline is not None else []
+
+    try:
+        result, exceeded = flights.do(key, call, timeout=deadline.remaining() if deadline is not None else None)
+    except FutureTimeoutError:
+        deadline.expire(stage)
+        raise DeadlineExceeded(stage)
+    except DeadlineExceeded as e:
+        if deadline is not None:
+            for exceededStage in e.exceeded:
+                deadline.expire(exceededStage)
+        raise
+    if deadline is not None:
+        for exceededStage in exceeded:
+            deadline.expire(exceededStage)
+    return result
@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+# Total weight of cached documents; 0 disables the cache
+HOT_DOCUMENT_CACHE_BYTES = int(os.environ.get("HOT_DOCUMENT_CACHE_BYTES", str(64 * 1024 * 1024)))
+HOT_DOCUMENT_TTL = float(os.environ.get("HOT_DOCUMENT_TTL", "300"))
+# IDs that do not exist are remembered for a shorter time
+MISSING_DOCUMENT_TTL = float(os.environ.get("MISSING_DOCUMENT_TTL", "30"))
+# Invalidate entries from a Mongo change stream (needs a replica set)
+WATCH_DOCUMENT_CHANGES = os.environ.get("WATCH_DOCUMENT_CHANGES", "0") == "1"
+# Weight added per entry for the metadata fields and bookkeeping
+ENTRY_OVERHEAD = 512
+
+_MISSING = object()
+
+"""
+    Weight of a cached document: the characters of text held, or its text_length if
+    the text was not fetched, plus ENTRY_OVERHEAD.
+"""
+def documentWeight(document):
+    if document is _MISSING:
+        return ENTRY_OVERHEAD
+    text = document.get("text")
+    if isinstance(text, str):
+        return len(text) + ENTRY_OVERHEAD
+    return (document.get("text_length") or 0) + ENTRY_OVERHEAD
+
+"""
+    In-process cache of documents by _id, for documents that show up in many results.
+    Entries are evicted least recently used first once their total weight (see
+    documentWeight) passes maxBytes, so a few huge pages cannot crowd out everything
+    else. IDs that do not exist are cached too (negative caching), for missingTtl.
+    Safe to share between threads.
+
+    An entry remembers how much text it holds: a document fetched with its text cut
+    to n characters answers lookups for n or fewer characters, not for the whole text.
+
+    Args:
+        maxBytes (int): Total weight of the cached documents.
+        ttl (float): Seconds a document is kept.
+        missingTtl (float): Seconds a missing ID is kept.
+        clock (function): Monotonic time source, replaceable in tests.
+"""
+class HotDocumentCache:
+    def __init__(self, maxBytes=HOT_DOCUMENT_CACHE_BYTES, ttl=HOT_DOCUMENT_TTL, missingTtl=MISSING_DOCUMENT_TTL,
+                 clock=time.monotonic):
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.missingTtl = missingTtl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.missingHits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.watcher = None
+
+    """
+        Looks up a document.
+
+        Args:
+            docId: Document ID.
+            maxTextChars (int): Characters of text needed, or None for the whole text.
+
+        Returns:
+            found (bool): Whether the cache can answer.
+            document (dict): A copy of the document, or None if it is known not to exist.
+    """
+    def lookup(self, docId, maxTextChars=None):
+        with self.lock:
+            entry = self.entries.get(docId)
+            if entry is not None:
+                expiresAt, document, textChars, _ = entry
+                if expiresAt <= self.clock():
+                    self._remove(docId)
+                elif textChars is None or (maxTextChars is not None and textChars >= maxTextChars):
+                    self.entries.move_to_end(docId)
+                    if document is _MISSING:
+                        self.missingHits += 1
+                        return True, None
+                    self.hits += 1
+                    document = dict(document)
+                    text = document.get("text")
+                    if maxTextChars is not None and isinstance(text, str) and len(text) > maxTextChars:
+                        document["text"] = text[:maxTextChars]
+                    return True, document
+            self.misses += 1
+            return False, None
+
+    """
+        Caches a fetched document.
+
+        Args:
+            document (dict): The document, with _id.
+            maxTextChars (int): Characters of text it was fetched with, or None.
+    """
+    def put(self, document, maxTextChars=None):
+        text = document.get("text")
+        if maxTextChars is not None and (not isinstance(text, str) or len(text) < maxTextChars):
+            maxTextChars = None
+        self._store(document["_id"], dict(document), maxTextChars, self.ttl)
+
+    """
+        Remembers that an ID does not exist.
+    """
+    def putMissing(self, docId):
+        self._store(docId, _MISSING, None, self.missingTtl)
+
+    def _store(self, docId, document, textChars, ttl):
+        weight = documentWeight(document)
+        if weight > self.maxBytes:
+            return
+        with self.lock:
+            self._remove(docId)
+            self.entries[docId] = (self.clock() + ttl, document, textChars, weight)
+            self.bytes += weight
+            while self.bytes > self.maxBytes:
+                evictedId = next(iter(self.entries))
+                self._remove(evictedId)
+                self.evictions += 1
+
+    def _remove(self, docId):
+        entry = self.entries.pop(docId, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    """
+        Drops a document, e.g. after it changed.
+    """
+    def invalidate(self, docId):
+        with self.lock:
+            self._remove(docId)
+            self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    """
+        Returns hit/miss counters, the hit rate (including hits on missing IDs) and the
+        cache's size.
+    """
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.missingHits + self.misses
+            return {
+                "hits": self.hits,
+                "missingHits": self.missingHits,
+                "misses": self.misses,
+                "hitRate": (self.hits + self.missingHits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    """
+        Invalidates entries from a stream of Mongo change events until it ends. An
+        insert also drops a negative entry for the new ID.
+
+        Args:
+            changeStream (iterable): Change events with operationType and documentKey,
+            such as collection.watch().
+    """
+    def follow(self, changeStream):
+        for change in changeStream:
+            documentKey = change.get("documentKey") or {}
+            if "_id" in documentKey:
+                self.invalidate(documentKey["_id"])
+            elif change.get("operationType") in ("drop", "rename", "dropDatabase", "invalidate"):
+                self.clear()
+
+    """
+        Follows collection.watch() on a background thread. If the stream fails, the
+        cache is cleared (changes may have been missed) and the stream is reopened.
+
+        Args:
+            collection: Mongo collection to watch.
+            retryDelay (float): Seconds to wait before reopening a failed stream.
+    """
+    def watch(self, collection, retryDelay=1.0):
+        def run():
+            while True:
+                try:
+                    with collection.watch() as changeStream:
+                        self.follow(changeStream)
+                except Exception as e:
+                    logging.error(f"Error in document change stream: {str(e)}")
+                self.clear()
+                time.sleep(retryDelay)
+
+        self.watcher = threading.Thread(target=run, daemon=True, name="document-change-stream")
+        self.watcher.start()
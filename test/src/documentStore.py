@@ -0,0 +1,267 @@
+import os
+import threading
+import logging
+from src.metrics import timed
+from src.documentCache import HotDocumentCache, HOT_DOCUMENT_CACHE_BYTES, WATCH_DOCUMENT_CHANGES
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://128.113.126.79:27017")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "test")
+MONGO_COLLECTION = os.environ.get("MONGO_COLLECTION", "RAW")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+
+# Fields returned for a document lookup; _id is always included by Mongo
+DOCUMENT_FIELDS = ["url", "title", "type", "text", "text_length"]
+
+_client = None
+_clientLock = threading.Lock()
+# Whether the server can cut text down in a projection ($substrCP needs MongoDB 4.4);
+# None until the first lookup with maxTextChars finds out
+_serverTruncation = None
+_documentCache = None
+_documentCacheLock = threading.Lock()
+
+"""
+    Returns the process-wide MongoClient, creating it on first use. MongoClient is
+    thread-safe and keeps its own connection pool, so every caller shares one client
+    instead of paying a connection handshake per lookup.
+
+    Returns:
+        client (MongoClient): Shared client for the Document Data Store.
+"""
+def getClient():
+    global _client
+    if _client is None:
+        with _clientLock:
+            if _client is None:
+                # Imported here so processes that never touch Mongo don't load pymongo
+                from pymongo import MongoClient
+                _client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _client
+
+"""
+    Replaces the shared client, e.g. with a mongomock client in tests. Passing None
+    closes the current client so the next getClient() call reconnects.
+
+    Args:
+        client: A MongoClient-compatible object, or None.
+"""
+def setClient(client):
+    global _client
+    with _clientLock:
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client
+    # Cached documents came from the old client
+    if _documentCache is not None:
+        _documentCache.clear()
+
+"""
+    Closes the shared client, if one was created.
+"""
+def closeClient():
+    setClient(None)
+
+"""
+    Returns the collection holding the crawled documents.
+"""
+def getCollection():
+    return getClient()[MONGO_DATABASE][MONGO_COLLECTION]
+
+"""
+    Returns the shared HotDocumentCache used by getDocuments and getDocumentsMany, or
+    None if HOT_DOCUMENT_CACHE_BYTES is 0. With WATCH_DOCUMENT_CHANGES, the cache
+    follows the collection's change stream from its first use.
+"""
+def getDocumentCache():
+    global _documentCache
+    if _documentCache is None and HOT_DOCUMENT_CACHE_BYTES > 0:
+        with _documentCacheLock:
+            if _documentCache is None:
+                cache = HotDocumentCache()
+                if WATCH_DOCUMENT_CHANGES:
+                    cache.watch(getCollection())
+                _documentCache = cache
+    return _documentCache
+
+"""
+    Replaces the shared HotDocumentCache; None goes back to the default one on next use.
+"""
+def setDocumentCache(cache):
+    global _documentCache
+    with _documentCacheLock:
+        _documentCache = cache
+
+"""
+    Builds a Mongo projection from a list of field names.
+
+    Args:
+        fields (list): Field names to return, or None for the whole document.
+        maxTextChars (int): Return at most this many characters of text, or None.
+
+    Returns:
+        projection (dict): Projection for find(), or None.
+"""
+def buildProjection(fields, maxTextChars=None):
+    if fields is None:
+        return None
+    projection = {field: 1 for field in fields}
+    if maxTextChars is not None and "text" in projection:
+        projection["text"] = {"$substrCP": ["$text", 0, maxTextChars]}
+    return projection
+
+def _projectionErrors():
+    try:
+        from pymongo.errors import OperationFailure
+        return (ValueError, NotImplementedError, OperationFailure)
+    except ImportError:
+        return (ValueError, NotImplementedError)
+
+"""
+    Runs a find() and returns the documents, with text cut down to maxTextChars. The
+    server does the cutting when it can, so long texts never leave Mongo; otherwise
+    (older servers, mongomock) the text is cut after the fetch.
+"""
+def _find(query, fields, maxTextChars=None, limit=0):
+    global _serverTruncation
+    truncate = maxTextChars is not None and fields is not None and "text" in fields
+    if truncate and _serverTruncation is not False:
+        try:
+            documents = list(getCollection().find(query, buildProjection(fields, maxTextChars)).limit(limit))
+            _serverTruncation = True
+            return documents
+        except _projectionErrors() as e:
+            if _serverTruncation:
+                raise
+            logging.warning(f"Document store cannot truncate text in a projection, truncating after fetch: {str(e)}")
+            _serverTruncation = False
+
+    documents = list(getCollection().find(query, buildProjection(fields)).limit(limit))
+    if truncate:
+        for document in documents:
+            text = document.get("text")
+            if isinstance(text, str) and len(text) > maxTextChars:
+                document["text"] = text[:maxTextChars]
+    return documents
+
+def _matchesValue(value, expected):
+    if hasattr(expected, "search"):
+        return isinstance(value, str) and expected.search(value) is not None
+    return value == expected
+
+"""
+    Checks a document against a filter of the form queryModel.mongoFilter() builds
+    ({field: {"$in": [...], "$nin": [...]}} with values or compiled regexes), the way
+    Mongo would.
+
+    Returns:
+        matches (bool): Whether the document matches, or None if the filter uses
+        anything else and only Mongo can tell.
+"""
+def matchesConditions(document, conditions):
+    for field, operators in (conditions or {}).items():
+        if not isinstance(operators, dict) or not set(operators) <= {"$in", "$nin"}:
+            return None
+        value = document.get(field)
+        if "$in" in operators and not any(_matchesValue(value, expected) for expected in operators["$in"]):
+            return False
+        if "$nin" in operators and any(_matchesValue(value, expected) for expected in operators["$nin"]):
+            return False
+    return True
+
+"""
+    Function to fetch document metadata and content from the Document Data Store API.
+
+    Args:
+        docId (int): Document ID.
+        fields (list): Fields to return; defaults to DOCUMENT_FIELDS.
+        conditions (dict): Extra Mongo filter the document must match, e.g. from
+        queryModel.mongoFilter().
+        maxTextChars (int): Return at most this many characters of text; None returns
+        the whole text.
+
+    Returns:
+        document (list): Contains the matching document (metadata, title, link, and text
+        content), or an empty list if the ID does not exist or does not match.
+
+    Lookups of the default fields go through the hot document cache (see
+    getDocumentCache), which also remembers IDs that do not exist.
+"""
+def getDocuments(docID, fields=DOCUMENT_FIELDS, conditions=None, maxTextChars=None):
+    try:
+        cache = getDocumentCache() if fields == DOCUMENT_FIELDS else None
+        if cache is not None:
+            found, document = cache.lookup(docID, maxTextChars)
+            if found:
+                if document is None:
+                    return []
+                matches = matchesConditions(document, conditions)
+                if matches is not None:
+                    return [document] if matches else []
+
+        with timed("mongo"):
+            documents = _find(dict(conditions or {}, _id=docID), fields, maxTextChars, limit=1)
+
+        if cache is not None:
+            if documents:
+                cache.put(documents[0], maxTextChars)
+            elif not conditions:
+                cache.putMissing(docID)
+        return documents
+
+    except Exception as e:
+        logging.error(f"Error in getDocuments: {str(e)}")
+        return []
+
+"""
+    Fetches a whole page of documents with a single $in query.
+
+    Args:
+        docIDs (list): Ranked document IDs.
+        fields (list): Fields to return; defaults to DOCUMENT_FIELDS.
+        conditions (dict): Extra Mongo filter the documents must match.
+        maxTextChars (int): Return at most this many characters of text; None returns
+        the whole text.
+
+    Returns:
+        documents (list): Documents in the same order as docIDs. IDs that do not exist
+        or do not match are skipped.
+
+    Only the IDs the hot document cache cannot answer are fetched.
+"""
+def getDocumentsMany(docIDs, fields=DOCUMENT_FIELDS, conditions=None, maxTextChars=None):
+    try:
+        docIDs = list(docIDs)
+        if not docIDs:
+            return []
+
+        documentsById = {}
+        missed = docIDs
+        cache = getDocumentCache() if fields == DOCUMENT_FIELDS else None
+        if cache is not None:
+            missed = []
+            for docID in docIDs:
+                found, document = cache.lookup(docID, maxTextChars)
+                matches = matchesConditions(document, conditions) if document is not None else False
+                if not found or matches is None:
+                    missed.append(docID)
+                elif matches:
+                    documentsById[docID] = document
+
+        if missed:
+            with timed("mongo"):
+                documents = _find(dict(conditions or {}, _id={"$in": missed}), fields, maxTextChars)
+            for document in documents:
+                documentsById[document["_id"]] = document
+                if cache is not None:
+                    cache.put(document, maxTextChars)
+            if cache is not None and not conditions:
+                for docID in missed:
+                    if docID not in documentsById:
+                        cache.putMissing(docID)
+
+        # Mongo returns $in matches in storage order, so restore the rank order
+        return [documentsById[docID] for docID in docIDs if docID in documentsById]
+
+    except Exception as e:
+        logging.error(f"Error in getDocumentsMany: {str(e)}")
+        return []
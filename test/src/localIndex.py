@@ -0,0 +1,455 @@
+import os
+import sys
+import math
+import mmap
+import json
+import array
+import heapq
+import struct
+import logging
+import argparse
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.config import DATA_DIR
+from src.corpus import iterDocuments, normalizeDocuments
+from src.documentStore import getCollection
+from src.rankingClient import ScoredDocument
+from src.queryModel import queryTerms
+
+LOCAL_INDEX_PATH = os.environ.get("LOCAL_INDEX_PATH", os.path.join(DATA_DIR, "localIndex.bin"))
+# Seconds the ranking service gets before the local index answers instead
+RANKING_DEADLINE = float(os.environ.get("RANKING_DEADLINE", "0.5"))
+LOCAL_RESULT_LIMIT = int(os.environ.get("LOCAL_RESULT_LIMIT", "1000"))
+HEDGE_WORKERS = int(os.environ.get("HEDGE_WORKERS", "20"))
+BM25_K1 = float(os.environ.get("BM25_K1", "1.2"))
+BM25_B = float(os.environ.get("BM25_B", "0.75"))
+
+_MAGIC = b"LSIDX001"
+
+"""
+    In-process BM25 inverted index over the RAW collection, used when the ranking service
+    is slow or down. Documents are normalized exactly like queries (parseSearchQuery), so
+    query tokens look up postings directly.
+
+    Postings are flat uint32 arrays: term t owns positions termOffsets[t] to
+    termOffsets[t + 1] of postingDocs (document numbers, ascending) and postingFreqs
+    (term frequencies). A saved index is memory-mapped on load, so the arrays are read
+    from the page cache instead of being parsed into Python objects.
+
+    Attributes:
+        docIds (list): Document _id of each document number.
+        terms (dict): Term -> term number.
+        termOffsets, postingDocs, postingFreqs, docLengths: uint32 sequences (array or
+        memoryview).
+"""
+class LocalIndex:
+    def __init__(self, docIds, terms, termOffsets, postingDocs, postingFreqs, docLengths,
+                 averageLength=None, buffer=None):
+        self.docIds = docIds
+        self.terms = terms
+        self.termOffsets = termOffsets
+        self.postingDocs = postingDocs
+        self.postingFreqs = postingFreqs
+        self.docLengths = docLengths
+        self.buffer = buffer
+        if averageLength is None:
+            averageLength = sum(docLengths) / len(docLengths) if len(docLengths) else 0.0
+        self.averageLength = averageLength
+
+    """
+        Builds an index from (docId, tokens) pairs.
+
+        Args:
+            documents (iterable): (docId, tokens) pairs, tokens from normalize().
+
+        Returns:
+            index (LocalIndex): The index.
+    """
+    @classmethod
+    def fromTokens(cls, documents):
+        docIds = []
+        docLengths = array.array("I")
+        postings = {}
+        for docId, tokens in documents:
+            docNumber = len(docIds)
+            docIds.append(str(docId))
+            docLengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                if token not in postings:
+                    postings[token] = (array.array("I"), array.array("I"))
+                postings[token][0].append(docNumber)
+                postings[token][1].append(count)
+
+        terms = {}
+        termOffsets = array.array("I", [0])
+        postingDocs = array.array("I")
+        postingFreqs = array.array("I")
+        for term in sorted(postings):
+            docs, freqs = postings[term]
+            terms[term] = len(terms)
+            postingDocs.extend(docs)
+            postingFreqs.extend(freqs)
+            termOffsets.append(len(postingDocs))
+        return cls(docIds, terms, termOffsets, postingDocs, postingFreqs, docLengths)
+
+    """
+        Indexes a collection in streaming batches.
+
+        Args:
+            collection: Mongo collection of documents with a text field.
+            batchSize (int): Documents per cursor batch and per normalization batch.
+            processes (int): Worker processes used to normalize the text (see
+            corpus.normalizeDocuments).
+
+        Returns:
+            index (LocalIndex): The index.
+    """
+    @classmethod
+    def build(cls, collection, batchSize=500, processes=None):
+        documents = iterDocuments(collection, ["text"], batchSize)
+        return cls.fromTokens((document["_id"], tokens) for document, tokens
+                              in normalizeDocuments(documents, batchSize, processes))
+
+    """
+        Writes the index to one file: a JSON header with the document IDs and terms,
+        followed by the uint32 arrays.
+
+        Args:
+            path (str): Destination file; written to a temporary file and renamed. Its
+            directory is created if needed.
+    """
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        header = json.dumps({"docIds": self.docIds, "terms": list(self.terms),
+                             "averageLength": self.averageLength}).encode()
+        header += b" " * (-len(header) % 4)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as output:
+            output.write(_MAGIC)
+            output.write(struct.pack("<QQQ", len(header), len(self.termOffsets), len(self.postingDocs)))
+            output.write(header)
+            for values in (self.termOffsets, self.postingDocs, self.postingFreqs, self.docLengths):
+                output.write(memoryview(values).cast("B"))
+        os.replace(temporary, path)
+
+    """
+        Memory-maps an index written by save().
+
+        Args:
+            path (str): Index file.
+
+        Returns:
+            index (LocalIndex): The index; call close() to unmap it.
+
+        Raises:
+            ValueError: The file is not a local index.
+    """
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as source:
+            buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(_MAGIC)] != _MAGIC:
+            buffer.close()
+            raise ValueError(f"{path} is not a local index")
+
+        start = len(_MAGIC) + 24
+        headerLength, numOffsets, numPostings = struct.unpack("<QQQ", buffer[len(_MAGIC):start])
+        header = json.loads(buffer[start:start + headerLength])
+        docIds = header["docIds"]
+
+        view = memoryview(buffer)
+        arrays = []
+        offset = start + headerLength
+        for length in (numOffsets, numPostings, numPostings, len(docIds)):
+            arrays.append(view[offset:offset + 4 * length].cast("I"))
+            offset += 4 * length
+        terms = {term: number for number, term in enumerate(header["terms"])}
+        return cls(docIds, terms, *arrays, averageLength=header["averageLength"], buffer=buffer)
+
+    def close(self):
+        if self.buffer is not None:
+            for values in (self.termOffsets, self.postingDocs, self.postingFreqs, self.docLengths):
+                values.release()
+            self.buffer.close()
+            self.buffer = None
+
+    def _postings(self, term):
+        number = self.terms.get(term)
+        if number is None:
+            return None
+        return self.termOffsets[number], self.termOffsets[number + 1]
+
+    """
+        Scores documents for a structured query from generateQueries() or
+        queryModel.parseQuery().
+
+        A flat "AND" of tokens needs every token and a flat "OR" any of them. Query trees
+        are evaluated by _evaluate(); phrases match documents containing all of their
+        words, since postings have no positions (phrases and field filters are checked
+        when documents are retrieved). Scores are BM25 summed over the distinct tokens
+        outside NOT.
+
+        Args:
+            structuredQuery (dict): {"operation": ..., "terms": [...]}.
+            limit (int): Maximum number of results; defaults to LOCAL_RESULT_LIMIT.
+
+        Returns:
+            scores (list): ScoredDocument tuples, best first.
+    """
+    def search(self, structuredQuery, limit=None):
+        if limit is None:
+            limit = LOCAL_RESULT_LIMIT
+        children = structuredQuery.get("terms") or []
+        if not all(isinstance(child, str) for child in children):
+            return self._searchTree(structuredQuery, limit)
+
+        terms = list(dict.fromkeys(children))
+        requireAll = structuredQuery.get("operation", "AND") == "AND"
+
+        ranges = [self._postings(term) for term in terms]
+        if requireAll and (not ranges or None in ranges):
+            return []
+        ranges = sorted((r for r in ranges if r is not None), key=lambda r: r[1] - r[0])
+        if not ranges:
+            return []
+
+        postingDocs = self.postingDocs
+        scorer = self._scorer(ranges)
+        scores = {}
+        if requireAll:
+            # Walk the rarest term's postings and binary-search the others; documents are
+            # ascending, so each search starts where the previous one ended
+            start, end = ranges[0]
+            candidates = [(postingDocs[j], [j]) for j in range(start, end)]
+            for otherStart, otherEnd in ranges[1:]:
+                kept = []
+                for doc, positions in candidates:
+                    otherStart = bisect_left(postingDocs, doc, otherStart, otherEnd)
+                    if otherStart < otherEnd and postingDocs[otherStart] == doc:
+                        positions.append(otherStart)
+                        kept.append((doc, positions))
+                candidates = kept
+            for doc, positions in candidates:
+                scores[doc] = sum(scorer(k, j, doc) for k, j in enumerate(positions))
+        else:
+            for k, (start, end) in enumerate(ranges):
+                for j in range(start, end):
+                    doc = postingDocs[j]
+                    scores[doc] = scores.get(doc, 0.0) + scorer(k, j, doc)
+
+        return self._top(scores, limit)
+
+    def _searchTree(self, structuredQuery, limit):
+        docs = self._evaluate(structuredQuery)
+        if docs is None:
+            docs = range(len(self.docIds))
+        if not docs:
+            return []
+
+        ranges = [r for r in map(self._postings, queryTerms(structuredQuery)) if r is not None]
+        postingDocs = self.postingDocs
+        scorer = self._scorer(ranges)
+        scores = dict.fromkeys(docs, 0.0)
+        for k, (start, end) in enumerate(ranges):
+            for doc in docs:
+                j = bisect_left(postingDocs, doc, start, end)
+                if j < end and postingDocs[j] == doc:
+                    scores[doc] += scorer(k, j, doc)
+        return self._top(scores, limit)
+
+    """
+        Estimated number of documents matching a node, used to order AND clauses.
+    """
+    def _estimate(self, node):
+        if isinstance(node, str):
+            postingRange = self._postings(node)
+            return postingRange[1] - postingRange[0] if postingRange else 0
+        operation = node["operation"]
+        if operation == "NOT":
+            return len(self.docIds)
+        if operation == "OR":
+            return sum(self._estimate(child) for child in node["terms"])
+        return min((self._estimate(child) for child in node["terms"]), default=len(self.docIds))
+
+    """
+        Document numbers matching a query tree node, or None for "every document" (an
+        AND with only NOT clauses). AND clauses are evaluated rarest first and stop as
+        soon as the intersection is empty; once the candidates are few, a token is
+        checked by binary search in its postings instead of reading all of them.
+
+        Args:
+            node: Token or query tree node.
+            candidates (set): Only these documents can match, or None.
+
+        Returns:
+            docs (set): Matching document numbers.
+    """
+    def _evaluate(self, node, candidates=None):
+        if isinstance(node, str):
+            postingRange = self._postings(node)
+            if postingRange is None:
+                return set()
+            start, end = postingRange
+            postingDocs = self.postingDocs
+            if candidates is not None and len(candidates) * 8 < end - start:
+                found = set()
+                for doc in candidates:
+                    j = bisect_left(postingDocs, doc, start, end)
+                    if j < end and postingDocs[j] == doc:
+                        found.add(doc)
+                return found
+            docs = set(postingDocs[start:end])
+            return docs if candidates is None else docs & candidates
+
+        operation = node["operation"]
+        children = node["terms"]
+        if operation == "OR":
+            docs = set()
+            for child in children:
+                docs |= self._evaluate(child, candidates)
+            return docs
+        if operation == "NOT":
+            # Only reached for a NOT outside an AND; complement it
+            excluded = self._evaluate(children[0], candidates)
+            universe = candidates if candidates is not None else set(range(len(self.docIds)))
+            return universe - excluded
+
+        # AND and PHRASE
+        positive = sorted((child for child in children if isinstance(child, str) or child["operation"] != "NOT"),
+                          key=self._estimate)
+        negative = [child["terms"][0] for child in children if not isinstance(child, str) and child["operation"] == "NOT"]
+        docs = candidates
+        for child in positive:
+            docs = self._evaluate(child, docs)
+            if not docs:
+                return set()
+        for child in negative:
+            if docs is None:
+                docs = set(range(len(self.docIds)))
+            docs = docs - self._evaluate(child, docs)
+            if not docs:
+                return set()
+        return docs
+
+    """
+        Returns a function scoring posting j of the k-th range for document doc with BM25.
+    """
+    def _scorer(self, ranges):
+        numDocs = len(self.docIds)
+        postingFreqs, docLengths = self.postingFreqs, self.docLengths
+        idfs = [math.log(1 + (numDocs - (end - start) + 0.5) / (end - start + 0.5)) for start, end in ranges]
+        lengthNorm = BM25_B / self.averageLength if self.averageLength else 0.0
+
+        def score(k, j, doc):
+            frequency = postingFreqs[j]
+            return idfs[k] * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + lengthNorm * docLengths[doc]))
+
+        return score
+
+    def _top(self, scores, limit):
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [ScoredDocument(self.docIds[doc], value) for doc, value in best]
+
+_index = None
+_indexLoaded = False
+_indexLock = threading.Lock()
+
+"""
+    Returns the shared LocalIndex, or None if LOCAL_INDEX_PATH does not exist (build it
+    with `python -m src.localIndex build`).
+"""
+def getLocalIndex():
+    global _index, _indexLoaded
+    if not _indexLoaded:
+        with _indexLock:
+            if not _indexLoaded:
+                try:
+                    _index = LocalIndex.load(LOCAL_INDEX_PATH) if os.path.exists(LOCAL_INDEX_PATH) else None
+                except Exception as e:
+                    logging.error(f"Error loading local index: {str(e)}")
+                    _index = None
+                _indexLoaded = True
+    return _index
+
+"""
+    Replaces the shared LocalIndex; None disables the fallback.
+"""
+def setLocalIndex(index):
+    global _index, _indexLoaded
+    with _indexLock:
+        if _index is not None and _index is not index:
+            _index.close()
+        _index = index
+        _indexLoaded = True
+
+_executor = None
+_executorLock = threading.Lock()
+
+def _getExecutor():
+    global _executor
+    if _executor is None:
+        with _executorLock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _executor
+
+"""
+    Forgets the pool in a forked child: its threads stayed behind in the parent, so
+    the child starts its own on first use (see src.server).
+"""
+def _resetAfterFork():
+    global _executor, _executorLock
+    _executor = None
+    _executorLock = threading.Lock()
+
+os.register_at_fork(after_in_child=_resetAfterFork)
+
+"""
+    Calls primary in the background and waits up to deadline seconds for it. If it is
+    late or fails, fallback answers instead; a late primary call is left to finish on
+    its own and its result is discarded.
+
+    Args:
+        primary (function): The preferred source, e.g. the ranking service.
+        fallback (function): Fast local source.
+        deadline (float): Seconds to wait for primary; defaults to RANKING_DEADLINE.
+
+    Returns:
+        result: The primary or fallback result.
+        fromPrimary (bool): Whether primary answered.
+"""
+def hedge(primary, fallback, deadline=None):
+    future = _getExecutor().submit(primary)
+    try:
+        return future.result(timeout=RANKING_DEADLINE if deadline is None else deadline), True
+    except FutureTimeoutError:
+        logging.warning("Ranking service missed its deadline; answering from the local index")
+    except Exception as e:
+        logging.error(f"Ranking service failed; answering from the local index: {str(e)}")
+    return fallback(), False
+
+"""
+    Command line entry point. Run from the test/ directory:
+        python -m src.localIndex build [--batch-size N] [--processes N] [--path FILE]
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local BM25 fallback index.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    buildParser = subcommands.add_parser("build", help="index the RAW collection")
+    buildParser.add_argument("--batch-size", type=int, default=500)
+    buildParser.add_argument("--processes", type=int, default=None)
+    buildParser.add_argument("--path", default=LOCAL_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = LocalIndex.build(getCollection(), args.batch_size, args.processes)
+    index.save(args.path)
+    print({"documents": len(index.docIds), "terms": len(index.terms), "postings": len(index.postingDocs)})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+import os
+import sys
+import time
+import bisect
+import logging
+import threading
+from collections import Counter
+
+# Queries slower than this are passed to the slow query hook
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_SECONDS", "1.0"))
+# Sample the stacks of running queries so slow ones can be explained
+PROFILE_SLOW_QUERIES = os.environ.get("PROFILE_SLOW_QUERIES", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+
+# Histogram bucket upper bounds in seconds: 10us to ~95s, sqrt(2) apart
+BUCKETS = tuple(1e-5 * 2 ** (i / 2) for i in range(47))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_registry = None
+_registryLock = threading.Lock()
+_slowQueryHook = None
+_profiler = None
+
+"""
+    Latency histogram with fixed exponential buckets, safe to share between threads.
+    Quantiles are interpolated within a bucket, so they are accurate to about 40%.
+
+    Args:
+        bounds (tuple): Increasing bucket upper bounds in seconds.
+"""
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    """
+        Estimates the q-quantile of the observed durations.
+
+        Returns:
+            seconds (float): The estimate; 0.0 if nothing was observed.
+    """
+    def quantile(self, q):
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucketCount in enumerate(counts):
+            if bucketCount and seen + bucketCount >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucketCount
+            seen += bucketCount
+        return self.bounds[-1]
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.count, self.sum
+
+"""
+    Per-stage latency histograms for the query pipeline. Stages:
+
+        queue      waiting in the processing queue
+        parse      generateQueries()
+        rank       rankQuery(), including ranking cache hits
+        filter     narrowing the ranking to documents matching the query's filters
+        fetch      fetching a page of documents
+        mongo      one document store lookup
+        snippet    building one result with its snippet
+        send       sendDocuments()
+        serialize  encoding one streamed result
+        total      a whole query, from the worker or /search picking it up
+
+    Also counts queries that ran out of their deadline, by the stage that noticed (see
+    src.deadline).
+"""
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self.deadlinesExceeded = Counter()
+        self.lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def deadlineExceeded(self, stage):
+        with self.lock:
+            self.deadlinesExceeded[stage] += 1
+
+    """
+        Returns count, mean and the QUANTILES of every stage, in seconds.
+    """
+    def summary(self):
+        summary = {}
+        for stage, histogram in sorted(self.histograms.items()):
+            _, count, total = histogram.snapshot()
+            summary[stage] = {"count": count, "mean": total / count if count else 0.0}
+            for q in QUANTILES:
+                summary[stage][f"p{round(q * 100)}"] = histogram.quantile(q)
+        return summary
+
+    """
+        Renders the histograms in the Prometheus text exposition format, as
+        search_stage_seconds (histogram) and search_stage_quantile_seconds (gauge), and
+        the deadline counts as search_deadline_exceeded_total (counter).
+
+        Args:
+            gauges (dict): Extra gauges to include, by metric name.
+            counters (dict): Extra counters to include, by metric name (ending in _total).
+
+        Returns:
+            text (str): The exposition.
+    """
+    def render(self, gauges=None, counters=None):
+        lines = ["# HELP search_stage_seconds Query pipeline stage latency.",
+                 "# TYPE search_stage_seconds histogram"]
+        quantileLines = ["# HELP search_stage_quantile_seconds Estimated stage latency quantiles.",
+                         "# TYPE search_stage_quantile_seconds gauge"]
+        for stage, histogram in sorted(self.histograms.items()):
+            counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, bucketCount in zip(histogram.bounds, counts):
+                cumulative += bucketCount
+                lines.append(f'search_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'search_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'search_stage_seconds_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'search_stage_seconds_count{{stage="{stage}"}} {count}')
+            for q in QUANTILES:
+                quantileLines.append(f'search_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                                     f'{histogram.quantile(q):.9g}')
+        lines += quantileLines
+
+        with self.lock:
+            deadlinesExceeded = sorted(self.deadlinesExceeded.items())
+        lines += ["# HELP search_deadline_exceeded_total Queries that ran out of time, by stage.",
+                  "# TYPE search_deadline_exceeded_total counter"]
+        for stage, count in deadlinesExceeded:
+            lines.append(f'search_deadline_exceeded_total{{stage="{stage}"}} {count}')
+
+        for kind, metrics in (("counter", counters), ("gauge", gauges)):
+            for name, value in sorted((metrics or {}).items()):
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {float(value):.9g}")
+        return "\n".join(lines) + "\n"
+
+"""
+    Returns the shared MetricsRegistry, creating it on first use.
+"""
+def getMetrics():
+    global _registry
+    if _registry is None:
+        with _registryLock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+"""
+    Replaces the shared MetricsRegistry; None starts a fresh one on next use.
+"""
+def setMetrics(registry):
+    global _registry
+    with _registryLock:
+        _registry = registry
+
+def observe(stage, seconds):
+    getMetrics().observe(stage, seconds)
+
+"""
+    Times one stage into the shared histograms (and a Trace's stages, if it has one).
+    Used through Trace.span() or timed().
+"""
+class Span:
+    __slots__ = ("stage", "trace", "startTime")
+
+    def __init__(self, stage, trace=None):
+        self.stage = stage
+        self.trace = trace
+
+    def __enter__(self):
+        self.startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        seconds = time.perf_counter() - self.startTime
+        if self.trace is not None:
+            self.trace.stages[self.stage] = self.trace.stages.get(self.stage, 0.0) + seconds
+        getMetrics().observe(self.stage, seconds)
+        return False
+
+"""
+    Times a stage that is not part of a traced query, e.g. one Mongo lookup:
+
+        with timed("mongo"):
+            ...
+"""
+def timed(stage):
+    return Span(stage)
+
+"""
+    Per-query record of stage durations. Spans observe into the shared histograms as
+    they finish; finish() records the total and hands slow queries to the slow query
+    hook. With PROFILE_SLOW_QUERIES on, the thread that created the trace is sampled
+    while it runs, so the hook also gets the stacks the query spent its time in.
+
+    Args:
+        name (str): What the query was, for logging.
+        profile (bool): Whether the creating thread may be sampled; turn it off for
+        traces on a thread that serves many queries, such as the event loop.
+"""
+class Trace:
+    __slots__ = ("name", "startTime", "stages", "samples", "threadId")
+
+    def __init__(self, name="", profile=True):
+        self.name = name
+        self.stages = {}
+        self.samples = None
+        self.threadId = threading.get_ident()
+        self.startTime = time.perf_counter()
+        if profile and PROFILE_SLOW_QUERIES:
+            self.samples = Counter()
+            getProfiler().attach(self)
+
+    def span(self, stage):
+        return Span(stage, self)
+
+    """
+        Ends the trace.
+
+        Returns:
+            seconds (float): Total query time.
+    """
+    def finish(self):
+        seconds = time.perf_counter() - self.startTime
+        if self.samples is not None:
+            getProfiler().detach(self)
+        getMetrics().observe("total", seconds)
+        if seconds >= SLOW_QUERY_SECONDS:
+            try:
+                (_slowQueryHook or logSlowQuery)(self, seconds)
+            except Exception as e:
+                logging.error(f"Error in slow query hook: {str(e)}")
+        return seconds
+
+"""
+    Default slow query hook: logs the stage times and, when profiled, the most
+    sampled stacks.
+"""
+def logSlowQuery(trace, seconds):
+    stages = ", ".join(f"{stage}={stageSeconds * 1000:.2f}ms" for stage, stageSeconds in trace.stages.items())
+    logging.warning(f"Slow query '{trace.name}': {seconds * 1000:.2f}ms ({stages})")
+    for stack, count in (trace.samples or Counter()).most_common(3):
+        logging.warning(f"  {count} samples in {stack}")
+
+"""
+    Installs a function called as hook(trace, seconds) for every query slower than
+    SLOW_QUERY_SECONDS; None restores logSlowQuery.
+"""
+def setSlowQueryHook(hook):
+    global _slowQueryHook
+    _slowQueryHook = hook
+
+"""
+    Background thread that samples the innermost frames of the threads running
+    profiled traces every interval seconds.
+
+    Args:
+        interval (float): Seconds between samples.
+        depth (int): Frames kept per sample, innermost first.
+"""
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL, depth=8):
+        self.interval = interval
+        self.depth = depth
+        self.traces = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def attach(self, trace):
+        with self.lock:
+            self.traces[trace.threadId] = trace
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+                self.thread.start()
+
+    def detach(self, trace):
+        with self.lock:
+            if self.traces.get(trace.threadId) is trace:
+                del self.traces[trace.threadId]
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                traces = list(self.traces.items())
+            if not traces:
+                continue
+            frames = sys._current_frames()
+            for threadId, trace in traces:
+                frame = frames.get(threadId)
+                if frame is not None:
+                    trace.samples[self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return " <- ".join(names)
+
+def getProfiler():
+    global _profiler
+    if _profiler is None:
+        with _registryLock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+    return _profiler
@@ -0,0 +1,100 @@
+import os
+import json
+import base64
+from collections import namedtuple
+
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "10"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "100"))
+# Ranked results kept per query; pages past this are empty
+MAX_RESULTS = int(os.environ.get("MAX_RESULTS", "1000"))
+# Fetch the next page into the document cache in the background after serving a page
+PREFETCH_NEXT_PAGE = os.environ.get("PREFETCH_NEXT_PAGE", "1") == "1"
+
+"""
+    A slice of a query's ranked results.
+
+    Attributes:
+        query (str): Raw query string.
+        offset (int): Rank of the first result, from 0.
+        pageSize (int): Number of results.
+"""
+Page = namedtuple("Page", ["query", "offset", "pageSize"])
+
+"""
+    Resolves request parameters into a Page. A cursor from a previous response wins
+    over query, page and pageSize.
+
+    Args:
+        query (str): Raw query string.
+        page (int): Page number, from 1.
+        pageSize (int): Results per page; defaults to PAGE_SIZE, capped at MAX_PAGE_SIZE.
+        cursor (str): nextCursor of a previous response.
+
+    Returns:
+        page (Page): The requested slice.
+
+    Raises:
+        ValueError: The cursor is malformed.
+"""
+def resolvePage(query="", page=None, pageSize=None, cursor=None):
+    if cursor:
+        return decodeCursor(cursor)
+    pageSize = min(max(pageSize or PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    return Page(query, (max(page or 1, 1) - 1) * pageSize, pageSize)
+
+"""
+    Encodes a page as an opaque, URL-safe cursor string.
+"""
+def encodeCursor(page):
+    payload = json.dumps([page.query, page.offset, page.pageSize], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+"""
+    Decodes a cursor from encodeCursor().
+
+    Raises:
+        ValueError: The cursor is malformed.
+"""
+def decodeCursor(cursor):
+    try:
+        query, offset, pageSize = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset, pageSize = int(offset), int(pageSize)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(query, str) or offset < 0 or not 1 <= pageSize <= MAX_PAGE_SIZE:
+        raise ValueError("Invalid cursor")
+    return Page(query, offset, pageSize)
+
+"""
+    The page after this one, or None if this is the last page of total results.
+"""
+def nextPage(page, total):
+    offset = page.offset + page.pageSize
+    return page._replace(offset=offset) if offset < min(total, MAX_RESULTS) else None
+
+"""
+    Result cache key of one page of a query.
+
+    Args:
+        key (str): queryKey() of the query.
+        page (Page): The page.
+"""
+def pageCacheKey(key, page):
+    return f"{key}#{page.offset}+{page.pageSize}"
+
+"""
+    Pagination fields for a response.
+
+    Args:
+        page (Page): The page being returned.
+        total (int): Number of ranked results, at most MAX_RESULTS.
+
+    Returns:
+        info (dict): page, pageSize, total and nextCursor (None on the last page).
+"""
+def pageInfo(page, total):
+    following = nextPage(page, total)
+    return {"page": page.offset // page.pageSize + 1,
+            "pageSize": page.pageSize,
+            "total": total,
+            "nextCursor": encodeCursor(following) if following is not None else None}
@@ -0,0 +1,206 @@
+import re
+from src.queryNormalizer import getNormalizer
+from src.snippetEngine import findWords
+
+# Fields a query can restrict with name:value, and whether values match exactly
+# (indexed equality) or as a case-insensitive substring
+FIELD_NAMES = {"type": "exact", "url": "substring", "title": "substring"}
+
+# Anything that makes a query more than a bag of words
+_OPERATOR = re.compile(r'"|(?:^|\s)(?:-(?=\S)|NOT\s+(?=\S)|OR(?=\s))|\b(?:' + "|".join(FIELD_NAMES) + r'):\S')
+_CLAUSE = re.compile(r'(?P<negate>-(?=\S)|NOT\s+(?=\S))?'
+                     r'(?:(?P<field>' + "|".join(FIELD_NAMES) + r'):(?:"(?P<quoted>[^"]*)"?|(?P<value>\S+))'
+                     r'|"(?P<phrase>[^"]*)"?'
+                     r'|(?P<word>\S+))')
+
+"""
+    Builds the plain query: every token must occur.
+
+    Args:
+        tokens (list): Tokens from parseSearchQuery().
+
+    Returns:
+        structuredQuery (dict): {"operation": "AND", "terms": tokens}.
+"""
+def andQuery(tokens):
+    return {"operation": "AND", "terms": list(tokens)}
+
+"""
+    Parses a raw query into a query tree. Nodes are dicts with an "operation" and a list
+    of "terms"; leaves are normalized tokens:
+
+        word          token, or an AND of tokens if the word normalizes to several
+        "a phrase"    {"operation": "PHRASE", "terms": [content tokens], "words": [stems]}
+        a OR b        {"operation": "OR", "terms": [a, b]}
+        -a, NOT a     {"operation": "NOT", "terms": [a]}
+        type:html     entry in the root's "filters" list (also url:, title:, and -type:)
+
+    The root is an AND of its clauses. A query without any operator parses to
+    andQuery(parseSearchQuery(query)).
+
+    Args:
+        query (str): Raw query string.
+
+    Returns:
+        structuredQuery (dict): The query tree.
+"""
+def parseQuery(query):
+    normalizer = getNormalizer()
+    if not _OPERATOR.search(query):
+        return andQuery(normalizer.normalize(query))
+
+    clauses = []
+    filters = []
+    pendingOr = False
+    for match in _CLAUSE.finditer(query):
+        negate = match.group("negate") is not None
+        if match.group("field"):
+            value = match.group("quoted") if match.group("quoted") is not None else match.group("value")
+            if value:
+                filters.append({"field": match.group("field"), "value": value, "negate": negate})
+            continue
+        if match.group("word") == "OR" and not negate:
+            pendingOr = bool(clauses)
+            continue
+
+        node = _phraseNode(normalizer, match.group("phrase")) if match.group("phrase") is not None \
+            else _wordNode(normalizer, match.group("word"))
+        if node is None:
+            continue
+        if negate:
+            node = {"operation": "NOT", "terms": [node]}
+        if pendingOr:
+            previous = clauses[-1]
+            if isinstance(previous, dict) and previous["operation"] == "OR":
+                previous["terms"].append(node)
+            else:
+                clauses[-1] = {"operation": "OR", "terms": [previous, node]}
+        else:
+            clauses.append(node)
+        pendingOr = False
+
+    # A multi-token word on its own is just more AND terms
+    terms = []
+    for clause in clauses:
+        if isinstance(clause, dict) and clause["operation"] == "AND":
+            terms.extend(clause["terms"])
+        else:
+            terms.append(clause)
+    structuredQuery = andQuery(terms)
+    if filters:
+        structuredQuery["filters"] = filters
+    return structuredQuery
+
+def _wordNode(normalizer, word):
+    tokens = normalizer.normalize(word)
+    if not tokens:
+        return None
+    return tokens[0] if len(tokens) == 1 else andQuery(tokens)
+
+def _phraseNode(normalizer, phrase):
+    terms = normalizer.normalize(phrase)
+    if not terms:
+        return None
+    words = findWords(phrase)[1]
+    if len(words) == 1:
+        return terms[0]
+    return {"operation": "PHRASE", "terms": terms, "words": words}
+
+"""
+    Tokens a document should contain for the query: every leaf outside a NOT, in order,
+    without duplicates. This is what the ranking service is asked about.
+"""
+def queryTerms(structuredQuery):
+    terms = []
+
+    def collect(node):
+        if isinstance(node, str):
+            terms.append(node)
+        elif node["operation"] != "NOT":
+            for child in node["terms"]:
+                collect(child)
+
+    collect(structuredQuery)
+    return list(dict.fromkeys(terms))
+
+"""
+    Canonical text of a query tree, used as its cache key. A plain AND of tokens gives
+    the same key as cacheKey(tokens).
+"""
+def queryKey(structuredQuery):
+    def render(node, top=False):
+        if isinstance(node, str):
+            return node
+        operation = node["operation"]
+        if operation == "PHRASE":
+            return '"' + " ".join(node["words"]) + '"'
+        if operation == "NOT":
+            return "-" + render(node["terms"][0])
+        if operation == "OR":
+            return "(" + " OR ".join(render(child) for child in node["terms"]) + ")"
+        text = " ".join(render(child) for child in node["terms"])
+        return text if top else "(" + text + ")"
+
+    key = render(structuredQuery, top=True)
+    for condition in structuredQuery.get("filters", []):
+        key += f' {"-" if condition["negate"] else ""}{condition["field"]}:"{condition["value"]}"'
+    return key.strip()
+
+"""
+    Mongo conditions for the query's field filters, to add to a document lookup so
+    filtered-out documents are never sent back by Mongo. Values of the same field are
+    alternatives; a negated value excludes matching documents.
+
+    Returns:
+        conditions (dict): Mongo filter, or {} if the query has no field filters.
+"""
+def mongoFilter(structuredQuery):
+    conditions = {}
+    for condition in structuredQuery.get("filters", []):
+        field = condition["field"]
+        if FIELD_NAMES[field] == "exact":
+            value = condition["value"].lower()
+        else:
+            value = re.compile(re.escape(condition["value"]), re.IGNORECASE)
+        conditions.setdefault(field, {}).setdefault("$nin" if condition["negate"] else "$in", []).append(value)
+    return conditions
+
+"""
+    Whether matchesDocument() needs to look at document text: the ranking service only
+    sees queryTerms(), so phrases and NOT have to be checked after retrieval.
+"""
+def needsVerification(structuredQuery):
+    if isinstance(structuredQuery, str):
+        return False
+    return structuredQuery["operation"] in ("PHRASE", "NOT") or \
+        any(needsVerification(child) for child in structuredQuery["terms"])
+
+"""
+    Evaluates a query tree against a document's text. Words are found and stemmed like
+    the snippet passages (snippetEngine.findWords).
+
+    Args:
+        structuredQuery (dict): Query tree from parseQuery().
+        document (dict): Document with a text field.
+
+    Returns:
+        matches (bool): Whether the document satisfies the query.
+"""
+def matchesDocument(structuredQuery, document):
+    stems = findWords(document.get("text") or "")[1]
+    stemSet = set(stems)
+    joined = f" {' '.join(stems)} "
+
+    def evaluate(node):
+        if isinstance(node, str):
+            return node in stemSet
+        operation = node["operation"]
+        if operation == "PHRASE":
+            return f" {' '.join(node['words'])} " in joined
+        if operation == "NOT":
+            return not evaluate(node["terms"][0])
+        if operation == "OR":
+            return any(evaluate(child) for child in node["terms"])
+        return all(evaluate(child) for child in node["terms"])
+
+    return evaluate(structuredQuery)
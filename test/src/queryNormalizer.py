@@ -0,0 +1,322 @@
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+
+STEM_CACHE_SIZE = int(os.environ.get("STEM_CACHE_SIZE", "100000"))
+# NLTK data path -> downloader package for every resource the normalizer needs
+NLTK_RESOURCES = {
+    "tokenizers/punkt_tab": "punkt_tab",
+    "corpora/stopwords": "stopwords",
+}
+# Only download missing NLTK data when explicitly allowed; never at request time by default
+NLTK_DOWNLOAD = os.environ.get("NLTK_DOWNLOAD", "0") == "1"
+
+# Batches with at least this many distinct queries may be spread over a process pool
+PARALLEL_MIN_BATCH = int(os.environ.get("PARALLEL_MIN_BATCH", "5000"))
+
+# Regular expressions reproducing what the Treebank word tokenizer splits off (see
+# QueryNormalizer.fastTokenize). Everything else stays attached to its word.
+_FAST_SPLIT = re.compile(r"\s+|\.{2,}|--|''|[;@#$%&?!*()\[\]{}<>\"`«“‘„»”’\u2012-\u2015]")
+# Commas and colons not followed by a digit; like the Treebank rule, the character after
+# a split comma is consumed, so in ",," only the first comma is split off
+_COMMA = re.compile(r"([:,])([^\d]|$)")
+# Opening double quotes, which the Treebank tokenizer rewrites to ``
+_OPENING_QUOTE = re.compile(r"^\"|(?<=[ (\[{<«“‘„`])(?:\"|'')")
+_LEADING_QUOTE = re.compile(r"(?i)(?<!\w)(')(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)")
+_FINAL_PERIOD = re.compile(r"(?<=[^.])\.'*$")
+_SENTENCE_TAIL = re.compile(r"[ \])}>\"'»”’]*\s*")
+# Suffixes split off the end of a word, applied in order as the Treebank rules are
+_ENDING_CONTRACTIONS = (re.compile(r"(?<=[^' ])(?:'[sSmMdD]|')$"),
+                        re.compile(r"(?<=[^' ])(?:'ll|'LL|'re|'RE|'ve|'VE|n't|N'T)$"))
+# Pieces whose words depend on the characters around them (and on the NLTK version): a
+# period inside punctuation, or stacked quotes such as "x's'", "x's'." and "'tis'tis"
+_AMBIGUOUS = re.compile(r"\.(?=[^\w.])|[^' ]'[sSmMdD]?'|(?i:'t(?:is|was)')")
+# Words the Treebank tokenizer splits in two ("gonna" -> "gon" "na"), and the "'t" it
+# then splits off of "'tis" and "'twas"
+_SPLIT_WORDS = re.compile(r"(?i)\b(can)(not)\b|\b(d)('ye)\b|\b(gim)(me)\b|\b(gon)(na)\b|\b(got)(ta)\b|"
+                          r"\b(lem)(me)\b|\b(more)('n)\b|\b(wan)(na)$")
+_SPLIT_WORD_HINT = re.compile(r"(?i)cannot|d'ye|gimme|gonna|gotta|lemme|more'n|wanna")
+_SPLIT_T = re.compile(r"(?i)^'t(?=(?:is|was)\b)")
+
+_nltkVerified = False
+_nltkLock = threading.Lock()
+
+"""
+    Verifies once per process that the NLTK data the normalizer needs is installed.
+    Later calls return immediately, so this is safe to call on every normalizer
+    construction. Nothing is downloaded unless download is set.
+
+    Args:
+        download (bool): Download missing resources; defaults to NLTK_DOWNLOAD.
+
+    Raises:
+        LookupError: A resource is missing (and could not be downloaded).
+"""
+def ensureNLTKData(download=None):
+    global _nltkVerified
+    if _nltkVerified:
+        return
+    with _nltkLock:
+        if _nltkVerified:
+            return
+
+        import nltk
+        if download is None:
+            download = NLTK_DOWNLOAD
+        missing = []
+        for path, package in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if download:
+                    nltk.download(package, quiet=True)
+                try:
+                    nltk.data.find(path)
+                except LookupError:
+                    missing.append(package)
+
+        if missing:
+            raise LookupError(f"Missing NLTK data: {', '.join(missing)}. Install it with "
+                              f"`python -m nltk.downloader {' '.join(missing)}` or getNLTKData().")
+        _nltkVerified = True
+
+"""
+    Normalizes query and document text into stemmed tokens. The stopword set and the
+    stemmer are loaded once per instance, and stems are memoized in a bounded LRU cache,
+    which hits almost every time on the Zipfian vocabulary of queries and documents.
+
+    parseSearchQuery and generateSnippet share one instance (getNormalizer()) so a query
+    term and the same word in a document always normalize to the same stem.
+
+    NLTK is imported when the first normalizer is created rather than at module import,
+    so processes that never normalize text don't pay for it.
+"""
+class QueryNormalizer:
+    def __init__(self, language='english', stemCacheSize=STEM_CACHE_SIZE):
+        ensureNLTKData()
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.stem import PorterStemmer
+
+        self.nltk = nltk
+        self.language = language
+        self.stopWords = frozenset(stopwords.words(language))
+        self.stemmer = PorterStemmer()
+        self.stem = lru_cache(maxsize=stemCacheSize)(self.stemmer.stem)
+        self.sentenceTokenizer = None
+
+    """
+        Splits text into lower-cased alphanumeric words.
+
+        Args:
+            text (str): Raw text.
+            preserveLine (bool): Treat text as a single sentence and skip sentence
+            splitting; use for text that already came out of sent_tokenize.
+
+        Returns:
+            words (list): Words with punctuation tokens removed.
+    """
+    def tokenize(self, text, preserveLine=False):
+        return [word.lower() for word in self.nltk.word_tokenize(text, self.language, preserveLine) if word.isalnum()]
+
+    """
+        Same words as tokenize(), found with a few precompiled regular expressions
+        instead of the Treebank tokenizer's ~30 passes over the text. Text with a
+        "word." before its last word needs Punkt to tell sentence ends from
+        abbreviations, so it is split into sentences first (see sentenceSpans) and each
+        sentence is tokenized the same way. The rare pieces whose words depend on more
+        context go through tokenize().
+
+        Args:
+            text (str): Raw text.
+
+        Returns:
+            words (list): Words with punctuation tokens removed.
+    """
+    def fastTokenize(self, text):
+        words = self._fastTokenize(text)
+        if words is not None:
+            return words
+        words = []
+        for start, end in self.sentenceSpans(text):
+            sentenceWords = self._fastTokenize(text[start:end])
+            if sentenceWords is None:
+                return self.tokenize(text)
+            words.extend(sentenceWords)
+        return words
+
+    """
+        fastTokenize() of text taken as one sentence: the Treebank tokenizer only splits
+        off the period that ends it.
+
+        Returns:
+            words (list): The words, or None if the text needs the full tokenizer.
+    """
+    def _fastTokenize(self, text):
+        spaced = _LEADING_QUOTE.sub("' ", text) if "'" in text else text
+        if '"' in spaced or "''" in spaced:
+            spaced = _OPENING_QUOTE.sub(" `` ", spaced)
+        if "," in spaced or ":" in spaced:
+            spaced = _COMMA.sub(r" \1 \2", spaced)
+        splitWords = _SPLIT_WORD_HINT.search(spaced) is not None
+        words = []
+        for start, piece in _pieces(spaced):
+            # Plain words are by far the most common piece
+            if piece.isalnum() and not splitWords:
+                words.append(piece.lower())
+                continue
+            if _AMBIGUOUS.search(piece):
+                return None
+            period = _FINAL_PERIOD.search(piece)
+            if period:
+                body = piece[:period.start()]
+                # A period is split off when it ends the sentence, followed by nothing
+                # but closing quotes and brackets. Whether any other "word." keeps its
+                # period depends on the rest of the text, so leave it to tokenize().
+                if not _SENTENCE_TAIL.fullmatch(spaced, start + period.start() + 1):
+                    if _pieceWords(body):
+                        return None
+                    continue
+                piece = body
+            words.extend(_pieceWords(piece))
+        return words
+
+    """
+        Splits text into sentences with the Punkt tokenizer.
+    """
+    def splitSentences(self, text):
+        return self.nltk.sent_tokenize(text, self.language)
+
+    """
+        Returns the (start, end) character offsets of the sentences sent_tokenize would
+        produce for text.
+    """
+    def sentenceSpans(self, text):
+        if self.sentenceTokenizer is None:
+            self.sentenceTokenizer = self.nltk.tokenize.PunktTokenizer(self.language)
+        return list(self.sentenceTokenizer.span_tokenize(text))
+
+    """
+        Stems a list of words through the LRU cache.
+    """
+    def stemWords(self, words):
+        stem = self.stem
+        return [stem(word) for word in words]
+
+    """
+        Normalizes a search query: tokenize, remove stop words, stem.
+
+        Args:
+            query (str): Raw query string.
+            fast (bool): Tokenize with fastTokenize().
+
+        Returns:
+            tokens (list): Stemmed query tokens.
+    """
+    def normalize(self, query, fast=False):
+        stopWords = self.stopWords
+        words = self.fastTokenize(query) if fast else self.tokenize(query)
+        return self.stemWords([word for word in words if word not in stopWords])
+
+    """
+        Normalizes document text for matching against query tokens. Stop words are kept
+        so the result lines up with the words of the text; they never match a query
+        token because normalize() removes them.
+
+        Args:
+            text (str): A sentence or passage of document text.
+            preserveLine (bool): See tokenize().
+
+        Returns:
+            stems (list): Stemmed words.
+    """
+    def normalizeText(self, text, preserveLine=False):
+        return self.stemWords(self.tokenize(text, preserveLine))
+
+    """
+        Returns hit/miss statistics of the stem cache.
+    """
+    def cacheInfo(self):
+        return self.stem.cache_info()
+
+def _splitWord(match):
+    first, second = [group for group in match.groups() if group is not None]
+    return f" {first} {second} "
+
+"""
+    Yields the (offset, piece) pairs of spaced, split on _FAST_SPLIT.
+"""
+def _pieces(spaced):
+    start = 0
+    for separator in _FAST_SPLIT.finditer(spaced):
+        if separator.start() > start:
+            yield start, spaced[start:separator.start()]
+        start = separator.end()
+    if start < len(spaced):
+        yield start, spaced[start:]
+
+"""
+    Words of one whitespace/punctuation-delimited piece of text, after the Treebank
+    tokenizer's contraction rules ("don't" -> "do" "n't", "gonna" -> "gon" "na").
+"""
+def _pieceWords(piece):
+    for suffix in _ENDING_CONTRACTIONS:
+        match = suffix.search(piece)
+        if match:
+            piece = piece[:match.start()]
+    if _SPLIT_WORDS.search(piece):
+        parts = [_SPLIT_T.sub("", part, 1) for part in _SPLIT_WORDS.sub(_splitWord, piece).split()]
+    else:
+        parts = (piece,)
+    return [part.lower() for part in parts if part.isalnum()]
+
+_normalizer = None
+_normalizerLock = threading.Lock()
+
+"""
+    Returns the process-wide QueryNormalizer, creating it on first use.
+"""
+def getNormalizer():
+    global _normalizer
+    if _normalizer is None:
+        with _normalizerLock:
+            if _normalizer is None:
+                _normalizer = QueryNormalizer()
+    return _normalizer
+
+def _normalizeChunk(queries, fast):
+    normalizer = getNormalizer()
+    tokens = []
+    for query in queries:
+        try:
+            tokens.append(normalizer.normalize(query, fast))
+        except Exception as e:
+            logging.error(f"Error in normalizeMany: {str(e)}")
+            tokens.append([])
+    return tokens
+
+"""
+    Normalizes a batch of distinct queries, in a process pool when the batch is large
+    enough to pay for starting one. Each worker builds its own normalizer.
+
+    Args:
+        queries (list): Distinct raw query strings.
+        fast (bool): Tokenize with fastTokenize().
+        processes (int): Worker processes; None or 1 normalizes in this process.
+
+    Returns:
+        tokens (list): Stemmed tokens of each query, in order.
+"""
+def normalizeMany(queries, fast=True, processes=None):
+    if not processes or processes <= 1 or len(queries) < PARALLEL_MIN_BATCH:
+        return _normalizeChunk(queries, fast)
+
+    import multiprocessing
+    from functools import partial
+    chunkSize = -(-len(queries) // (processes * 4))
+    chunks = [queries[i:i + chunkSize] for i in range(0, len(queries), chunkSize)]
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(partial(_normalizeChunk, fast=fast), chunks)
+    return [tokens for chunk in results for tokens in chunk]
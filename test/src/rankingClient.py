@@ -0,0 +1,130 @@
+import os
+import threading
+from collections import namedtuple
+
+RANKING_URL = os.environ.get("RANKING_URL", "http://lspt-index-ranking.cs.rpi.edu:6060")
+RANKING_CONNECT_TIMEOUT = float(os.environ.get("RANKING_CONNECT_TIMEOUT", "1.0"))
+RANKING_READ_TIMEOUT = float(os.environ.get("RANKING_READ_TIMEOUT", "5.0"))
+RANKING_RETRIES = int(os.environ.get("RANKING_RETRIES", "2"))
+RANKING_BACKOFF = float(os.environ.get("RANKING_BACKOFF", "0.1"))
+RANKING_POOL_SIZE = int(os.environ.get("RANKING_POOL_SIZE", "20"))
+
+ScoredDocument = namedtuple("ScoredDocument", ["docId", "score"])
+
+# Keys the ranking service has used for the document ID in result objects
+_ID_KEYS = ("docId", "documentId", "id", "_id")
+
+"""
+    Converts a ranking service payload into a list of ScoredDocument sorted by descending
+    score. Accepts a list of [docId, score] pairs, a list of objects with an ID key and
+    a score, a {docId: score} mapping, or any of these wrapped in a "documents" or
+    "results" field.
+
+    Args:
+        payload: Decoded JSON body from the ranking service.
+
+    Returns:
+        scores (list): ScoredDocument tuples, best first.
+"""
+def parseScores(payload):
+    if isinstance(payload, dict):
+        for key in ("documents", "results"):
+            if key in payload:
+                return parseScores(payload[key])
+        entries = payload.items()
+    else:
+        entries = payload
+
+    scores = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            docId = next(entry[key] for key in _ID_KEYS if key in entry)
+            score = entry.get("score", 0.0)
+        elif isinstance(entry, (list, tuple)):
+            docId, score = entry[0], (entry[1] if len(entry) > 1 else 0.0)
+        else:
+            docId, score = entry, 0.0
+        scores.append(ScoredDocument(docId, float(score)))
+
+    scores.sort(key=lambda scored: scored.score, reverse=True)
+    return scores
+
+"""
+    Client for the Index/Ranking service. One instance holds a pooled requests.Session,
+    so keep-alive connections are reused across queries instead of paying DNS and TCP
+    setup on every call. Idempotent GETs are retried with exponential backoff on
+    connection errors and 5xx responses.
+"""
+class RankingClient:
+    def __init__(self, baseUrl=None, connectTimeout=None, readTimeout=None,
+                 retries=None, backoff=None, poolSize=None):
+        # Imported here so importing the pipeline doesn't load requests until a client is made
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.baseUrl = (baseUrl or RANKING_URL).rstrip("/")
+        self.timeout = (connectTimeout if connectTimeout is not None else RANKING_CONNECT_TIMEOUT,
+                        readTimeout if readTimeout is not None else RANKING_READ_TIMEOUT)
+
+        retry = Retry(total=retries if retries is not None else RANKING_RETRIES,
+                      backoff_factor=backoff if backoff is not None else RANKING_BACKOFF,
+                      status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        poolSize = poolSize or RANKING_POOL_SIZE
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    """
+        Asks the ranking service to score documents for a query.
+
+        Args:
+            userId: ID of user performing query.
+            query (str): Tokenized string to rank documents.
+
+        Returns:
+            scores (list): ScoredDocument tuples, best first.
+
+        Raises:
+            requests.RequestException: The service could not be reached or returned an error.
+    """
+    def getDocumentScores(self, userId, query):
+        response = self.session.get(f"{self.baseUrl}/getDocumentScores",
+                                    params={"id": userId, "text": query},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return parseScores(response.json())
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_clientLock = threading.Lock()
+
+"""
+    Returns the process-wide RankingClient, creating it on first use.
+"""
+def getRankingClient():
+    global _client
+    if _client is None:
+        with _clientLock:
+            if _client is None:
+                _client = RankingClient()
+    return _client
+
+"""
+    Replaces the shared RankingClient, e.g. to point at a local ranking fake.
+
+    Args:
+        client (RankingClient): The new client, or None to recreate from settings.
+"""
+def setRankingClient(client):
+    global _client
+    with _clientLock:
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client
@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "10000"))
+RANKING_CACHE_TTL = float(os.environ.get("RANKING_CACHE_TTL", "300"))
+DOCUMENT_CACHE_TTL = float(os.environ.get("DOCUMENT_CACHE_TTL", "60"))
+CACHE_DOCUMENTS = os.environ.get("CACHE_DOCUMENTS", "1") == "1"
+
+"""
+    Interface for result cache storage. The in-process InMemoryBackend is the default;
+    a shared store (e.g. Redis) can be plugged in by implementing these methods.
+"""
+class CacheBackend:
+    """
+        Returns the value stored under key, or None if it is missing or expired.
+    """
+    def get(self, key):
+        raise NotImplementedError
+
+    """
+        Stores value under key for ttl seconds.
+    """
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+"""
+    Size-bounded LRU cache with per-entry expiry, safe to share between threads.
+
+    Args:
+        maxEntries (int): Least recently used entries are evicted past this size.
+        clock (function): Monotonic time source, replaceable in tests.
+"""
+class InMemoryBackend(CacheBackend):
+    def __init__(self, maxEntries=RESULT_CACHE_SIZE, clock=time.monotonic):
+        self.maxEntries = maxEntries
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expiresAt, value = entry
+            if expiresAt <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (self.clock() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+"""
+    One layer of the result cache: a backend, a TTL, and hit/miss counters.
+"""
+class CacheLayer:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+"""
+    Query result cache keyed by the normalized token string from parseSearchQuery, so
+    "Where is DCC?" and "where dcc" share an entry. Ranked ID lists and retrieved
+    document pages are cached in separate layers: rankings are small and stay valid
+    longer, while document bodies are large and change when the crawler updates them.
+    The documents layer can be disabled to cache rankings only.
+"""
+class ResultCache:
+    def __init__(self, rankingBackend=None, documentBackend=None,
+                 rankingTtl=RANKING_CACHE_TTL, documentTtl=DOCUMENT_CACHE_TTL,
+                 cacheDocuments=CACHE_DOCUMENTS):
+        self.rankings = CacheLayer(rankingBackend or InMemoryBackend(), rankingTtl)
+        self.documents = CacheLayer(documentBackend or InMemoryBackend(), documentTtl) if cacheDocuments else None
+
+    def clear(self):
+        self.rankings.backend.clear()
+        if self.documents is not None:
+            self.documents.backend.clear()
+
+    def stats(self):
+        stats = {"rankings": self.rankings.stats()}
+        if self.documents is not None:
+            stats["documents"] = self.documents.stats()
+        return stats
+
+"""
+    Builds the cache key for a tokenized query.
+
+    Args:
+        tokens (list): Tokens from parseSearchQuery().
+
+    Returns:
+        key (str): The tokens joined by single spaces.
+"""
+def cacheKey(tokens):
+    return ' '.join(tokens)
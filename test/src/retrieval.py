@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+RETRIEVAL_CONCURRENCY = int(os.environ.get("RETRIEVAL_CONCURRENCY", "8"))
+DOCUMENT_TIMEOUT = float(os.environ.get("DOCUMENT_TIMEOUT", "2.0"))
+# Documents per $in query when a page is fetched; each batch has its own DOCUMENT_TIMEOUT
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", "5"))
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "2"))
+
+_executor = None
+_executorLock = threading.Lock()
+_prefetchExecutor = None
+
+"""
+    Returns the shared thread pool used for document fan-out. Its size is the global
+    concurrency limit on outstanding Document Data Store requests.
+"""
+def getExecutor():
+    global _executor
+    if _executor is None:
+        with _executorLock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=RETRIEVAL_CONCURRENCY,
+                                               thread_name_prefix="retrieval")
+    return _executor
+
+"""
+    Returns the pool that runs background prefetches. Prefetches fan out on the shared
+    pool themselves, so they must not wait on it from one of its own threads.
+"""
+def getPrefetchExecutor():
+    global _prefetchExecutor
+    if _prefetchExecutor is None:
+        with _executorLock:
+            if _prefetchExecutor is None:
+                _prefetchExecutor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS,
+                                                       thread_name_prefix="prefetch")
+    return _prefetchExecutor
+
+"""
+    Forgets the pools in a forked child: their threads stayed behind in the parent, so
+    the child starts its own on first use (see src.server).
+"""
+def _resetAfterFork():
+    global _executor, _prefetchExecutor, _executorLock
+    _executor = _prefetchExecutor = None
+    _executorLock = threading.Lock()
+
+os.register_at_fork(after_in_child=_resetAfterFork)
+
+"""
+    Resizes the fan-out pool. Work already submitted to the old pool is allowed to finish.
+
+    Args:
+        maxConcurrency (int): Maximum number of documents fetched at once.
+"""
+def setConcurrency(maxConcurrency):
+    global _executor, RETRIEVAL_CONCURRENCY
+    with _executorLock:
+        oldExecutor = _executor
+        RETRIEVAL_CONCURRENCY = maxConcurrency
+        _executor = None
+    if oldExecutor is not None:
+        oldExecutor.shutdown(wait=False)
+
+def _timedFetch(fetch, docID, index, startTimes):
+    startTimes[index] = time.perf_counter()
+    return fetch(docID)
+
+"""
+    Fetches documents concurrently and returns whatever arrived in time. A document that
+    has been running for longer than documentTimeout is abandoned, so one slow lookup
+    only drops that document instead of stalling the whole page. The IDs may also be
+    batches of IDs, fetched by one call each (see api.retrieveDocuments).
+
+    Args:
+        docIDs (list): Ranked document IDs, or batches of them.
+        fetch (function): Called with one item of docIDs; returns the document (or the
+        batch's documents), or None.
+        documentTimeout (float): Seconds each fetch may run before it is abandoned.
+        deadline (Deadline): Query deadline (see src.deadline); once it passes, every
+        fetch still queued or running is abandoned.
+
+    Returns:
+        documents (list): Fetched documents in rank order.
+        missed (list): IDs that timed out or failed.
+"""
+def fetchConcurrently(docIDs, fetch, documentTimeout=None, deadline=None):
+    if documentTimeout is None:
+        documentTimeout = DOCUMENT_TIMEOUT
+
+    docIDs = list(docIDs)
+    executor = getExecutor()
+    startTimes = {}
+    futures = {executor.submit(_timedFetch, fetch, docID, index, startTimes): index
+               for index, docID in enumerate(docIDs)}
+
+    results = [None] * len(docIDs)
+    missed = []
+    pending = set(futures)
+    while pending:
+        # Sleep until something finishes or the oldest running fetch hits its timeout
+        now = time.perf_counter()
+        running = [startTimes[futures[future]] for future in pending if futures[future] in startTimes]
+        waitFor = min(running) + documentTimeout - now if running else documentTimeout
+        if deadline is not None:
+            waitFor = deadline.timeout(waitFor)
+        done, pending = wait(pending, timeout=max(waitFor, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logging.error(f"Error fetching document {docIDs[index]}: {str(e)}")
+                missed.append(docIDs[index])
+
+        now = time.perf_counter()
+        for future in list(pending):
+            index = futures[future]
+            if index in startTimes and now - startTimes[index] > documentTimeout:
+                future.cancel()
+                pending.discard(future)
+                missed.append(docIDs[index])
+
+        if pending and deadline is not None and deadline.expired():
+            deadline.expire("fetch")
+            for future in pending:
+                future.cancel()
+                missed.append(docIDs[futures[future]])
+            pending = set()
+
+    if missed:
+        logging.warning(f"Returning partial results; {len(missed)} document(s) missed: {missed}")
+
+    return [document for document in results if document], missed
@@ -0,0 +1,50 @@
+"""
+    One search result as sent to the UI/UX: the document's ID, url, title and type and
+    a snippet, without the document text. Results are what the query pipeline keeps,
+    caches and serializes, so per-query memory does not grow with document size.
+
+    Fields can be read by their response names (result["_id"]) as well as attributes.
+
+    Attributes:
+        docId: Document ID, sent as "_id".
+        url (str), title (str), type (str): Document metadata.
+        snippet (str): Highlighted passage for the query.
+"""
+class SearchResult:
+    __slots__ = ("docId", "url", "title", "type", "snippet")
+
+    # Response field name of each attribute
+    FIELDS = {"_id": "docId", "url": "url", "title": "title", "type": "type", "snippet": "snippet"}
+
+    def __init__(self, docId, url=None, title=None, type=None, snippet=""):
+        self.docId = docId
+        self.url = url
+        self.title = title
+        self.type = type
+        self.snippet = snippet
+
+    """
+        Builds a result from a retrieved document and its snippet.
+    """
+    @classmethod
+    def fromDocument(cls, document, snippet=""):
+        return cls(document.get("_id"), document.get("url"), document.get("title"), document.get("type"), snippet)
+
+    """
+        Returns the result as a response dict: _id, url, title, type and snippet.
+    """
+    def toDict(self):
+        return {"_id": self.docId, "url": self.url, "title": self.title, "type": self.type, "snippet": self.snippet}
+
+    def __getitem__(self, field):
+        return getattr(self, self.FIELDS[field])
+
+    def get(self, field, default=None):
+        attribute = self.FIELDS.get(field)
+        return getattr(self, attribute) if attribute is not None else default
+
+    def __eq__(self, other):
+        return isinstance(other, SearchResult) and self.toDict() == other.toDict()
+
+    def __repr__(self):
+        return f"SearchResult({self.toDict()!r})"
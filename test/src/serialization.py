@@ -0,0 +1,32 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+    Encodes a response as compact JSON bytes, using orjson when it is installed. Objects
+    with a toDict() method (e.g. SearchResult) are encoded as that dict; other values
+    JSON doesn't know (e.g. Mongo ObjectIds) are encoded as strings.
+
+    Args:
+        obj: Object to encode.
+
+    Returns:
+        data (bytes): UTF-8 JSON without indentation.
+"""
+def encodeJson(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+def _default(obj):
+    toDict = getattr(obj, "toDict", None)
+    return toDict() if toDict is not None else str(obj)
+
+"""
+    Encodes one line of an NDJSON stream.
+"""
+def encodeJsonLine(obj):
+    return encodeJson(obj) + b"\n"
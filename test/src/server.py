@@ -0,0 +1,208 @@
+import gc
+import os
+import sys
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+from src.queryNormalizer import getNormalizer, STEM_CACHE_SIZE
+from src.localIndex import getLocalIndex
+from src.autocomplete import getAutocomplete
+from src.sharedState import SharedState
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8000"))
+# Worker processes; tokenizing, stemming and snippets are pure Python, so one process
+# only ever uses one core
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_BACKLOG = int(os.environ.get("SERVER_BACKLOG", "2048"))
+
+"""
+    Loads the read-only state every worker needs, so that it is built once in the
+    parent and shared by forked workers copy-on-write instead of once per worker: the
+    NLTK stopwords and tokenizer (getNormalizer), the local index (memory-mapped; its
+    term table is parsed here) and the autocomplete index. The stem cache is warmed
+    with the autocomplete phrases. Everything loaded is then moved out of the garbage
+    collector's reach (gc.freeze), so collections in the workers do not write to, and
+    so copy, the shared pages.
+
+    Nothing per-connection is created here: the Mongo client, ranking client, SQLite
+    snippet index and thread pools are opened lazily by each worker, as they must not
+    be shared across fork().
+
+    Args:
+        warmStems (bool): Warm the stem cache with the autocomplete phrases.
+
+    Returns:
+        stats (dict): What was loaded.
+"""
+def preloadSharedState(warmStems=True):
+    normalizer = getNormalizer()
+    localIndex = getLocalIndex()
+    autocomplete = getAutocomplete()
+    if warmStems:
+        for count, phrase in enumerate(list(autocomplete.weights)):
+            if count >= STEM_CACHE_SIZE:
+                break
+            normalizer.normalize(phrase, fast=True)
+
+    gc.collect()
+    gc.freeze()
+    return {
+        "localIndex": localIndex is not None,
+        "phrases": len(autocomplete),
+        "stems": normalizer.stem.cache_info().currsize,
+        "frozenObjects": gc.get_freeze_count(),
+    }
+
+"""
+    Forks a worker process that runs target(index, *args) and exits.
+
+    Returns:
+        pid (int): The worker's process ID.
+"""
+def forkWorker(index, target, *args):
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 0
+    try:
+        # The parent's handlers forward signals to workers; workers use the defaults
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        target(index, *args)
+    except BaseException as e:
+        logging.error(f"Error in worker {index}: {str(e)}")
+        status = 1
+    finally:
+        logging.shutdown()
+        os._exit(status)
+
+"""
+    Pre-fork supervisor: forks count workers running target(index, *args), restarts
+    any that die with an error, and on SIGTERM or SIGINT passes the signal on and waits
+    for the workers to finish. POSIX only.
+
+    Args:
+        count (int): Number of worker processes.
+        target (function): Worker body, called with its index and args.
+        restart (bool): Replace workers that exit with a non-zero status.
+
+    Returns:
+        statuses (dict): Exit status of each worker index that did not restart.
+"""
+def superviseWorkers(count, target, *args, restart=True):
+    workers = {}
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    statuses = {}
+    try:
+        for index in range(count):
+            workers[forkWorker(index, target, *args)] = index
+        while workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = workers.pop(pid, None)
+            if index is None:
+                continue
+            exitCode = os.waitstatus_to_exitcode(status)
+            if exitCode != 0 and restart and not stopping:
+                logging.warning(f"Worker {index} (pid {pid}) exited with {exitCode}; restarting it")
+                workers[forkWorker(index, target, *args)] = index
+            else:
+                statuses[index] = exitCode
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    return statuses
+
+"""
+    Opens the listening socket in the parent, so every worker accepts from the same one
+    and the kernel spreads connections between them.
+"""
+def bindSocket(host=SERVER_HOST, port=SERVER_PORT, backlog=SERVER_BACKLOG):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+"""
+    Worker body: serves the FastAPI app on the inherited socket with uvicorn. The app's
+    lifespan starts this worker's query workers (see api.lifespan); threads do not
+    survive fork(), so the parent never starts them. With shared (a SharedState), the
+    worker keeps its tickets and limits there together with the other workers (see
+    api.shareState).
+"""
+def serveWorker(index, sock, shared=None):
+    import uvicorn
+    from src.api import api, shareState
+    if shared is not None:
+        shareState(shared, index)
+    logging.info(f"Worker {index} (pid {os.getpid()}) serving")
+    uvicorn.Server(uvicorn.Config(api, lifespan="on", log_config=None)).run(sockets=[sock])
+
+"""
+    Serves the API from workers pre-forked from one parent that holds the shared
+    read-only state (see preloadSharedState). Each worker has its own document and
+    ranking clients, caches and metrics (/metrics reports the worker that answered);
+    query tickets, rate limits and the in-flight count are kept in a SharedState in a
+    temporary directory, so a ticket can be collected from any worker and the limits
+    hold for the server as a whole. Answering many cores' worth of queries no longer
+    multiplies the memory of the NLP and index state.
+
+    Args:
+        host (str), port (int): Address to listen on.
+        workers (int): Worker processes; 1 serves from this process without forking.
+        preload (bool): Load the shared state before forking.
+
+    Returns:
+        status (int): 0 if every worker exited cleanly.
+"""
+def serve(host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS, preload=True):
+    sock = bindSocket(host, port)
+    if preload:
+        logging.info(f"Preloaded shared state: {preloadSharedState()}")
+    logging.info(f"Listening on {host}:{port} with {workers} worker(s)")
+    if workers <= 1:
+        serveWorker(0, sock)
+        return 0
+    with tempfile.TemporaryDirectory(prefix="search-shared-") as directory:
+        shared = SharedState(os.path.join(directory, "shared.db"))
+        statuses = superviseWorkers(workers, serveWorker, sock, shared)
+    return 0 if all(status == 0 for status in statuses.values()) else 1
+
+"""
+    Command line entry point. Run from the test/ directory:
+        python -m src.server serve [--host HOST] [--port N] [--workers N] [--no-preload]
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the search API from pre-forked worker processes.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    serveParser = subcommands.add_parser("serve", help="serve the API")
+    serveParser.add_argument("--host", default=SERVER_HOST)
+    serveParser.add_argument("--port", type=int, default=SERVER_PORT)
+    serveParser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    serveParser.add_argument("--no-preload", action="store_true", help="load shared state in each worker instead")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    return serve(args.host, args.port, args.workers, not args.no_preload)
+
+if __name__ == "__main__":
+    sys.exit(main())
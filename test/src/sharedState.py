@@ -0,0 +1,149 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from src.serialization import encodeJson
+
+# Seconds a worker waits for another worker to release the shared database
+SHARED_STATE_TIMEOUT = float(os.environ.get("SHARED_STATE_TIMEOUT", "5"))
+
+"""
+    State the pre-forked workers of one server keep together (see src.server), in a
+    SQLite file every worker opens: query tickets and their responses, so a ticket can
+    be collected from whichever worker the GET /results request lands on (see
+    TicketRegistry), the users' rate limit buckets and each worker's in-flight count
+    (see AdmissionController). Only the ticket IDs, responses and counters are
+    shared; the queued queries stay with the worker that took them.
+
+    Each process opens its own connection on first use, as SQLite connections must not
+    be shared across fork(). Safe to share between threads.
+
+    Args:
+        path (str): Database file; its directory is created if needed.
+"""
+class SharedState:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        with self._transaction() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS tickets ("
+                               "ticketId TEXT PRIMARY KEY, createdAt REAL, response TEXT, error TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ticketsCreatedAt ON tickets (createdAt)")
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                               "userId TEXT PRIMARY KEY, tokens REAL, updatedAt REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS bucketsUpdatedAt ON buckets (updatedAt)")
+            connection.execute("CREATE TABLE IF NOT EXISTS load (worker INTEGER PRIMARY KEY, inFlight INTEGER)")
+
+    # This process's connection, opened on first use and again after a fork
+    def _connect(self):
+        if self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=SHARED_STATE_TIMEOUT,
+                                              isolation_level=None, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # Nothing here has to outlive the server
+            self.connection.execute("PRAGMA synchronous=OFF")
+            self.pid = os.getpid()
+        return self.connection
+
+    """
+        Context manager for one write transaction, taken with BEGIN IMMEDIATE so a
+        read-modify-write (a bucket) cannot interleave with another worker's.
+    """
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    """
+        Adds a pending ticket and forgets tickets created before expireBefore.
+    """
+    def createTicket(self, ticketId, createdAt, expireBefore):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM tickets WHERE createdAt < ?", (expireBefore,))
+            connection.execute("INSERT OR REPLACE INTO tickets VALUES (?, ?, NULL, NULL)", (ticketId, createdAt))
+
+    """
+        Stores a ticket's response, or the message of the error it failed with.
+    """
+    def resolveTicket(self, ticketId, response=None, error=None):
+        encoded = encodeJson(response).decode() if error is None else None
+        with self._transaction() as connection:
+            connection.execute("UPDATE tickets SET response = ?, error = ? "
+                               "WHERE ticketId = ? AND response IS NULL AND error IS NULL",
+                               (encoded, error, ticketId))
+
+    def discardTicket(self, ticketId):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM tickets WHERE ticketId = ?", (ticketId,))
+
+    """
+        Looks a ticket up.
+
+        Args:
+            ticketId (str): Ticket to look up.
+            createdAfter (float): Tickets created before this are treated as expired.
+
+        Returns:
+            found (bool): The ticket exists and has not expired.
+            response (dict): Its response; None while it is pending or if it failed.
+            error (str): The message it failed with, or None.
+    """
+    def ticket(self, ticketId, createdAfter):
+        with self.lock:
+            row = self._connect().execute("SELECT response, error FROM tickets WHERE ticketId = ? AND createdAt >= ?",
+                                          (ticketId, createdAfter)).fetchone()
+        if row is None:
+            return False, None, None
+        response, error = row
+        return True, json.loads(response) if response is not None else None, error
+
+    """
+        Takes cost tokens from a user's token bucket, all or none; cost 0 only reads it.
+        Buckets untouched long enough to have refilled are dropped, as they hold burst.
+
+        Args:
+            userId: User whose bucket is used.
+            cost (float): Tokens to take.
+            rate (float): Tokens added per second.
+            burst (float): Tokens a bucket can hold.
+            now (float): Current time of the monotonic clock every worker shares.
+
+        Returns:
+            taken (bool): The user had the tokens.
+            tokens (float): Tokens left in the bucket.
+    """
+    def takeTokens(self, userId, cost, rate, burst, now):
+        with self._transaction() as connection:
+            if rate > 0:
+                connection.execute("DELETE FROM buckets WHERE updatedAt < ?", (now - burst / rate,))
+            row = connection.execute("SELECT tokens, updatedAt FROM buckets WHERE userId = ?",
+                                     (str(userId),)).fetchone()
+            tokens, updatedAt = row if row is not None else (burst, now)
+            tokens = min(burst, tokens + (now - updatedAt) * rate)
+            taken = tokens >= cost
+            if taken:
+                tokens -= cost
+            connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (str(userId), tokens, now))
+        return taken, tokens
+
+    """
+        Records a worker's in-flight count.
+
+        Returns:
+            inFlight (int): Queries in flight across all workers.
+    """
+    def publishLoad(self, worker, inFlight):
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO load VALUES (?, ?)", (worker, inFlight))
+            return connection.execute("SELECT COALESCE(SUM(inFlight), 0) FROM load").fetchone()[0]
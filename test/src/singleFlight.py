@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import Future
+
+"""
+    Collapses concurrent calls for the same key into one: the first caller (the
+    leader) runs the function, and callers that arrive while it is running wait for
+    the leader and get the same result, or the same exception. Once the call finishes
+    the key is free again, so later callers run it anew (normally hitting a cache the
+    leader filled). Safe to share between threads.
+"""
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    """
+        Runs function(*args) unless a call for key is already running, in which case
+        it waits for that call instead.
+
+        Args:
+            key: Identifies calls that are interchangeable.
+            function (function): The call to make.
+            timeout (float): Seconds a waiting caller waits for the leader; None waits
+            until it finishes. The leader's own call is not limited.
+
+        Returns:
+            result: What function returned, for the leader or for any caller.
+
+        Raises:
+            Exception: Whatever function raised.
+            concurrent.futures.TimeoutError: A waiting caller's timeout passed first.
+    """
+    def do(self, key, function, *args, timeout=None):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    """
+        Returns the number of calls made, calls that waited on another caller instead,
+        and calls running now.
+    """
+    def stats(self):
+        with self.lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "inFlight": len(self.calls)}
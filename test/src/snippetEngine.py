@@ -0,0 +1,208 @@
+import os
+import re
+import html
+import logging
+from collections import Counter
+from src.queryNormalizer import getNormalizer
+
+# Only the first SNIPPET_SCAN_CHARS characters of a document are searched for a snippet
+SNIPPET_SCAN_CHARS = int(os.environ.get("SNIPPET_SCAN_CHARS", "100000"))
+SNIPPET_WINDOW = int(os.environ.get("SNIPPET_WINDOW", "30"))
+HIGHLIGHT = ("<b>", "</b>")
+
+_WORD = re.compile(r"[^\W_]+")
+_TRAILING_PUNCTUATION = re.compile(r"[^\w\s]*")
+
+"""
+    Cuts text to the scan budget, on a word boundary where possible.
+
+    Args:
+        text (str): Document text.
+        maxScanChars (int): Budget in characters, or None for no limit.
+
+    Returns:
+        text (str): The scanned prefix.
+"""
+def truncateText(text, maxScanChars):
+    if maxScanChars is None or len(text) <= maxScanChars:
+        return text
+    cut = text.rfind(" ", 0, maxScanChars)
+    return text[:cut if cut > 0 else maxScanChars]
+
+"""
+    Counts query matches in a list of stems in a single pass. A stem that appears k
+    times in the query counts k times, the same as comparing every query word with
+    every document word.
+
+    Args:
+        words (list): Stems of a sentence.
+        queryCounts (Counter): Query stems and how often each occurs in the query.
+
+    Returns:
+        wordCount (int): Number of matches.
+"""
+def countMatches(words, queryCounts):
+    get = queryCounts.get
+    return sum(get(word, 0) for word in words)
+
+"""
+Generates snippet from document data
+Args:
+    documentContent: String containing the full content of the document.
+    tokenizedQuery (list): Tokenized and preprocessed query from parseSearchQuery().
+    maxScanChars (int): Characters of the document to search; defaults to SNIPPET_SCAN_CHARS.
+Returns:
+    snippet: The sentence with the most query matches (the first one on ties), or ""
+    if no sentence matches
+"""
+def generateSnippet(documentContent, tokenizedQuery, maxScanChars=SNIPPET_SCAN_CHARS):
+    try:
+        queryCounts = Counter(tokenizedQuery or [])
+        if not queryCounts:
+            return ""
+
+        snippet = ""
+        maxWordCount = 0
+        normalizer = getNormalizer()
+        # Get each individual sentence in the scanned part of the document
+        for sentence in normalizer.splitSentences(truncateText(documentContent, maxScanChars)):
+            # tokenize sentence using same method as query
+            wordCount = countMatches(normalizer.normalizeText(sentence, preserveLine=True), queryCounts)
+            # If sentence has more query words than current snippet, it is the new snippet
+            if wordCount > maxWordCount:
+                snippet = sentence
+                maxWordCount = wordCount
+
+        return snippet
+
+    except Exception as e:
+        logging.error(f"Error in generateSnippet: {str(e)}")
+        return ""
+
+"""
+    Finds the words of a text and their stems.
+
+    Args:
+        text (str): Document text.
+
+    Returns:
+        offsets (list): Flat [start0, end0, start1, end1, ...] character offsets of the words.
+        terms (list): Stem of each word.
+"""
+def findWords(text):
+    stem = getNormalizer().stem
+    offsets = []
+    terms = []
+    for word in _WORD.finditer(text):
+        offsets.extend(word.span())
+        terms.append(stem(word.group().lower()))
+    return offsets, terms
+
+"""
+    Chooses the best window over a list of matches. Windows are ranked by distinct query
+    terms, then total matches, then how tightly the matches are grouped, and the chosen
+    matches are centered in the window.
+
+    Args:
+        matches (list): (word position, term) pairs in position order; not empty.
+        windowSize (int): Window length in words.
+        numWords (int): Number of words in the text.
+
+    Returns:
+        start, end (int): Word positions of the window, end exclusive.
+"""
+def selectWindow(matches, windowSize, numWords):
+    # Slide over windows that start at a match; right is one past the last match inside
+    best = None
+    windowCounts = Counter()
+    right = 0
+    for left, (position, term) in enumerate(matches):
+        while right < len(matches) and matches[right][0] < position + windowSize:
+            windowCounts[matches[right][1]] += 1
+            right += 1
+        score = (len(windowCounts), right - left, position - matches[right - 1][0])
+        if best is None or score > best[0]:
+            best = (score, left, right)
+        windowCounts[term] -= 1
+        if not windowCounts[term]:
+            del windowCounts[term]
+
+    _, left, right = best
+    first, last = matches[left][0], matches[right - 1][0]
+    start = max(0, first - (windowSize - (last - first + 1)) // 2)
+    end = min(numWords, start + windowSize)
+    return max(0, end - windowSize), end
+
+"""
+    Renders words start..end of a text as a passage, highlighting matched words.
+
+    Args:
+        text (str): Document text the offsets refer to.
+        offsets (sequence): Flat word offsets from findWords().
+        start, end (int): Word positions of the passage, end exclusive.
+        matched (set): Word positions to highlight.
+        highlight (tuple): Opening and closing markers, or None for plain text.
+        truncated (bool): Whether text continues after the last word.
+
+    Returns:
+        passage (str): The passage, with "..." where text was cut off.
+"""
+def renderPassage(text, offsets, start, end, matched, highlight, truncated):
+    escape = html.escape if highlight else str
+    pieces = []
+    cursor = offsets[2 * start] if start > 0 else 0
+    for position in range(start, end):
+        wordStart, wordEnd = offsets[2 * position], offsets[2 * position + 1]
+        pieces.append(escape(text[cursor:wordStart]))
+        word = escape(text[wordStart:wordEnd])
+        pieces.append(f"{highlight[0]}{word}{highlight[1]}" if highlight and position in matched else word)
+        cursor = wordEnd
+    pieces.append(escape(_TRAILING_PUNCTUATION.match(text, cursor).group()))
+
+    passage = "".join(pieces).strip()
+    if start > 0:
+        passage = "... " + passage
+    if truncated:
+        passage = passage + " ..."
+    return passage
+
+"""
+    Picks the windowSize-word passage that best covers the query and highlights the
+    matched terms (see selectWindow). "..." marks text cut off before or after the
+    passage.
+
+    Words are found with a regular expression instead of the NLTK tokenizers, and are
+    stemmed with the shared normalizer's cache.
+
+    Args:
+        documentContent (str): Full content of the document.
+        tokenizedQuery (list): Tokenized and preprocessed query from parseSearchQuery().
+        windowSize (int): Passage length in words; defaults to SNIPPET_WINDOW.
+        maxScanChars (int): Characters of the document to search; defaults to SNIPPET_SCAN_CHARS.
+        highlight (tuple): Opening and closing markers put around matched words. The rest
+        of the passage is HTML-escaped. None returns plain text.
+
+    Returns:
+        passage (str): Highlighted passage, or "" if no query term occurs.
+"""
+def generatePassage(documentContent, tokenizedQuery, windowSize=SNIPPET_WINDOW,
+                    maxScanChars=SNIPPET_SCAN_CHARS, highlight=HIGHLIGHT):
+    try:
+        queryTerms = set(tokenizedQuery or [])
+        if not queryTerms or windowSize <= 0:
+            return ""
+
+        text = truncateText(documentContent, maxScanChars)
+        offsets, terms = findWords(text)
+        matches = [(position, term) for position, term in enumerate(terms) if term in queryTerms]
+        if not matches:
+            return ""
+
+        start, end = selectWindow(matches, windowSize, len(terms))
+        matched = {position for position, _ in matches}
+        truncated = end < len(terms) or len(text) < len(documentContent)
+        return renderPassage(text, offsets, start, end, matched, highlight, truncated)
+
+    except Exception as e:
+        logging.error(f"Error in generatePassage: {str(e)}")
+        return ""
@@ -0,0 +1,329 @@
+import os
+import sys
+import array
+import sqlite3
+import logging
+import argparse
+import threading
+from bisect import bisect_left
+from collections import Counter
+from src.queryNormalizer import getNormalizer
+from src.documentStore import getCollection
+from src.config import DATA_DIR
+from src.snippetEngine import (findWords, selectWindow, renderPassage, truncateText, countMatches,
+                               SNIPPET_SCAN_CHARS, SNIPPET_WINDOW, HIGHLIGHT)
+
+SNIPPET_INDEX_PATH = os.environ.get("SNIPPET_INDEX_PATH", os.path.join(DATA_DIR, "snippetIndex.db"))
+# Also build missing or stale entries while serving queries. Off by default: each one
+# is a SQLite write on the request path, so entries come from backfill instead
+SNIPPET_INDEX_ON_READ = os.environ.get("SNIPPET_INDEX_ON_READ", "0") == "1"
+BACKFILL_BATCH_SIZE = int(os.environ.get("BACKFILL_BATCH_SIZE", "500"))
+
+"""
+    Precomputed sentence boundaries and stems of one document, so query-time snippet
+    generation only scores integer arrays and slices the text. Each stem is stored once
+    per document; words refer to it by ID.
+
+    Attributes:
+        textLength (int): text_length of the document when the entry was built.
+        scanLength (int): Characters indexed (the SNIPPET_SCAN_CHARS prefix).
+        vocabulary (dict): Stem -> term ID.
+        termIds (array): Term ID of each word.
+        wordOffsets (array): Flat [start, end, ...] character offsets of each word.
+        sentenceOffsets (array): Flat [start, end, ...] character offsets of each sentence.
+        sentenceWords (array): Position of the first word of each sentence, followed by
+        the number of words.
+"""
+class SentenceIndex:
+    __slots__ = ("textLength", "scanLength", "vocabulary", "termIds", "wordOffsets",
+                 "sentenceOffsets", "sentenceWords")
+
+    def __init__(self, textLength, scanLength, vocabulary, termIds, wordOffsets, sentenceOffsets, sentenceWords):
+        self.textLength = textLength
+        self.scanLength = scanLength
+        self.vocabulary = vocabulary
+        self.termIds = termIds
+        self.wordOffsets = wordOffsets
+        self.sentenceOffsets = sentenceOffsets
+        self.sentenceWords = sentenceWords
+
+    """
+        Whether the document has changed since the entry was built.
+    """
+    def isStale(self, textLength):
+        return self.textLength != textLength
+
+    def _queryCounts(self, tokenizedQuery):
+        vocabulary = self.vocabulary
+        return Counter(vocabulary[term] for term in tokenizedQuery or [] if term in vocabulary)
+
+    """
+        Sentence snippet from precomputed arrays; see snippetEngine.generateSnippet.
+        Words are the regex words of generatePassage rather than NLTK tokens, so results
+        can differ around abbreviations and contractions.
+
+        Args:
+            text (str): The document text the entry was built from.
+            tokenizedQuery (list): Tokenized and preprocessed query from parseSearchQuery().
+
+        Returns:
+            snippet (str): Sentence with the most query matches, or "".
+    """
+    def snippet(self, text, tokenizedQuery):
+        queryCounts = self._queryCounts(tokenizedQuery)
+        if not queryCounts:
+            return ""
+
+        termIds = self.termIds
+        sentenceWords = self.sentenceWords
+        best = -1
+        maxWordCount = 0
+        for sentence in range(len(sentenceWords) - 1):
+            wordCount = countMatches(termIds[sentenceWords[sentence]:sentenceWords[sentence + 1]], queryCounts)
+            if wordCount > maxWordCount:
+                best = sentence
+                maxWordCount = wordCount
+
+        if best < 0:
+            return ""
+        return text[self.sentenceOffsets[2 * best]:self.sentenceOffsets[2 * best + 1]]
+
+    """
+        Windowed passage from precomputed arrays; see snippetEngine.generatePassage.
+    """
+    def passage(self, text, tokenizedQuery, windowSize=SNIPPET_WINDOW, highlight=HIGHLIGHT):
+        queryIds = set(self._queryCounts(tokenizedQuery))
+        if not queryIds or windowSize <= 0:
+            return ""
+
+        termIds = self.termIds
+        matches = [(position, termId) for position, termId in enumerate(termIds) if termId in queryIds]
+        if not matches:
+            return ""
+
+        start, end = selectWindow(matches, windowSize, len(termIds))
+        matched = {position for position, _ in matches}
+        truncated = end < len(termIds) or self.scanLength < self.textLength
+        return renderPassage(text, self.wordOffsets, start, end, matched, highlight, truncated)
+
+"""
+    Builds the sentence/stem index of a document's text.
+
+    Args:
+        text (str): Document text.
+        textLength (int): The document's text_length; defaults to len(text).
+        maxScanChars (int): Characters to index; defaults to SNIPPET_SCAN_CHARS.
+
+    Returns:
+        entry (SentenceIndex): The index.
+"""
+def buildSentenceIndex(text, textLength=None, maxScanChars=SNIPPET_SCAN_CHARS):
+    scanned = truncateText(text, maxScanChars)
+    offsets, terms = findWords(scanned)
+
+    vocabulary = {}
+    termIds = array.array("I", (vocabulary.setdefault(term, len(vocabulary)) for term in terms))
+
+    wordStarts = offsets[0::2]
+    sentenceOffsets = array.array("I")
+    sentenceWords = array.array("I")
+    for start, end in getNormalizer().sentenceSpans(scanned):
+        sentenceOffsets.extend((start, end))
+        sentenceWords.append(bisect_left(wordStarts, start))
+    sentenceWords.append(len(terms))
+
+    return SentenceIndex(len(text) if textLength is None else textLength, len(scanned), vocabulary,
+                         termIds, array.array("I", offsets), sentenceOffsets, sentenceWords)
+
+def _toArray(data):
+    values = array.array("I")
+    values.frombytes(data)
+    return values
+
+"""
+    Sidecar store of SentenceIndex entries in a local SQLite file, keyed by document _id.
+    Safe to share between threads.
+
+    Args:
+        path (str): Database file; defaults to SNIPPET_INDEX_PATH. Its directory is
+        created if needed.
+"""
+class SnippetIndex:
+    def __init__(self, path=None):
+        self.path = path or SNIPPET_INDEX_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sentences ("
+                "docId TEXT PRIMARY KEY, textLength INTEGER, scanLength INTEGER, vocabulary TEXT, "
+                "termIds BLOB, wordOffsets BLOB, sentenceOffsets BLOB, sentenceWords BLOB)")
+
+    @staticmethod
+    def _toRow(docId, entry):
+        return (str(docId), entry.textLength, entry.scanLength, "\n".join(entry.vocabulary),
+                entry.termIds.tobytes(), entry.wordOffsets.tobytes(),
+                entry.sentenceOffsets.tobytes(), entry.sentenceWords.tobytes())
+
+    @staticmethod
+    def _fromRow(row):
+        textLength, scanLength, vocabulary, termIds, wordOffsets, sentenceOffsets, sentenceWords = row
+        terms = vocabulary.split("\n") if vocabulary else []
+        return SentenceIndex(textLength, scanLength, {term: i for i, term in enumerate(terms)},
+                             _toArray(termIds), _toArray(wordOffsets), _toArray(sentenceOffsets),
+                             _toArray(sentenceWords))
+
+    """
+        Returns the stored entry for a document, or None.
+    """
+    def get(self, docId):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT textLength, scanLength, vocabulary, termIds, wordOffsets, sentenceOffsets, "
+                "sentenceWords FROM sentences WHERE docId = ?", (str(docId),)).fetchone()
+        return self._fromRow(row) if row is not None else None
+
+    def putMany(self, entries):
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO sentences VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                        [self._toRow(docId, entry) for docId, entry in entries])
+
+    def put(self, docId, entry):
+        self.putMany([(docId, entry)])
+
+    """
+        Returns the stored text_length of each of docIds that has an entry.
+    """
+    def storedLengths(self, docIds):
+        docIds = [str(docId) for docId in docIds]
+        if not docIds:
+            return {}
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT docId, textLength FROM sentences WHERE docId IN ({','.join('?' * len(docIds))})",
+                docIds).fetchall()
+        return dict(rows)
+
+    """
+        Returns the entry for a document if it is up to date with the document's
+        text_length; otherwise None.
+
+        Args:
+            document (dict): Document with _id and text (text_length optional).
+    """
+    def lookup(self, document):
+        entry = self.get(document["_id"])
+        if entry is None or entry.isStale(documentTextLength(document)):
+            return None
+        return entry
+
+    """
+        Builds and stores the entry for a document.
+
+        Returns:
+            entry (SentenceIndex): The new entry.
+    """
+    def update(self, document):
+        entry = buildSentenceIndex(document.get("text") or "", documentTextLength(document))
+        self.put(document["_id"], entry)
+        return entry
+
+    """
+        Indexes a collection in streaming batches. Documents whose stored entry matches
+        their text_length are skipped unless force is set, so the backfill can be re-run
+        to pick up only new and changed documents.
+
+        Args:
+            collection: Mongo collection of documents with text and text_length.
+            batchSize (int): Documents per cursor batch and per write transaction.
+            force (bool): Rebuild entries even if they are up to date.
+
+        Returns:
+            stats (dict): Number of documents scanned, built and skipped.
+    """
+    def backfill(self, collection, batchSize=BACKFILL_BATCH_SIZE, force=False):
+        stats = {"scanned": 0, "built": 0, "skipped": 0}
+        cursor = collection.find({}, {"text": 1, "text_length": 1}).batch_size(batchSize)
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batchSize:
+                self._backfillBatch(batch, force, stats)
+                batch = []
+        if batch:
+            self._backfillBatch(batch, force, stats)
+        return stats
+
+    def _backfillBatch(self, documents, force, stats):
+        stored = {} if force else self.storedLengths(document["_id"] for document in documents)
+        entries = [(document["_id"], buildSentenceIndex(document.get("text") or "", documentTextLength(document)))
+                   for document in documents
+                   if stored.get(str(document["_id"])) != documentTextLength(document)]
+        self.putMany(entries)
+        stats["scanned"] += len(documents)
+        stats["built"] += len(entries)
+        stats["skipped"] += len(documents) - len(entries)
+        logging.info(f"Snippet index backfill: {stats}")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+"""
+    text_length of a document, falling back to the length of its text.
+"""
+def documentTextLength(document):
+    textLength = document.get("text_length")
+    return textLength if textLength is not None else len(document.get("text") or "")
+
+_index = None
+_indexLoaded = False
+_indexLock = threading.Lock()
+
+"""
+    Returns the shared SnippetIndex, or None if SNIPPET_INDEX_PATH does not exist (run
+    the backfill to create it).
+"""
+def getSnippetIndex():
+    global _index, _indexLoaded
+    if not _indexLoaded:
+        with _indexLock:
+            if not _indexLoaded:
+                _index = SnippetIndex() if os.path.exists(SNIPPET_INDEX_PATH) else None
+                _indexLoaded = True
+    return _index
+
+"""
+    Replaces the shared SnippetIndex; None disables it.
+"""
+def setSnippetIndex(index):
+    global _index, _indexLoaded
+    with _indexLock:
+        _index = index
+        _indexLoaded = True
+
+"""
+    Command line entry point. Run from the test/ directory:
+        python -m src.snippetIndex backfill [--batch-size N] [--force] [--path FILE]
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute snippet sentence/stem indexes.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfillParser = subcommands.add_parser("backfill", help="index the RAW collection")
+    backfillParser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    backfillParser.add_argument("--force", action="store_true", help="rebuild up-to-date entries")
+    backfillParser.add_argument("--path", default=SNIPPET_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = SnippetIndex(args.path)
+    try:
+        stats = index.backfill(getCollection(), args.batch_size, args.force)
+    finally:
+        index.close()
+    print(stats)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
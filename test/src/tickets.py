@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+TICKET_TTL = float(os.environ.get("TICKET_TTL", "300"))
+# Longest a GET /results request may wait for its result (long polling)
+MAX_RESULT_WAIT = float(os.environ.get("MAX_RESULT_WAIT", "30"))
+# Seconds between checks on a ticket another worker is answering (see share())
+SHARED_POLL_INTERVAL = float(os.environ.get("SHARED_POLL_INTERVAL", "0.02"))
+
+"""
+    Tracks in-flight queries by ticket ID. receiveQuery hands out a ticket, a worker
+    resolves it with the query's response, and the caller collects the response by
+    polling (result) or awaiting (awaitResult). Tickets older than ttl are forgotten,
+    whether or not anyone picked up the result.
+
+    A registry shared with other worker processes (see share()) also records its
+    tickets and their results in the shared state, so a ticket created by one worker
+    can be collected from any of them.
+
+    Args:
+        ttl (float): Seconds a ticket is kept after it is created.
+        clock (function): Monotonic time source, replaceable in tests.
+"""
+class TicketRegistry:
+    def __init__(self, ttl=TICKET_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.tickets = OrderedDict()
+        self.lock = threading.Lock()
+        self.shared = None
+
+    """
+        Records tickets in shared (a SharedState) from now on, and looks up the tickets
+        other workers hand out there.
+    """
+    def share(self, shared):
+        self.shared = shared
+
+    def _expire(self):
+        cutoff = self.clock() - self.ttl
+        while self.tickets:
+            ticketId, (createdAt, future) = next(iter(self.tickets.items()))
+            if createdAt > cutoff:
+                break
+            del self.tickets[ticketId]
+            future.cancel()
+
+    """
+        Creates a pending ticket.
+
+        Returns:
+            ticketId (str): ID to collect the result with.
+    """
+    def create(self):
+        ticketId = uuid.uuid4().hex
+        createdAt = self.clock()
+        if self.shared is not None:
+            self.shared.createTicket(ticketId, createdAt, createdAt - self.ttl)
+        with self.lock:
+            self._expire()
+            self.tickets[ticketId] = (createdAt, Future())
+        return ticketId
+
+    """
+        Returns the Future behind a ticket, or None if it is unknown or expired.
+    """
+    def get(self, ticketId):
+        with self.lock:
+            self._expire()
+            entry = self.tickets.get(ticketId)
+        return entry[1] if entry is not None else None
+
+    def resolve(self, ticketId, result):
+        future = self.get(ticketId)
+        if future is not None and not future.done():
+            future.set_result(result)
+            if self.shared is not None:
+                self.shared.resolveTicket(ticketId, response=result)
+
+    def fail(self, ticketId, exception):
+        future = self.get(ticketId)
+        if future is not None and not future.done():
+            future.set_exception(exception)
+            if self.shared is not None:
+                self.shared.resolveTicket(ticketId, error=str(exception))
+
+    def discard(self, ticketId):
+        with self.lock:
+            entry = self.tickets.pop(ticketId, None)
+        if entry is not None:
+            entry[1].cancel()
+            if self.shared is not None:
+                self.shared.discardTicket(ticketId)
+
+    """
+        Checks on a ticket another worker handed out.
+
+        Returns:
+            done (bool): Whether its result is in.
+            result: The result, once done.
+
+        Raises:
+            KeyError: The ticket is unknown or expired.
+            RuntimeError: The query failed.
+    """
+    def _sharedResult(self, ticketId):
+        found, response, error = (self.shared.ticket(ticketId, self.clock() - self.ttl)
+                                  if self.shared is not None else (False, None, None))
+        if not found:
+            raise KeyError(ticketId)
+        if error is not None:
+            raise RuntimeError(error)
+        return response is not None, response
+
+    # Seconds to wait before checking on a shared ticket again
+    def _pollDelay(self, waitUntil):
+        if waitUntil is None:
+            return SHARED_POLL_INTERVAL
+        return max(0.0, min(SHARED_POLL_INTERVAL, waitUntil - self.clock()))
+
+    """
+        Waits for a ticket's result.
+
+        Args:
+            ticketId (str): Ticket from create().
+            timeout (float): Seconds to wait; 0 polls without blocking, None waits forever.
+
+        Returns:
+            result: The value the ticket was resolved with.
+
+        Raises:
+            KeyError: The ticket is unknown or expired.
+            concurrent.futures.TimeoutError: The result is not ready yet.
+            RuntimeError: The query behind another worker's ticket failed.
+    """
+    def result(self, ticketId, timeout=None):
+        future = self.get(ticketId)
+        if future is not None:
+            return future.result(timeout)
+        waitUntil = self.clock() + timeout if timeout is not None else None
+        while True:
+            done, response = self._sharedResult(ticketId)
+            if done:
+                return response
+            if waitUntil is not None and self.clock() >= waitUntil:
+                raise FutureTimeoutError()
+            time.sleep(self._pollDelay(waitUntil))
+
+    """
+        Awaitable version of result() for async handlers.
+
+        Raises:
+            KeyError: The ticket is unknown or expired.
+            asyncio.TimeoutError: The result did not arrive within timeout.
+    """
+    async def awaitResult(self, ticketId, timeout=None):
+        future = self.get(ticketId)
+        if future is not None:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        waitUntil = self.clock() + timeout if timeout is not None else None
+        while True:
+            done, response = self._sharedResult(ticketId)
+            if done:
+                return response
+            if waitUntil is not None and self.clock() >= waitUntil:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(self._pollDelay(waitUntil))
+
+    def __len__(self):
+        return len(self.tickets)
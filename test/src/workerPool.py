@@ -0,0 +1,224 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict, deque
+from src.metrics import observe
+
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", "8"))
+QUEUE_CAPACITY = int(os.environ.get("QUEUE_CAPACITY", "1000"))
+PER_USER_CAPACITY = int(os.environ.get("PER_USER_CAPACITY", "50"))
+
+"""
+    Bounded, per-user fair work queue drained by a pool of worker threads.
+
+    Each user has their own FIFO and workers take from users in round-robin order, so a
+    user flooding receiveQuery only delays their own queries. Submitting past the total
+    or per-user capacity raises queue.Full instead of growing the queue.
+
+    Args:
+        numWorkers (int): Number of worker threads started by start().
+        maxQueueSize (int): Total number of queued (not yet running) items allowed.
+        maxPerUser (int): Number of queued items allowed per user.
+        onLoadChange (function): Called with no arguments after an item is queued or
+        finishes, e.g. to share the load with other processes (see
+        AdmissionController.publish).
+"""
+class QueryWorkerPool:
+    def __init__(self, numWorkers=QUERY_WORKERS, maxQueueSize=QUEUE_CAPACITY, maxPerUser=PER_USER_CAPACITY,
+                 onLoadChange=None):
+        self.numWorkers = numWorkers
+        self.maxQueueSize = maxQueueSize
+        self.maxPerUser = maxPerUser
+        self.onLoadChange = onLoadChange
+
+        self.userQueues = OrderedDict()
+        self.depth = 0
+        self.unfinished = 0
+        self.condition = threading.Condition()
+        self.workers = []
+        self.accepting = True
+        self.stopping = False
+
+        self.busyWorkers = 0
+        self.busySeconds = 0.0
+        self.startedAt = None
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    """
+        Queues an item for a user.
+
+        Args:
+            userId: User the item belongs to; used for fairness and per-user capacity.
+            item (tuple): Arguments passed to the handler.
+
+        Raises:
+            queue.Full: The pool is shutting down or the total/per-user capacity is reached.
+    """
+    def submit(self, userId, item):
+        with self.condition:
+            userQueue = self.userQueues.get(userId)
+            if (not self.accepting or self.depth >= self.maxQueueSize
+                    or (userQueue is not None and len(userQueue) >= self.maxPerUser)):
+                self.rejected += 1
+                raise queue.Full(f"query queue full ({self.depth} queued)")
+
+            if userQueue is None:
+                userQueue = self.userQueues[userId] = deque()
+            userQueue.append((time.perf_counter(), item))
+            self.depth += 1
+            self.unfinished += 1
+            self.accepted += 1
+            self.condition.notify()
+        self._loadChanged()
+
+    def _loadChanged(self):
+        if self.onLoadChange is not None:
+            try:
+                self.onLoadChange()
+            except Exception as e:
+                logging.error(f"Error in onLoadChange: {str(e)}")
+
+    """
+        Takes the next item in round-robin user order; blocks until one is available.
+        Returns None once the pool is stopping.
+    """
+    def _next(self):
+        with self.condition:
+            while not self.userQueues and not self.stopping:
+                self.condition.wait()
+            if self.stopping:
+                return None
+
+            userId, userQueue = next(iter(self.userQueues.items()))
+            queuedAt, item = userQueue.popleft()
+            if userQueue:
+                self.userQueues.move_to_end(userId)
+            else:
+                del self.userQueues[userId]
+            self.depth -= 1
+            self.busyWorkers += 1
+        observe("queue", time.perf_counter() - queuedAt)
+        return item
+
+    def _work(self, handler):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+
+            startTime = time.perf_counter()
+            try:
+                handler(*item)
+                succeeded = True
+            except Exception as e:
+                logging.error(f"Error in query worker: {str(e)}")
+                succeeded = False
+
+            with self.condition:
+                self.busyWorkers -= 1
+                self.busySeconds += time.perf_counter() - startTime
+                self.unfinished -= 1
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.condition.notify_all()
+            self._loadChanged()
+
+    """
+        Starts the worker threads.
+
+        Args:
+            handler (function): Called with the items of each submitted tuple.
+    """
+    def start(self, handler):
+        with self.condition:
+            self.accepting = True
+            self.stopping = False
+            self.startedAt = time.perf_counter()
+        self.workers = [threading.Thread(target=self._work, args=(handler,), daemon=True,
+                                         name=f"query-worker-{i}")
+                        for i in range(self.numWorkers)]
+        for worker in self.workers:
+            worker.start()
+
+    """
+        Blocks until every submitted item has been processed.
+
+        Args:
+            timeout (float): Maximum seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            True if the queue drained; False on timeout.
+    """
+    def join(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.unfinished == 0, timeout)
+
+    """
+        Stops accepting work and stops the workers.
+
+        Args:
+            drain (bool): Finish queued items first; otherwise they are dropped.
+            timeout (float): Maximum seconds to wait for the drain.
+    """
+    def shutdown(self, drain=True, timeout=None):
+        with self.condition:
+            self.accepting = False
+            if not drain:
+                dropped = self.depth
+                self.userQueues.clear()
+                self.unfinished -= dropped
+                self.depth = 0
+                if dropped:
+                    logging.warning(f"Dropped {dropped} queued queries on shutdown")
+
+        if self.workers and not self.join(timeout):
+            logging.warning("Timed out draining the query queue")
+
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+
+    def qsize(self):
+        return self.depth
+
+    """
+        Returns the load admission control looks at (see src.admission).
+
+        Returns:
+            inFlight (int): Queries queued or running.
+            oldestWait (float): Seconds the longest-waiting queued query has waited.
+    """
+    def load(self):
+        with self.condition:
+            oldest = min((userQueue[0][0] for userQueue in self.userQueues.values()), default=None)
+            return self.unfinished, time.perf_counter() - oldest if oldest is not None else 0.0
+
+    """
+        Returns queue depth and worker utilization. utilization is the fraction of worker
+        time spent handling queries since start().
+    """
+    def metrics(self):
+        with self.condition:
+            elapsed = time.perf_counter() - self.startedAt if self.startedAt is not None else 0.0
+            capacity = elapsed * len(self.workers)
+            return {
+                "queueDepth": self.depth,
+                "queueCapacity": self.maxQueueSize,
+                "workers": len(self.workers),
+                "busyWorkers": self.busyWorkers,
+                "utilization": min(self.busySeconds / capacity, 1.0) if capacity else 0.0,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from src import api
+from src.admission import AdmissionController, EMPTY, RATE_LIMITED, SHED
+from src.workerPool import QueryWorkerPool
+
+# Stand-in for QueryWorkerPool.load()
+class FakePool:
+    def __init__(self, inFlight=0, oldestWait=0.0):
+        self.inFlight = inFlight
+        self.oldestWait = oldestWait
+
+    def load(self):
+        return self.inFlight, self.oldestWait
+
+"""
+Unit Tests for admission control in front of the processing queue
+"""
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.admission = AdmissionController(rate=2, burst=3, maxInFlight=10, shedQueueWait=1.0,
+                                             clock=lambda: self.now[0])
+
+    """
+    Test that a user's bucket allows a burst, then refills at the rate.
+    """
+    def test_token_bucket(self):
+        self.assertTrue([self.admission.admit("spammer", "test spam") for _ in range(4)] ==
+                        [None, None, None, RATE_LIMITED])
+        self.assertTrue(self.admission.admit("user1", "test spam") is None)
+        self.now[0] = 0.5
+        self.assertTrue(self.admission.admit("spammer", "test spam") is None)
+        self.assertTrue(self.admission.admit("spammer", "test spam") == RATE_LIMITED)
+        self.now[0] = 100
+        self.assertTrue([self.admission.admit("spammer", "test spam") for _ in range(4)] ==
+                        [None, None, None, RATE_LIMITED])
+        self.assertTrue(all(self.admission.admit(None, "test spam") is None for _ in range(10)))
+
+    """
+    Test that queries without query terms are rejected without taking a token.
+    """
+    def test_empty(self):
+        for query in ("", "   ", "to", "To be, or not to be", "type:pdf"):
+            self.assertTrue(self.admission.admit("user1", query) == EMPTY)
+        self.assertTrue(self.admission.take("user1"))
+        self.assertTrue(self.admission.admit("user1", "type:pdf library") is None)
+
+    """
+    Test that new queries are shed while the queue is too full or too slow.
+    """
+    def test_shedding(self):
+        self.assertTrue(self.admission.admit("user1", "library", FakePool(inFlight=10)) == SHED)
+        self.assertTrue(self.admission.admit("user1", "library", FakePool(oldestWait=1.5)) == SHED)
+        self.assertTrue(self.admission.admit("user1", "library", FakePool(9, 0.5)) is None)
+        self.assertTrue(self.admission.stats() ==
+                        {"accepted": 0, SHED: 2, RATE_LIMITED: 0, EMPTY: 0, "rejected": 0})
+
+    """
+    Test that the worker pool reports queued plus running queries and the oldest wait.
+    """
+    def test_pool_load(self):
+        pool = QueryWorkerPool(numWorkers=1)
+        self.assertTrue(pool.load() == (0, 0.0))
+        pool.submit("user1", ("user1",))
+        pool.submit("user2", ("user2",))
+        inFlight, oldestWait = pool.load()
+        self.assertTrue(inFlight == 2 and oldestWait > 0)
+
+    """
+    Test that receiveQuery turns away rejected queries and counts every outcome.
+    """
+    def test_receive_query(self):
+        admission = AdmissionController(rate=0, burst=1)
+        with mock.patch.object(api, "admission", admission), \
+                mock.patch.object(api, "processingQueue", QueryWorkerPool()):
+            self.assertTrue(api.receiveQuery("Library hours", "user1"))
+            self.assertFalse(api.receiveQuery("Library hours", "user1"))
+            self.assertFalse(api.receiveQuery("the", "user2"))
+            self.assertFalse(api.receiveQuery("Library hours", "user2", cursor="garbage"))
+        self.assertTrue(admission.stats() == {"accepted": 1, SHED: 0, RATE_LIMITED: 1, EMPTY: 1, "rejected": 1})
+
+    """
+    Test that batches are charged per query and that Retry-After covers the shortfall.
+    """
+    def test_batch(self):
+        self.assertTrue(self.admission.admitMany("user1", ["library", "the", "west hall"]) is None)
+        self.assertTrue(self.admission.admitMany("user1", ["library", "west hall"]) == RATE_LIMITED)
+        self.assertTrue(self.admission.retryAfter(RATE_LIMITED, "user1", 2) == 1)
+        self.assertTrue(self.admission.admitMany("user2", ["the", ""]) == EMPTY)
+        self.assertTrue(self.admission.retryAfter(SHED) == 1)
+        self.admission.begin(10)
+        self.assertTrue(self.admission.admit("user3", "library") == SHED)
+        self.admission.end(10)
+        self.assertTrue(self.admission.admit("user3", "library") is None)
+
+    """
+    Test that /search and /search/batch are turned away with 429 and Retry-After.
+    """
+    def test_endpoints(self):
+        admission = AdmissionController(rate=0.5, burst=1)
+        client = TestClient(api.api)
+        with mock.patch.object(api, "admission", admission), \
+                mock.patch.object(api, "iterSearch", self.fakeSearch):
+            self.assertTrue(client.get("/search", params={"q": "library", "userId": "user1"}).status_code == 200)
+            response = client.get("/search", params={"q": "library", "userId": "user1"})
+            self.assertTrue(response.status_code == 429 and response.headers["Retry-After"] == "2")
+            self.assertTrue(client.get("/search", params={"q": "the"}).status_code == 400)
+            response = client.post("/search/batch", json={"queries": ["library", "dcc"], "userId": "user2"})
+            self.assertTrue(response.status_code == 429 and "Retry-After" in response.headers)
+            admission.maxInFlight = 0
+            self.assertTrue(client.get("/search", params={"q": "library"}).status_code == 429)
+        self.assertTrue(admission.running == 0)
+        self.assertTrue(admission.stats() == {"accepted": 1, SHED: 1, RATE_LIMITED: 2, EMPTY: 1, "rejected": 0})
+
+    async def fakeSearch(self, query, userId=None, page=None):
+        yield {"status": "No Results", "query": query}
+
+if __name__ == "__main__":
+    unittest.main()
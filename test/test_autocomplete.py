@@ -0,0 +1,126 @@
+import os
+import random
+import tempfile
+import unittest
+import unittest.mock
+import mongomock
+from fastapi.testclient import TestClient
+from src import api
+from src.autocomplete import PrefixIndex, setAutocomplete, getAutocomplete
+from src.searchResult import SearchResult
+
+"""
+Unit Tests for the autocomplete prefix index
+"""
+class TestAutocomplete(unittest.TestCase):
+    def tearDown(self):
+        setAutocomplete(None)
+
+    """
+    Test that suggestions are ranked by popularity and follow new queries.
+    """
+    def test_suggest(self):
+        index = PrefixIndex(k=3)
+        index.add("West Hall", 2)
+        index.add("western  union")
+        index.add("dcc hours")
+        self.assertTrue(index.suggest("WE") == ["west hall", "western union"])
+        self.assertTrue(index.suggest("west ") == ["west hall"])
+        self.assertTrue(index.suggest("x") == [])
+        self.assertTrue(index.suggest("")[:1] == ["west hall"])
+
+        for _ in range(2):
+            index.add("western union")
+        self.assertTrue(index.suggest("w") == ["western union", "west hall"])
+        self.assertTrue(index.suggest("w", limit=1) == ["western union"])
+
+    """
+    Test that incremental top-k lists match a brute-force ranking.
+    """
+    def test_top_k_exact(self):
+        rng = random.Random(0)
+        index = PrefixIndex(k=5)
+        phrases = ["".join(rng.choices("abc", k=rng.randint(1, 5))) for _ in range(200)]
+        for phrase in phrases:
+            index.add(phrase, rng.choice([1, 2, 3]))
+        for prefix in ["", "a", "ab", "bca", "cc"]:
+            expected = sorted((-weight, phrase) for phrase, weight in index.weights.items() if phrase.startswith(prefix))
+            self.assertTrue(index.suggest(prefix) == [phrase for _, phrase in expected[:5]])
+
+    """
+    Test building from logged queries and titles, and saving and loading.
+    """
+    def test_sources(self):
+        index = PrefixIndex(minUsers=2)
+        lines = ["2024-03-01 12:00:00 - INFO - Received query from user 1: Where is DCC?\n",
+                 "2024-03-01 12:00:01 - INFO - Received search from user None: where is dcc?\n",
+                 "2024-03-01 12:00:02 - INFO - Response time: 1.00ms\n",
+                 "2024-03-01 12:00:03 - INFO - Received query from user 1: where is my advisor\n"]
+        self.assertTrue(index.addQueryLog(lines) == 3)
+        collection = mongomock.MongoClient().test.RAW
+        collection.insert_many([{"_id": "a", "title": "Where to Eat"}, {"_id": "b"}])
+        self.assertTrue(index.addTitles(collection) == 1)
+        self.assertTrue(index.suggest("where") == ["where is dcc?", "where to eat"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "autocomplete.tsv")
+            index.save(path)
+            self.assertTrue(PrefixIndex.load(path).weights == index.weights)
+
+    """
+    Test that a query is only suggested once enough distinct users searched for it.
+    """
+    def test_distinct_users(self):
+        index = PrefixIndex(minUsers=3, maxPending=2)
+        for userId in ("user1", "user1", "user2"):
+            index.addQuery("My Advisor's Office", userId)
+        self.assertTrue(index.suggest("my") == [] and len(index) == 0)
+        index.addQuery("my advisor's office", "user3")
+        self.assertTrue(index.suggest("my") == ["my advisor's office"] and index.weights["my advisor's office"] == 3.0)
+        index.addQuery("my advisor's office", "user1")
+        self.assertTrue(index.weights["my advisor's office"] == 4.0)
+
+        for query in ("alpha", "beta", "gamma"):
+            index.addQuery(query, "user1")
+        self.assertTrue(list(index.pending) == ["beta", "gamma"])
+        index.add("Alpha Hall")
+        self.assertTrue(index.suggest("alpha") == ["alpha hall"])
+
+    """
+    Test that the index keeps the most popular phrases when it grows past its cap.
+    """
+    def test_cap(self):
+        index = PrefixIndex(maxPhrases=10)
+        for rank in range(20):
+            index.add(f"phrase {rank:02d}", 20 - rank)
+        self.assertTrue(len(index) <= 10)
+        self.assertTrue(index.suggest("phrase", limit=3) == ["phrase 00", "phrase 01", "phrase 02"])
+        self.assertTrue(all(index.suggest(phrase) == [phrase] for phrase in index.weights))
+        self.assertTrue(index.suggest("phrase 10") == [])
+
+    """
+    Test that only admitted queries with results feed the /autocomplete endpoint.
+    """
+    def test_endpoint(self):
+        setAutocomplete(PrefixIndex(minUsers=2))
+        found = ([SearchResult("doc_library")], 1)
+        with unittest.mock.patch.object(api, "executeQuery", return_value=found):
+            api.processQuery("user1", "Library hours")
+            api.processQuery("user2", "Library hours", page=api.resolvePage("Library hours", 2))
+        with unittest.mock.patch.object(api, "executeQuery", return_value=([], 0)):
+            api.processQuery("user3", "Library hours")
+        with unittest.mock.patch.object(api.processingQueue, "submit"):
+            ticketId = api.receiveQuery("Library hours", "user4")
+            self.assertTrue(ticketId)
+            api.tickets.discard(ticketId)
+        client = TestClient(api.api)
+        self.assertTrue(client.get("/autocomplete", params={"q": "lib"}).json()["suggestions"] == [])
+
+        with unittest.mock.patch.object(api, "executeQuery", return_value=found):
+            api.processQuery("user5", "Library hours")
+        response = client.get("/autocomplete", params={"q": "lib"})
+        self.assertTrue(response.json() == {"query": "lib", "suggestions": ["library hours"]})
+        self.assertTrue(getAutocomplete().weights["library hours"] == 2.0)
+
+if __name__ == "__main__":
+    unittest.main()
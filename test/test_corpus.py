@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import mongomock
+from src.api import parseSearchQuery
+from src.corpus import iterDocuments, iterBatches, normalizeDocuments, exportCorpus, readExport
+
+DOCUMENTS = [{"_id": f"doc_{i:03d}", "url": f"https://rpi.edu/{i}", "title": f"Page {i}", "type": "html",
+              "text": f"Page {i} is about the DCC and Union dining halls.", "text_length": 48}
+             for i in range(25)]
+
+"""
+Unit Tests for streaming the corpus
+"""
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().test.RAW
+        self.collection.insert_many(reversed(DOCUMENTS))
+
+    """
+    Test that documents stream in _id order, with projections and a resume point.
+    """
+    def test_iter_documents(self):
+        documents = list(iterDocuments(self.collection, ["url"], batchSize=4))
+        self.assertTrue([document["_id"] for document in documents] == [document["_id"] for document in DOCUMENTS])
+        self.assertTrue(set(documents[0]) == {"_id", "url"})
+        self.assertTrue([document["_id"] for document in iterDocuments(self.collection, batchSize=4, after="doc_022")]
+                        == ["doc_023", "doc_024"])
+        self.assertTrue([len(batch) for batch in iterBatches(range(10), 4)] == [4, 4, 2])
+
+    """
+    Test that documents are normalized like parseSearchQuery, in order, in and out of process.
+    """
+    def test_normalize(self):
+        expected = [(document["_id"], parseSearchQuery(document["text"])) for document in DOCUMENTS]
+        for processes in [None, 2]:
+            normalized = normalizeDocuments(iterDocuments(self.collection, batchSize=4), batchSize=4, processes=processes)
+            self.assertTrue([(document["_id"], tokens) for document, tokens in normalized] == expected)
+
+    """
+    Test that an interrupted export resumes after its last complete line.
+    """
+    def test_export_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "corpus.ndjson")
+            stats = exportCorpus(path, self.collection, batchSize=4)
+            self.assertTrue(stats == {"exported": 25, "resumedAfter": None})
+            records = list(readExport(path))
+            self.assertTrue(records[0] == {"_id": "doc_000", "url": "https://rpi.edu/0", "title": "Page 0",
+                                           "type": "html", "text_length": 48,
+                                           "tokens": parseSearchQuery(DOCUMENTS[0]["text"])})
+
+            # Keep ten whole lines and half of the eleventh
+            with open(path, "rb") as file:
+                lines = file.readlines()
+            with open(path, "wb") as file:
+                file.writelines(lines[:10])
+                file.write(lines[10][:20])
+            stats = exportCorpus(path, self.collection, batchSize=4, resume=True)
+            self.assertTrue(stats == {"exported": 15, "resumedAfter": "doc_009"})
+            self.assertTrue(list(readExport(path)) == records)
+
+if __name__ == "__main__":
+    unittest.main()
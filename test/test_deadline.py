@@ -0,0 +1,131 @@
+import time
+import unittest
+from src import api, documentStore
+from src.deadline import Deadline, DeadlineExceeded, callWithin
+from src.metrics import MetricsRegistry, setMetrics, getMetrics
+from src.rankingClient import ScoredDocument, setRankingClient
+from src.resultCache import ResultCache
+from src.retrieval import fetchConcurrently
+from pipelineFixtures import installDocuments
+
+# Ranking client stand-in that hangs before ranking the one test document
+class HangingRankingClient:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def getDocumentScores(self, userId, query):
+        time.sleep(self.delay)
+        return [ScoredDocument("doc_dcc", 1.0)]
+
+    def close(self):
+        pass
+
+"""
+Unit Tests for query deadlines across the pipeline
+"""
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        setMetrics(MetricsRegistry())
+
+    def tearDown(self):
+        setMetrics(None)
+
+    """
+    Test the remaining budget and that each stage is counted once when it runs out.
+    """
+    def test_deadline(self):
+        now = [0.0]
+        deadline = Deadline(2.0, clock=lambda: now[0])
+        self.assertTrue(deadline.remaining() == 2.0 and deadline.timeout(0.5) == 0.5)
+        deadline.check("parse")
+        now[0] = 3.0
+        self.assertTrue(deadline.remaining() == 0.0 and deadline.expired())
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check("rank")
+        deadline.expire("rank")
+        deadline.expire("snippet")
+        self.assertTrue(deadline.exceeded == ["rank", "snippet"])
+        self.assertTrue(getMetrics().deadlinesExceeded["rank"] == 1)
+        self.assertTrue('search_deadline_exceeded_total{stage="snippet"} 1' in getMetrics().render())
+
+    """
+    Test that a hung call is given up on when the deadline passes.
+    """
+    def test_call_within(self):
+        self.assertTrue(callWithin(lambda: 1, Deadline(1.0), "rank") == 1)
+        self.assertTrue(callWithin(lambda: 2, None, "rank") == 2)
+        startTime = time.perf_counter()
+        with self.assertRaises(DeadlineExceeded):
+            callWithin(lambda: time.sleep(1.0), Deadline(0.1), "rank")
+        self.assertTrue(time.perf_counter() - startTime < 0.5)
+
+    """
+    Test that a ranking call cut short by the deadline is reported as such, not as an error.
+    """
+    def test_score_documents(self):
+        setRankingClient(HangingRankingClient(1.0))
+        try:
+            with self.assertNoLogs(level="ERROR"), self.assertRaises(DeadlineExceeded):
+                api.getDocumentScores("user1", "dcc", deadline=Deadline(0.1))
+        finally:
+            setRankingClient(None)
+
+    """
+    Test that fetches still outstanding at the deadline are abandoned.
+    """
+    def test_fetch(self):
+        def fetch(docID):
+            if docID == "slow":
+                time.sleep(1.0)
+            return {"_id": docID}
+        deadline = Deadline(0.2)
+        startTime = time.perf_counter()
+        documents, missed = fetchConcurrently(["a", "slow", "b"], fetch, documentTimeout=5.0, deadline=deadline)
+        self.assertTrue(time.perf_counter() - startTime < 0.6)
+        self.assertTrue([doc["_id"] for doc in documents] == ["a", "b"] and missed == ["slow"])
+        self.assertTrue(deadline.exceeded == ["fetch"])
+
+    """
+    Test that results built after the deadline keep their document but skip the snippet.
+    """
+    def test_snippet(self):
+        document = {"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "The DCC is open."}
+        self.assertTrue(api.resultFromDocument(document, ["dcc"], Deadline(5.0)).snippet)
+        deadline = Deadline(0.0)
+        result = api.resultFromDocument(document, ["dcc"], deadline)
+        self.assertTrue(result.docId == "doc_dcc" and result.snippet == "")
+        self.assertTrue(deadline.exceeded == ["snippet"])
+
+    """
+    Test that a query whose ranking call hangs is answered by its deadline, marked partial.
+    """
+    def test_process_query(self):
+        installDocuments([{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "The DCC.", "text_length": 8}])
+        setRankingClient(HangingRankingClient(1.0))
+        originalCache, api.resultCache = api.resultCache, ResultCache()
+        try:
+            ticketId = api.tickets.create()
+            startTime = time.perf_counter()
+            api.processQuery("user1", "where is the dcc", ticketId, deadline=Deadline(0.2))
+            self.assertTrue(time.perf_counter() - startTime < 0.8)
+            response = api.getQueryResult(ticketId, timeout=0)
+            self.assertTrue(response["status"] == "No Results" and response["partial"])
+            self.assertTrue(getMetrics().deadlinesExceeded["rank"] == 1)
+
+            setRankingClient(HangingRankingClient(0.0))
+            ticketId = api.tickets.create()
+            api.processQuery("user1", "where is the dcc", ticketId, deadline=Deadline(5.0))
+            response = api.getQueryResult(ticketId, timeout=0)
+            self.assertTrue(response["documents"][0]["_id"] == "doc_dcc" and "partial" not in response)
+
+            ticketId = api.tickets.create()
+            api.processQuery("user1", "where is the dcc", ticketId, deadline=Deadline(0.0))
+            self.assertTrue(api.getQueryResult(ticketId, timeout=0)["partial"])
+            self.assertTrue(getMetrics().deadlinesExceeded["queue"] == 1)
+        finally:
+            api.resultCache = originalCache
+            setRankingClient(None)
+            documentStore.closeClient()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import re
+import unittest
+import mongomock
+from src import documentStore
+from src.documentStore import getDocuments, getDocumentsMany, matchesConditions
+from src.documentCache import HotDocumentCache, ENTRY_OVERHEAD
+
+DOCUMENTS = [
+    {"_id": "doc_a", "url": "https://rpi.edu/a", "type": "txt", "text": "alpha", "text_length": 5},
+    {"_id": "doc_b", "url": "https://cs.rpi.edu/b", "type": "html", "text": "bravo", "text_length": 5},
+]
+
+"""
+A change stream that yields a fixed list of events, in place of collection.watch()
+"""
+class FakeChangeStream:
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+"""
+Unit Tests for the hot document cache in front of the Document Data Store
+"""
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        client = mongomock.MongoClient()
+        self.collection = client[documentStore.MONGO_DATABASE][documentStore.MONGO_COLLECTION]
+        self.collection.insert_many(DOCUMENTS)
+        documentStore.setClient(client)
+        self.cache = HotDocumentCache(maxBytes=10 * ENTRY_OVERHEAD)
+        documentStore.setDocumentCache(self.cache)
+
+    def tearDown(self):
+        documentStore.setDocumentCache(None)
+        documentStore.closeClient()
+
+    """
+    Test that a repeated lookup is answered without Mongo, and that callers get copies.
+    """
+    def test_hit(self):
+        getDocuments("doc_a")[0]["text"] = "changed by the caller"
+        self.collection.update_one({"_id": "doc_a"}, {"$set": {"title": "new"}})
+        document = getDocuments("doc_a")[0]
+        self.assertTrue(document["text"] == "alpha")
+        self.assertTrue("title" not in document)
+        self.assertTrue(self.cache.stats()["hits"] == 1)
+
+    """
+    Test that missing IDs are cached, but not lookups that a filter rejected.
+    """
+    def test_missing(self):
+        self.assertTrue(getDocuments("test_bad_id") == [])
+        self.collection.insert_one({"_id": "test_bad_id", "text": "late"})
+        self.assertTrue(getDocuments("test_bad_id") == [])
+        self.assertTrue(self.cache.stats()["missingHits"] == 1)
+
+        self.assertTrue(getDocuments("doc_b", conditions={"type": {"$in": ["pdf"]}}) == [])
+        self.assertTrue(len(getDocuments("doc_b")) == 1)
+
+    """
+    Test that cached documents are checked against mongoFilter() conditions.
+    """
+    def test_conditions(self):
+        getDocumentsMany(["doc_a", "doc_b"])
+        self.assertTrue(getDocuments("doc_a", conditions={"type": {"$nin": ["txt"]}}) == [])
+        conditions = {"url": {"$in": [re.compile(re.escape("cs.rpi"), re.IGNORECASE)]}}
+        self.assertTrue([doc["_id"] for doc in getDocumentsMany(["doc_a", "doc_b"], conditions=conditions)] == ["doc_b"])
+        self.assertTrue(self.cache.stats()["misses"] == 2)
+        self.assertTrue(matchesConditions(DOCUMENTS[0], {"text_length": {"$gt": 3}}) is None)
+
+    """
+    Test that truncated entries only answer lookups for as much text as they hold.
+    """
+    def test_truncated_text(self):
+        self.assertTrue(getDocuments("doc_a", maxTextChars=3)[0]["text"] == "alp")
+        self.assertTrue(getDocuments("doc_a", maxTextChars=2)[0]["text"] == "al")
+        self.assertTrue(getDocuments("doc_a")[0]["text"] == "alpha")
+        self.assertTrue(self.cache.stats()["hits"] == 1)
+        self.assertTrue(getDocuments("doc_a", maxTextChars=4)[0]["text"] == "alph")
+        self.assertTrue(self.cache.stats()["hits"] == 2)
+
+    """
+    Test that a batch lookup only fetches the IDs the cache cannot answer.
+    """
+    def test_batch(self):
+        getDocuments("doc_b")
+        documents = getDocumentsMany(["doc_b", "missing", "doc_a"])
+        self.assertTrue([doc["_id"] for doc in documents] == ["doc_b", "doc_a"])
+        self.assertTrue(self.cache.stats()["hits"] == 1)
+        self.assertTrue([doc["_id"] for doc in getDocumentsMany(["missing", "doc_a"])] == ["doc_a"])
+        self.assertTrue(self.cache.stats()["missingHits"] == 1)
+
+    """
+    Test that eviction keeps the total weight under maxBytes, least recently used first.
+    """
+    def test_eviction(self):
+        cache = HotDocumentCache(maxBytes=3 * ENTRY_OVERHEAD + 300)
+        for name in ("a", "b", "c"):
+            cache.put({"_id": name, "text": "x" * 100, "text_length": 100})
+        cache.lookup("a")
+        cache.put({"_id": "d", "text": "x" * 100})
+        self.assertTrue(cache.lookup("b") == (False, None))
+        self.assertTrue(cache.lookup("a")[0] and cache.lookup("d")[0])
+        self.assertTrue(cache.stats()["bytes"] <= cache.maxBytes)
+
+        cache.put({"_id": "huge", "text_length": cache.maxBytes})
+        self.assertTrue(cache.lookup("huge") == (False, None))
+        self.assertTrue(len(cache) == 3)
+
+    """
+    Test that entries expire.
+    """
+    def test_ttl(self):
+        now = [0.0]
+        cache = HotDocumentCache(ttl=10, missingTtl=1, clock=lambda: now[0])
+        cache.put({"_id": "a", "text": "alpha"})
+        cache.putMissing("b")
+        now[0] = 5
+        self.assertTrue(cache.lookup("a")[0])
+        self.assertTrue(cache.lookup("b") == (False, None))
+        now[0] = 10
+        self.assertTrue(cache.lookup("a") == (False, None))
+        self.assertTrue(cache.stats()["bytes"] == 0)
+
+    """
+    Test that change stream events invalidate entries.
+    """
+    def test_change_stream(self):
+        getDocumentsMany(["doc_a", "doc_b", "missing"])
+        self.cache.follow(FakeChangeStream([
+            {"operationType": "update", "documentKey": {"_id": "doc_a"}},
+            {"operationType": "insert", "documentKey": {"_id": "missing"}},
+        ]))
+        self.assertTrue(len(self.cache) == 1)
+        self.cache.follow(FakeChangeStream([{"operationType": "drop"}]))
+        self.assertTrue(len(self.cache) == 0)
+        self.assertTrue(self.cache.stats()["invalidations"] == 2)
+
+if __name__ == "__main__":
+    unittest.main()
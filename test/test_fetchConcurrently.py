@@ -0,0 +1,75 @@
+import time
+import unittest
+import unittest.mock
+from src import api
+from src.retrieval import fetchConcurrently
+
+# Fake Document Data Store lookup: a few IDs are slow, missing, or broken
+def fakeFetch(docID):
+    if docID == "slow":
+        time.sleep(1.0)
+    if docID == "missing":
+        return None
+    if docID == "broken":
+        raise RuntimeError("lookup failed")
+    return {"_id": docID}
+
+"""
+Unit Tests for concurrent document retrieval
+"""
+class TestFetchConcurrently(unittest.TestCase):
+    """
+    Test that documents come back in rank order and missing IDs are dropped.
+    """
+    def test_rank_order(self):
+        documents, missed = fetchConcurrently(["c", "missing", "a", "b"], fakeFetch)
+        self.assertTrue([doc["_id"] for doc in documents] == ["c", "a", "b"])
+        self.assertTrue(missed == [])
+
+    """
+    Test that fetches overlap instead of running back to back.
+    """
+    def test_concurrent(self):
+        def sleepyFetch(docID):
+            time.sleep(0.2)
+            return {"_id": docID}
+        startTime = time.perf_counter()
+        documents, missed = fetchConcurrently(["a", "b", "c", "d"], sleepyFetch)
+        self.assertTrue(len(documents) == 4)
+        self.assertTrue(time.perf_counter() - startTime < 0.6)
+
+    """
+    Test that a slow document is abandoned and the rest of the page is returned.
+    """
+    def test_partial_results(self):
+        startTime = time.perf_counter()
+        documents, missed = fetchConcurrently(["a", "slow", "b"], fakeFetch, documentTimeout=0.1)
+        self.assertTrue(time.perf_counter() - startTime < 0.8)
+        self.assertTrue([doc["_id"] for doc in documents] == ["a", "b"])
+        self.assertTrue(missed == ["slow"])
+
+    """
+    Test that a failing lookup is reported as missed rather than raised.
+    """
+    def test_error(self):
+        documents, missed = fetchConcurrently(["a", "broken"], fakeFetch)
+        self.assertTrue([doc["_id"] for doc in documents] == ["a"])
+        self.assertTrue(missed == ["broken"])
+
+    def test_empty(self):
+        self.assertTrue(fetchConcurrently([], fakeFetch) == ([], []))
+
+    """
+    Test that a page is fetched in batches and a slow batch only drops its documents.
+    """
+    def test_page_batches(self):
+        def fetchMany(docIDs, structuredQuery=None, maxTextChars=None):
+            return [document for document in map(fakeFetch, docIDs) if document]
+        with unittest.mock.patch("src.api.fetchDocumentsMany", side_effect=fetchMany) as fetch, \
+                unittest.mock.patch("src.api.FETCH_BATCH_SIZE", 2):
+            documents, missed = api.retrieveDocuments(["a", "b", "c", "slow", "d"], documentTimeout=0.1)
+        self.assertTrue(fetch.call_count == 3)
+        self.assertTrue([doc["_id"] for doc in documents] == ["a", "b", "d"] and missed == ["c", "slow"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from src.snippetEngine import generatePassage, generateSnippet, countMatches
+from src.api import parseSearchQuery
+
+FILLER = " ".join(f"filler{i}" for i in range(40))
+
+"""
+Unit Tests for windowed passage snippets
+"""
+class TestPassageGeneration(unittest.TestCase):
+    """
+    Test that matched terms are highlighted and the passage keeps its punctuation.
+    """
+    def test_highlight(self):
+        text = "The DCC is next to the Union."
+        self.assertTrue(generatePassage(text, parseSearchQuery("dcc union")) ==
+                        "The <b>DCC</b> is next to the <b>Union</b>.")
+        self.assertTrue(generatePassage(text, parseSearchQuery("dcc"), highlight=None) == text)
+
+    """
+    Test that the window covering the most distinct query terms wins over a window with
+    more repetitions of one term.
+    """
+    def test_distinct_terms(self):
+        text = f"library library library. {FILLER} The library opens at noon. {FILLER}"
+        passage = generatePassage(text, parseSearchQuery("library noon"), windowSize=10)
+        self.assertTrue("<b>noon</b>" in passage)
+        self.assertTrue(passage.startswith("... ") and passage.endswith(" ..."))
+        self.assertTrue(len(passage.split()) <= 12)
+
+    """
+    Test that stemmed forms match and that text is HTML-escaped around highlights.
+    """
+    def test_stemming_and_escaping(self):
+        passage = generatePassage("<i>Fishermen</i> went fishing & swimming", parseSearchQuery("fish"))
+        self.assertTrue(passage == "&lt;i&gt;Fishermen&lt;/i&gt; went <b>fishing</b> &amp; swimming")
+
+    def test_no_match(self):
+        self.assertTrue(generatePassage("This is really short!", parseSearchQuery("dinosaur")) == "")
+        self.assertTrue(generatePassage("", parseSearchQuery("dinosaur")) == "")
+        self.assertTrue(generatePassage("some text", []) == "")
+        self.assertTrue(generatePassage(None, None) == "")
+
+    """
+    Test that only the scan budget of a long document is searched.
+    """
+    def test_scan_budget(self):
+        text = f"{FILLER}. The query word is here."
+        self.assertTrue(generateSnippet(text, parseSearchQuery("query"), maxScanChars=50) == "")
+        self.assertTrue(generatePassage(text, parseSearchQuery("query"), maxScanChars=50) == "")
+        self.assertTrue(generateSnippet(text, parseSearchQuery("query")) == "The query word is here.")
+
+    """
+    Test that repeated query terms count once per occurrence in the query, as before.
+    """
+    def test_count_matches(self):
+        self.assertTrue(countMatches(["fish", "fish", "pond"], {"fish": 2}) == 4)
+
+if __name__ == "__main__":
+    unittest.main()
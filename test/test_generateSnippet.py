@@ -2,7 +2,8 @@ import unittest
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
-from src.api import generateSnippet, parseSearchQuery
+from src.api import parseSearchQuery
+from src.snippetEngine import generateSnippet
 
 # Function to convert string into tokenized query for testing
 def tokenize(query):
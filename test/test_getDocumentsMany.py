@@ -0,0 +1,65 @@
+import unittest
+from src import documentStore
+from src.documentStore import getDocuments, getDocumentsMany
+from pipelineFixtures import installDocuments
+
+DOCUMENTS = [
+    {"_id": "doc_a", "url": "https://rpi.edu/a", "type": "txt", "text": "alpha", "text_length": 5},
+    {"_id": "doc_b", "url": "https://rpi.edu/b", "type": "html", "text": "bravo", "text_length": 5},
+    {"_id": "doc_c", "url": "https://rpi.edu/c", "type": "txt", "text": "", "text_length": 0},
+]
+
+"""
+Unit Tests for the Document Data Store layer, run against mongomock
+"""
+class TestGetDocumentsMany(unittest.TestCase):
+    def setUp(self):
+        installDocuments(DOCUMENTS)
+
+    def tearDown(self):
+        documentStore.closeClient()
+
+    """
+    Test that a single lookup filters on _id server-side and keeps the old list shape.
+    """
+    def test_single(self):
+        document = getDocuments("doc_b")
+        self.assertTrue(len(document) == 1)
+        self.assertTrue(document[0]["_id"] == "doc_b")
+        self.assertTrue(document[0]["type"] == "html")
+        self.assertTrue(getDocuments("id_that_doesnt_match_anything") == [])
+
+    """
+    Test that a batch lookup preserves rank order and skips missing IDs.
+    """
+    def test_rank_order(self):
+        documents = getDocumentsMany(["doc_c", "missing", "doc_a", "doc_b"])
+        self.assertTrue([doc["_id"] for doc in documents] == ["doc_c", "doc_a", "doc_b"])
+        self.assertTrue(getDocumentsMany([]) == [])
+
+    """
+    Test that the projection limits the returned fields.
+    """
+    def test_projection(self):
+        documents = getDocumentsMany(["doc_a"], fields=["url"])
+        self.assertTrue(set(documents[0].keys()) == {"_id", "url"})
+
+    """
+    Test that text is cut to maxTextChars, by the server when it supports $substrCP
+    and after the fetch otherwise (mongomock).
+    """
+    def test_max_text_chars(self):
+        self.assertTrue(documentStore.buildProjection(["url", "text"], 3) ==
+                        {"url": 1, "text": {"$substrCP": ["$text", 0, 3]}})
+        self.assertTrue(getDocuments("doc_a", maxTextChars=3)[0]["text"] == "alp")
+        self.assertTrue([doc["text"] for doc in getDocumentsMany(["doc_b", "doc_c"], maxTextChars=2)] == ["br", ""])
+        self.assertTrue(getDocuments("doc_a")[0]["text"] == "alpha")
+
+    """
+    Test that every lookup reuses the same client.
+    """
+    def test_shared_client(self):
+        self.assertTrue(documentStore.getClient() is documentStore.getClient())
+
+if __name__ == "__main__":
+    unittest.main()
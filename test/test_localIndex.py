@@ -0,0 +1,117 @@
+import os
+import time
+import tempfile
+import unittest
+import unittest.mock
+import mongomock
+from src import api
+from src.api import parseSearchQuery, generateQueries, rankQuery
+from src.localIndex import LocalIndex, setLocalIndex, hedge
+from src.rankingClient import ScoredDocument, setRankingClient
+from src.resultCache import ResultCache
+
+TEXTS = {
+    "doc_dcc": "The DCC is the Darrin Communications Center. Lectures in the DCC start at eight.",
+    "doc_union": "The Union hosts clubs and a food court. Walk from the Union to the DCC.",
+    "doc_library": "Folsom Library is open late during finals.",
+}
+
+def buildIndex():
+    return LocalIndex.fromTokens((docId, parseSearchQuery(text)) for docId, text in TEXTS.items())
+
+# Ranking client stand-in that answers after a delay, or fails
+class SlowRankingClient:
+    def __init__(self, delay, fail=False):
+        self.delay = delay
+        self.fail = fail
+
+    def getDocumentScores(self, userId, query):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("ranking service is down")
+        return [ScoredDocument("doc_remote", 1.0)]
+
+    def close(self):
+        pass
+
+"""
+Unit Tests for the local BM25 fallback index
+"""
+class TestLocalIndex(unittest.TestCase):
+    """
+    Test that AND queries need every term and that BM25 prefers the denser document.
+    """
+    def test_search(self):
+        index = buildIndex()
+        scores = index.search(generateQueries(parseSearchQuery("DCC")))
+        self.assertTrue([scored.docId for scored in scores] == ["doc_dcc", "doc_union"])
+        self.assertTrue(scores[0].score > scores[1].score > 0)
+
+        self.assertTrue(index.search(generateQueries(parseSearchQuery("Union DCC")))[0].docId == "doc_union")
+        self.assertTrue(index.search(generateQueries(parseSearchQuery("DCC library"))) == [])
+        self.assertTrue(index.search(generateQueries([])) == [])
+
+        union = index.search({"operation": "OR", "terms": parseSearchQuery("DCC library")})
+        self.assertTrue({scored.docId for scored in union} == set(TEXTS))
+        self.assertTrue(len(index.search(generateQueries(["dcc"]), limit=1)) == 1)
+
+    """
+    Test that a saved index is memory-mapped back with the same results.
+    """
+    def test_save_load(self):
+        index = buildIndex()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "localIndex.bin")
+            index.save(path)
+            loaded = LocalIndex.load(path)
+            try:
+                for query in ["DCC", "union dcc", "library finals", "missing"]:
+                    structuredQuery = generateQueries(parseSearchQuery(query))
+                    self.assertTrue(loaded.search(structuredQuery) == index.search(structuredQuery))
+            finally:
+                loaded.close()
+
+    """
+    Test that building from a collection normalizes text like parseSearchQuery.
+    """
+    def test_build(self):
+        collection = mongomock.MongoClient().test.RAW
+        collection.insert_many([{"_id": docId, "text": text} for docId, text in TEXTS.items()])
+        index = LocalIndex.build(collection, batchSize=2)
+        self.assertTrue(sorted(index.docIds) == sorted(TEXTS))
+        self.assertTrue(index.search(generateQueries(["librari"]))[0].docId == "doc_library")
+
+    """
+    Test that the local index answers when the primary is late or fails.
+    """
+    def test_hedge(self):
+        self.assertTrue(hedge(lambda: "remote", lambda: "local", deadline=1.0) == ("remote", True))
+        self.assertTrue(hedge(lambda: time.sleep(0.5), lambda: "local", deadline=0.05) == ("local", False))
+        self.assertTrue(hedge(lambda: 1 / 0, lambda: "local", deadline=1.0) == ("local", False))
+
+    """
+    Test that a late ranking service falls back to the local index and the fallback
+    ranking is not cached.
+    """
+    def test_rankQuery_fallback(self):
+        originalCache, api.resultCache = api.resultCache, ResultCache()
+        setLocalIndex(buildIndex())
+        try:
+            setRankingClient(SlowRankingClient(delay=0.5))
+            with unittest.mock.patch("src.localIndex.RANKING_DEADLINE", 0.05):
+                self.assertTrue(rankQuery("user1", ["dcc"]) == ["doc_dcc", "doc_union"])
+            self.assertTrue(api.resultCache.rankings.get("dcc") is None)
+
+            setRankingClient(SlowRankingClient(delay=0, fail=True))
+            self.assertTrue(rankQuery("user1", ["dcc"]) == ["doc_dcc", "doc_union"])
+
+            setRankingClient(SlowRankingClient(delay=0))
+            self.assertTrue(rankQuery("user1", ["dcc"]) == ["doc_remote"])
+            self.assertTrue(api.resultCache.rankings.get("dcc") == ["doc_remote"])
+        finally:
+            setLocalIndex(None)
+            setRankingClient(None)
+            api.resultCache = originalCache
+
+if __name__ == "__main__":
+    unittest.main()
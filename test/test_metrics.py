@@ -0,0 +1,98 @@
+import time
+import unittest
+import unittest.mock
+from fastapi.testclient import TestClient
+from src import api
+from src.metrics import Histogram, MetricsRegistry, Trace, setMetrics, getMetrics, setSlowQueryHook
+from src.workerPool import QueryWorkerPool
+from pipelineFixtures import PipelineTestCase
+
+"""
+Unit Tests for latency metrics and tracing
+"""
+class TestMetrics(PipelineTestCase):
+    documents = [{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "The DCC.", "text_length": 8}]
+
+    def setUp(self):
+        super().setUp()
+        setMetrics(MetricsRegistry())
+
+    def tearDown(self):
+        setMetrics(None)
+        setSlowQueryHook(None)
+        super().tearDown()
+
+    """
+    Test that quantiles fall in the right bucket.
+    """
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertTrue(histogram.quantile(0.5) == 0.0)
+        for _ in range(90):
+            histogram.observe(0.001)
+        for _ in range(10):
+            histogram.observe(0.1)
+        self.assertTrue(0.0007 < histogram.quantile(0.5) <= 0.0012)
+        self.assertTrue(0.07 < histogram.quantile(0.99) <= 0.12)
+        self.assertTrue(histogram.count == 100 and abs(histogram.sum - 1.09) < 1e-9)
+
+    """
+    Test that traces record their stages and pass slow queries to the hook.
+    """
+    def test_trace(self):
+        slow = []
+        setSlowQueryHook(lambda trace, seconds: slow.append((trace.name, seconds)))
+        trace = Trace("fast")
+        with trace.span("parse"):
+            pass
+        trace.finish()
+        self.assertTrue(list(trace.stages) == ["parse"] and slow == [])
+
+        with unittest.mock.patch("src.metrics.SLOW_QUERY_SECONDS", 0.0):
+            Trace("slow").finish()
+        self.assertTrue(slow[0][0] == "slow")
+        summary = getMetrics().summary()
+        self.assertTrue(summary["parse"]["count"] == 1 and summary["total"]["count"] == 2)
+
+    """
+    Test that a profiled slow query carries stack samples.
+    """
+    def test_profiler(self):
+        slow = []
+        setSlowQueryHook(lambda trace, seconds: slow.append(trace))
+        with unittest.mock.patch("src.metrics.PROFILE_SLOW_QUERIES", True), \
+                unittest.mock.patch("src.metrics.SLOW_QUERY_SECONDS", 0.0):
+            trace = Trace("profiled")
+            time.sleep(0.1)
+            trace.finish()
+        self.assertTrue(sum(slow[0].samples.values()) > 0)
+        self.assertTrue(any("test_profiler" in stack for stack in slow[0].samples))
+
+    def test_queue_wait(self):
+        pool = QueryWorkerPool(numWorkers=1)
+        pool.submit("user1", ())
+        pool.start(lambda: None)
+        pool.shutdown()
+        self.assertTrue(getMetrics().summary()["queue"]["count"] == 1)
+
+    """
+    Test that /metrics exposes the stages of a search in the Prometheus text format.
+    """
+    def test_endpoint(self):
+        testClient = TestClient(api.api)
+        testClient.get("/search", params={"q": "dcc"})
+        response = testClient.get("/metrics")
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        for stage in ["parse", "rank", "mongo", "snippet", "serialize", "total"]:
+            self.assertTrue(f'search_stage_seconds_count{{stage="{stage}"}}' in response.text)
+        self.assertTrue('search_stage_seconds_bucket{stage="total",le="+Inf"} 1' in response.text)
+        self.assertTrue('search_stage_quantile_seconds{stage="parse",quantile="0.99"}' in response.text)
+        self.assertTrue("search_queue_queueDepth 0" in response.text)
+        self.assertTrue("# TYPE search_queue_accepted_total counter" in response.text)
+        self.assertTrue("# TYPE search_admission_accepted_total counter\nsearch_admission_accepted_total" in response.text)
+        self.assertTrue("# TYPE search_retrieval_calls_executed_total counter" in response.text)
+        self.assertTrue("# TYPE search_retrieval_calls_inFlight gauge" in response.text)
+        self.assertTrue("# TYPE search_cache_rankings_hit_rate gauge" in response.text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import time
+import unittest
+import unittest.mock
+from fastapi.testclient import TestClient
+from src import api
+from src.pagination import Page, resolvePage, encodeCursor, decodeCursor, pageInfo, MAX_PAGE_SIZE
+from src.resultCache import ResultCache
+from pipelineFixtures import PipelineTestCase
+
+# The last five are PDFs and the last three have no "entry", so filtered queries only
+# match documents ranked below the first page
+DOCUMENTS = [{"_id": f"doc_{rank:02d}", "url": f"https://rpi.edu/{rank}", "title": f"DCC {rank}",
+              "type": "pdf" if rank >= 20 else "html",
+              "text": f"The DCC, {'archive' if rank >= 22 else 'entry'} {rank}.", "text_length": 20}
+             for rank in range(25)]
+
+def waitForCache(key, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if api.resultCache.documents.get(key) is not None:
+            return True
+        time.sleep(0.01)
+    return False
+
+"""
+Unit Tests for paginated search
+"""
+class TestPagination(PipelineTestCase):
+    documents = DOCUMENTS
+
+    """
+    Test that page numbers, sizes and cursors resolve to offsets.
+    """
+    def test_resolve_page(self):
+        self.assertTrue(resolvePage("dcc") == Page("dcc", 0, 10))
+        self.assertTrue(resolvePage("dcc", 3, 5) == Page("dcc", 10, 5))
+        self.assertTrue(resolvePage("dcc", 0, 10 ** 6) == Page("dcc", 0, MAX_PAGE_SIZE))
+        page = Page("Where is \"DCC\"?", 20, 10)
+        self.assertTrue(decodeCursor(encodeCursor(page)) == page)
+        self.assertTrue(resolvePage("ignored", 1, 5, cursor=encodeCursor(page)) == page)
+        for cursor in ["garbage", encodeCursor(Page("dcc", -1, 10)), encodeCursor(Page("dcc", 0, 0))]:
+            with self.assertRaises(ValueError):
+                decodeCursor(cursor)
+
+    def test_page_info(self):
+        info = pageInfo(Page("dcc", 10, 10), 25)
+        self.assertTrue(info["page"] == 2 and info["total"] == 25)
+        self.assertTrue(decodeCursor(info["nextCursor"]) == Page("dcc", 20, 10))
+        self.assertTrue(pageInfo(Page("dcc", 20, 10), 25)["nextCursor"] is None)
+
+    """
+    Test that only the requested slice is fetched and that the ranking is capped.
+    """
+    def test_execute_query(self):
+        with unittest.mock.patch("src.api.retrieveDocuments", wraps=api.retrieveDocuments) as fetch, \
+                unittest.mock.patch("src.api.PREFETCH_NEXT_PAGE", False):
+            documents = api.executeQuery("user1", resolvePage("dcc", 2, 10))[0]
+            self.assertTrue([document["_id"] for document in documents] == [f"doc_{rank:02d}" for rank in range(10, 20)])
+            self.assertTrue(fetch.call_args[0][0] == [f"doc_{rank:02d}" for rank in range(10, 20)])
+            self.assertTrue(api.executeQuery("user1", resolvePage("dcc", 4, 10))[0] == [])
+
+        with unittest.mock.patch("src.api.MAX_RESULTS", 5):
+            api.resultCache = ResultCache()
+            self.assertTrue(api.executeQuery("user1", Page("dcc", 0, 10))[1] == 5)
+
+    """
+    Test that filters and NOT clauses apply before paging, so the first page is full of
+    matches and the total counts only them.
+    """
+    def test_filtered_query(self):
+        documents, total = api.executeQuery("user1", resolvePage("dcc type:pdf", 1, 3))
+        self.assertTrue([document.docId for document in documents] == ["doc_20", "doc_21", "doc_22"] and total == 5)
+        documents, total = api.executeQuery("user1", resolvePage("dcc type:pdf", 2, 3))
+        self.assertTrue([document.docId for document in documents] == ["doc_23", "doc_24"] and total == 5)
+        documents, total = api.executeQuery("user1", resolvePage("dcc -entry", 1, 10))
+        self.assertTrue([document.docId for document in documents] == ["doc_22", "doc_23", "doc_24"] and total == 3)
+
+        client = TestClient(api.api)
+        lines = [json.loads(line) for line in client.get("/search", params={"q": "dcc type:pdf", "pageSize": 3}).text.splitlines()]
+        self.assertTrue(lines[0]["total"] == 5 and [line["_id"] for line in lines[1:]] == ["doc_20", "doc_21", "doc_22"])
+        lines = [json.loads(line) for line in client.get("/search", params={"cursor": lines[0]["nextCursor"]}).text.splitlines()]
+        self.assertTrue([line["_id"] for line in lines[1:]] == ["doc_23", "doc_24"] and lines[0]["nextCursor"] is None)
+
+    """
+    Test that a NOT clause is checked against the ranking only as far as the page
+    reaches, with bounded text, and that the next page carries on from there.
+    """
+    def test_lazy_filter(self):
+        with unittest.mock.patch("src.api.getDocumentsMany", wraps=api.getDocumentsMany) as getDocuments, \
+                unittest.mock.patch("src.api.PREFETCH_NEXT_PAGE", False):
+            documents, total = api.executeQuery("user1", resolvePage("dcc -archive", 1, 3))
+            self.assertTrue([document.docId for document in documents] == ["doc_00", "doc_01", "doc_02"])
+            filterCall = getDocuments.call_args_list[0]
+            self.assertTrue(total == 25 and filterCall[0][0] == ["doc_00", "doc_01", "doc_02", "doc_03"])
+            self.assertTrue(filterCall[1]["maxTextChars"] == api.SNIPPET_SCAN_CHARS)
+            getDocuments.reset_mock()
+            documents, total = api.executeQuery("user1", resolvePage("dcc -archive", 2, 3))
+            self.assertTrue([document.docId for document in documents] == ["doc_03", "doc_04", "doc_05"])
+            self.assertTrue(getDocuments.call_args_list[0][0][0] == ["doc_04", "doc_05", "doc_06"])
+
+    """
+    Test that serving a page prefetches the next one into the document cache.
+    """
+    def test_prefetch(self):
+        api.executeQuery("user1", resolvePage("dcc", 1, 10))
+        self.assertTrue(waitForCache("dcc#10+10"))
+        secondPage = [f"doc_{rank:02d}" for rank in range(10, 20)]
+        with unittest.mock.patch("src.api.retrieveDocuments", return_value=([], [])) as fetch:
+            documents = api.executeQuery("user1", resolvePage("dcc", 2, 10))[0]
+            self.assertTrue([document["_id"] for document in documents] == secondPage)
+            self.assertTrue(all(call[0][0] != secondPage for call in fetch.call_args_list))
+
+    """
+    Test that /search follows nextCursor to the last page and rejects bad cursors.
+    """
+    def test_search_cursor(self):
+        client = TestClient(api.api)
+        params = {"q": "dcc", "pageSize": 10}
+        seen = []
+        while True:
+            lines = [json.loads(line) for line in client.get("/search", params=params).text.splitlines()]
+            self.assertTrue(lines[0]["total"] == 25)
+            seen += [line["_id"] for line in lines[1:]]
+            if lines[0]["nextCursor"] is None:
+                break
+            params = {"cursor": lines[0]["nextCursor"]}
+        self.assertTrue(seen == [document["_id"] for document in DOCUMENTS])
+        self.assertTrue(client.get("/search", params={"cursor": "garbage"}).status_code == 400)
+
+if __name__ == "__main__":
+    unittest.main()
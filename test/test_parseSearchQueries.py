@@ -0,0 +1,92 @@
+import random
+import unittest
+from src import queryNormalizer
+from src.queryNormalizer import getNormalizer
+from src.api import parseSearchQuery, parseSearchQueries
+
+# The queries of test_parseSearchQuery.py, plus contractions and punctuation edge cases
+QUERIES = [
+    "Document will describe marketing strategies carried out by U.S. companies for their agricultural "
+    "chemicals, report predictions for market share of such chemicals, or report market statistics for "
+    "agrochemicals, pesticide, herbicide, fungicide, insecticide, fertilizer, predicted sales, market share, "
+    "stimulate demand, price cut, volume of sales",
+    "Apple is looking at buying U.K. startup for $1 billion",
+    "Let's go to N.Y.!",
+    "fish fishes fishing fisherman fish pond phishing",
+    "call or even same anyway eight except being thereafter yourself done used",
+    "to be or not to be",
+    "Hey! This is a random sentence that probably has some stop words inside it, but I'm not sure. Hopefully you can check?",
+    "Bank of Australia",
+    "",
+    "dinosaur", "Professor", "Europe", "the", "a", "I'll", "doesn't",
+    "hello", "HeLLo WorLd", "To be, or not to be",
+    "C++ programming guide: variables & pointers (2024)!",
+    "there are fishies in the pond",
+    "\"exact phrase search\"",
+    "   cat and dog   ",
+    "I cannot believe it's gonna rain, 1,000 times... 'tis true",
+    "Dr. Smith's office -- room 3.5: (see e.g. the map).",
+    "dogs' toys, cats'' toys ,, done: 12:30 end.\"",
+    "(--b's'.", "a's'.?YX,", "Hello world. This is it.", "gonna'tis'tis",
+]
+
+# Building blocks for random text: words that the Treebank rules treat specially, and
+# the punctuation that decides where sentences end
+FUZZ_WORDS = ["a", "b", "YX", "Dr", "U.S", "e.g", "it's", "don't", "gonna", "cannot", "b's'",
+              "3.5", "12:30", "1,000", "'tis", "dogs'"]
+FUZZ_PUNCTUATION = [" ", " ", " ", ". ", ".", ", ", ": ", "? ", "! ", " (", ") ", " \"", "\" ", " '",
+                    "' ", " -- ", "...", ";", "'s ", ".'", ".)"]
+
+"""
+Unit Tests for batched query parsing
+"""
+class TestParseSearchQueries(unittest.TestCase):
+    """
+    Test that batch parsing matches parseSearchQuery token for token.
+    """
+    def test_matches_parseSearchQuery(self):
+        self.assertTrue(parseSearchQueries(QUERIES) == [parseSearchQuery(query) for query in QUERIES])
+        normalizer = getNormalizer()
+        for query in QUERIES:
+            self.assertTrue(normalizer.fastTokenize(query) == normalizer.tokenize(query))
+
+    """
+    Test that fastTokenize matches tokenize on random mixes of words and punctuation.
+    """
+    def test_fastTokenize_random(self):
+        normalizer = getNormalizer()
+        rng = random.Random(0)
+        for _ in range(3000):
+            text = "".join(rng.choice(FUZZ_WORDS) if rng.random() < 0.6 else rng.choice(FUZZ_PUNCTUATION)
+                           for _ in range(rng.randint(1, 8)))
+            self.assertTrue(normalizer.fastTokenize(text) == normalizer.tokenize(text), text)
+
+    """
+    Test that duplicates are parsed once but each gets its own list.
+    """
+    def test_duplicates(self):
+        tokenized = parseSearchQueries(["fishing pond", "Where is DCC?", "fishing pond"])
+        self.assertTrue(tokenized == [["fish", "pond"], ["dcc"], ["fish", "pond"]])
+        self.assertTrue(tokenized[0] is not tokenized[2])
+        self.assertTrue(parseSearchQueries([]) == [])
+
+    """
+    Test that a query that cannot be parsed yields no tokens without failing the batch.
+    """
+    def test_bad_query(self):
+        self.assertTrue(parseSearchQueries(["dinosaur", None]) == [["dinosaur"], []])
+
+    """
+    Test that the process pool returns the same tokens in the same order.
+    """
+    def test_processes(self):
+        original = queryNormalizer.PARALLEL_MIN_BATCH
+        queryNormalizer.PARALLEL_MIN_BATCH = 1
+        try:
+            queries = QUERIES * 3
+            self.assertTrue(parseSearchQueries(queries, processes=2) == parseSearchQueries(queries))
+        finally:
+            queryNormalizer.PARALLEL_MIN_BATCH = original
+
+if __name__ == "__main__":
+    unittest.main()
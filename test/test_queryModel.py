@@ -0,0 +1,94 @@
+import json
+import unittest
+from fastapi.testclient import TestClient
+from src import api
+from src.pagination import resolvePage
+from src.api import parseSearchQuery, cacheKey
+from src.queryModel import parseQuery, queryTerms, queryKey, mongoFilter, matchesDocument
+from src.localIndex import LocalIndex
+from pipelineFixtures import PipelineTestCase
+
+DOCUMENTS = [
+    {"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "title": "DCC", "type": "html",
+     "text": "The DCC has large lecture halls.", "text_length": 32},
+    {"_id": "doc_union", "url": "https://rpi.edu/union", "title": "Union", "type": "html",
+     "text": "The Union has a food court and lecture rooms.", "text_length": 45},
+    {"_id": "doc_map", "url": "https://rpi.edu/map.pdf", "title": "Campus Map", "type": "pdf",
+     "text": "Map of lecture halls: DCC, Union, Sage.", "text_length": 39},
+]
+
+"""
+Unit Tests for the structured query model
+"""
+class TestQueryModel(PipelineTestCase):
+    documents = DOCUMENTS
+
+    """
+    Test that queries without operators parse exactly like parseSearchQuery.
+    """
+    def test_plain(self):
+        for query in ["Where is DCC?", "To be, or not to be", "C++ programming guide: variables & pointers (2024)!",
+                      "e-mail", ""]:
+            structuredQuery = parseQuery(query)
+            self.assertTrue(structuredQuery == {"operation": "AND", "terms": parseSearchQuery(query)})
+            self.assertTrue(queryKey(structuredQuery) == cacheKey(parseSearchQuery(query)))
+
+    """
+    Test that phrases, OR, NOT and fields parse into a tree.
+    """
+    def test_operators(self):
+        structuredQuery = parseQuery('"lecture halls" dcc OR union -food NOT sage type:html -url:map')
+        self.assertTrue(structuredQuery["terms"] == [
+            {"operation": "PHRASE", "terms": ["lectur", "hall"], "words": ["lectur", "hall"]},
+            {"operation": "OR", "terms": ["dcc", "union"]},
+            {"operation": "NOT", "terms": ["food"]},
+            {"operation": "NOT", "terms": ["sage"]},
+        ])
+        self.assertTrue(structuredQuery["filters"] == [{"field": "type", "value": "html", "negate": False},
+                                                       {"field": "url", "value": "map", "negate": True}])
+        self.assertTrue(queryTerms(structuredQuery) == ["lectur", "hall", "dcc", "union"])
+        self.assertTrue(queryKey(structuredQuery) == '"lectur hall" (dcc OR union) -food -sage type:"html" -url:"map"')
+        self.assertTrue(parseQuery('"exact phrase search"')["terms"][0]["operation"] == "PHRASE")
+        self.assertTrue(parseQuery('"the"') == {"operation": "AND", "terms": []})
+
+    def test_mongo_filter(self):
+        conditions = mongoFilter(parseQuery("dcc type:HTML type:pdf -url:map"))
+        self.assertTrue(conditions["type"] == {"$in": ["html", "pdf"]})
+        self.assertTrue(conditions["url"]["$nin"][0].search("https://rpi.edu/MAP.pdf"))
+        self.assertTrue(mongoFilter(parseQuery("dcc")) == {})
+
+    """
+    Test phrase and NOT checks against document text.
+    """
+    def test_matches_document(self):
+        self.assertTrue(matchesDocument(parseQuery('"lecture halls"'), DOCUMENTS[0]))
+        self.assertTrue(not matchesDocument(parseQuery('"halls lecture"'), DOCUMENTS[0]))
+        self.assertTrue(not matchesDocument(parseQuery("lecture -food"), DOCUMENTS[1]))
+        self.assertTrue(matchesDocument(parseQuery("sage OR food -dcc"), DOCUMENTS[1]))
+
+    """
+    Test that the local index evaluates query trees.
+    """
+    def test_local_index(self):
+        index = LocalIndex.fromTokens((document["_id"], parseSearchQuery(document["text"])) for document in DOCUMENTS)
+        search = lambda query: sorted(scored.docId for scored in index.search(parseQuery(query)))
+        self.assertTrue(search("lecture -union") == ["doc_dcc"])
+        self.assertTrue(search("food OR sage") == ["doc_map", "doc_union"])
+        self.assertTrue(search('"lecture halls" -sage') == ["doc_dcc"])
+        self.assertTrue(search("-lecture") == [])
+        self.assertTrue(search("dinosaur OR lecture -dinosaur") == ["doc_dcc", "doc_map", "doc_union"])
+        self.assertTrue(search("dinosaur lecture -food") == [])
+
+    """
+    Test that /search applies field filters and phrases to the ranked documents.
+    """
+    def test_search(self):
+        searchIds = lambda query: [json.loads(line).get("_id") for line in
+                                   TestClient(api.api).get("/search", params={"q": query}).text.splitlines()][1:]
+        self.assertTrue(searchIds("lecture type:html") == ["doc_dcc", "doc_union"])
+        self.assertTrue(searchIds('"lecture halls" -url:pdf') == ["doc_dcc"])
+        self.assertTrue(searchIds("lecture -dcc") == ["doc_union"])
+        self.assertTrue([document["_id"] for document in api.executeQuery("user1", resolvePage("lecture type:pdf"))[0]] == ["doc_map"])
+
+if __name__ == "__main__":
+    unittest.main()
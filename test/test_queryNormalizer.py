@@ -0,0 +1,47 @@
+import unittest
+from src.queryNormalizer import QueryNormalizer, getNormalizer
+from src.api import parseSearchQuery
+from src.snippetEngine import generateSnippet
+
+"""
+Unit Tests for the shared QueryNormalizer
+"""
+class TestQueryNormalizer(unittest.TestCase):
+    """
+    Test that query normalization removes punctuation and stop words and stems.
+    """
+    def test_normalize(self):
+        normalizer = QueryNormalizer()
+        self.assertTrue(normalizer.normalize("there are fishies in the pond") == ["fishi", "pond"])
+        self.assertTrue(normalizer.normalize("   cat and dog   ") == ["cat", "dog"])
+        self.assertTrue(normalizer.normalize("") == [])
+
+    """
+    Test that document text keeps stop words but is stemmed the same way as queries.
+    """
+    def test_normalize_text(self):
+        normalizer = QueryNormalizer()
+        self.assertTrue(normalizer.normalizeText("The fishes swam.") == ["the", "fish", "swam"])
+        self.assertTrue(normalizer.normalize("fishes")[0] == normalizer.normalizeText("fishes")[0])
+
+    """
+    Test that repeated words are served from the stem cache.
+    """
+    def test_stem_cache(self):
+        normalizer = QueryNormalizer(stemCacheSize=2)
+        normalizer.normalize("fishing fishing fishing")
+        self.assertTrue(normalizer.cacheInfo().hits == 2)
+        self.assertTrue(normalizer.cacheInfo().misses == 1)
+        normalizer.normalize("alpha bravo charlie")
+        self.assertTrue(normalizer.cacheInfo().currsize == 2)
+
+    """
+    Test that query parsing and snippet generation share one normalizer.
+    """
+    def test_shared(self):
+        self.assertTrue(getNormalizer() is getNormalizer())
+        text = "Fishermen were fishing. The pond is quiet."
+        self.assertTrue(generateSnippet(text, parseSearchQuery("fished")) == "Fishermen were fishing.")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from src.rankingClient import RankingClient, ScoredDocument, parseScores
+
+# Local stand-in for the Index/Ranking service
+class StubRankingHandler(BaseHTTPRequestHandler):
+    requests = []
+    failuresLeft = 0
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        StubRankingHandler.requests.append(params)
+        if StubRankingHandler.failuresLeft > 0:
+            StubRankingHandler.failuresLeft -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        text = params.get("text", [""])[0]
+        body = [["doc_b", 0.5], ["doc_a", 2.0]] if text else []
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+"""
+Unit Tests for the Ranking API client, run against a local stub server
+"""
+class TestRankingClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubRankingHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = RankingClient(f"http://127.0.0.1:{cls.server.server_port}", backoff=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubRankingHandler.requests = []
+        StubRankingHandler.failuresLeft = 0
+
+    """
+    Test that scores are parsed into typed tuples, best first.
+    """
+    def test_get(self):
+        scores = self.client.getDocumentScores("user1", "rpi")
+        self.assertTrue(scores == [ScoredDocument("doc_a", 2.0), ScoredDocument("doc_b", 0.5)])
+        self.assertTrue(scores[0].docId == "doc_a")
+
+    """
+    Test that query text is URL-encoded rather than pasted into the URL.
+    """
+    def test_encoding(self):
+        self.client.getDocumentScores("user 1", "c++ & dcc?")
+        self.assertTrue(StubRankingHandler.requests[-1]["text"] == ["c++ & dcc?"])
+        self.assertTrue(StubRankingHandler.requests[-1]["id"] == ["user 1"])
+
+    def test_empty(self):
+        self.assertTrue(self.client.getDocumentScores("user1", "") == [])
+
+    """
+    Test that 5xx responses are retried.
+    """
+    def test_retry(self):
+        StubRankingHandler.failuresLeft = 2
+        self.assertTrue(len(self.client.getDocumentScores("user1", "rpi")) == 2)
+        self.assertTrue(len(StubRankingHandler.requests) == 3)
+
+    """
+    Test the payload shapes accepted from the ranking service.
+    """
+    def test_parse(self):
+        expected = [ScoredDocument("x", 3.0), ScoredDocument("y", 1.0)]
+        self.assertTrue(parseScores([["y", 1], ["x", 3]]) == expected)
+        self.assertTrue(parseScores([{"docId": "y", "score": 1}, {"_id": "x", "score": 3}]) == expected)
+        self.assertTrue(parseScores({"x": 3, "y": 1}) == expected)
+        self.assertTrue(parseScores({"results": [["x", 3], ["y", 1]]}) == expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,20 +1,135 @@
+import time
 import unittest
-from src.api import receiveQuery
+import unittest.mock
+from fastapi.testclient import TestClient
+from src import api
+from src.api import receiveQuery, getQueryResult
+from src.workerPool import QueryWorkerPool
+from src.tickets import TicketRegistry
+from pipelineFixtures import PipelineTestCase
+
+DOCUMENTS = [{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "DCC", "text_length": 3}]
 
 class TestReceiveQuery(unittest.TestCase):
     def test_retrieveQuery(self):
-        self.assertTrue(receiveQuery("hello", "user1") == True)
-        self.assertTrue(receiveQuery("hello world", "user2") == True)
-        self.assertTrue(receiveQuery("HelLo", "user1") == True)
-        self.assertTrue(receiveQuery("HeLLo WorLd", "user3") == True)
-        self.assertTrue(receiveQuery("to", "user4") == True)
-        self.assertTrue(receiveQuery("To be, or not to be", "user5") == True)
-        self.assertTrue(receiveQuery("C++ programming guide: variables & pointers (2024)!", "user5") == True)
-        self.assertTrue(receiveQuery("there are fishies in the pond", "user5") == True)
-        self.assertTrue(receiveQuery("\"exact phrase search\"", "user6") == True)
-        self.assertTrue(receiveQuery("", "user7") == True)
-        self.assertTrue(receiveQuery("a", "user8") == True)
-        self.assertTrue(receiveQuery("   cat and dog   ", "user8") == True)
+        self.assertTrue(receiveQuery("hello", "user1"))
+        self.assertTrue(receiveQuery("hello world", "user2"))
+        self.assertTrue(receiveQuery("HelLo", "user1"))
+        self.assertTrue(receiveQuery("HeLLo WorLd", "user3"))
+        self.assertFalse(receiveQuery("to", "user4"))
+        self.assertFalse(receiveQuery("To be, or not to be", "user5"))
+        self.assertTrue(receiveQuery("C++ programming guide: variables & pointers (2024)!", "user5"))
+        self.assertTrue(receiveQuery("there are fishies in the pond", "user5"))
+        self.assertTrue(receiveQuery("\"exact phrase search\"", "user6"))
+        self.assertFalse(receiveQuery("", "user7"))
+        self.assertFalse(receiveQuery("a", "user8"))
+        self.assertTrue(receiveQuery("   cat and dog   ", "user8"))
+
+    """
+    Test that every accepted query gets its own ticket.
+    """
+    def test_ticket(self):
+        first = receiveQuery("hello", "user1")
+        second = receiveQuery("hello", "user1")
+        self.assertTrue(isinstance(first, str))
+        self.assertTrue(first != second)
+
+"""
+Tests for collecting query results by ticket
+"""
+class TestQueryResults(PipelineTestCase):
+    documents = DOCUMENTS
+
+    def setUp(self):
+        super().setUp()
+        self.originalQueue, api.processingQueue = api.processingQueue, QueryWorkerPool(numWorkers=2)
+        api.processQueue()
+
+    def tearDown(self):
+        api.processingQueue.shutdown()
+        api.processingQueue = self.originalQueue
+        super().tearDown()
+
+    """
+    Test that the worker's response is delivered to the caller's ticket.
+    """
+    def test_get_result(self):
+        ticketId = receiveQuery("Where is DCC?", "user1")
+        response = getQueryResult(ticketId, timeout=5)
+        self.assertTrue(response["status"] == "Success")
+        self.assertTrue(response["documents"][0]["_id"] == "doc_dcc")
+
+    def test_unknown_ticket(self):
+        with self.assertRaises(KeyError):
+            getQueryResult("not_a_ticket", timeout=0)
+
+    """
+    Test that uncollected tickets are forgotten after their TTL.
+    """
+    def test_ticket_expiry(self):
+        now = [0.0]
+        registry = TicketRegistry(ttl=10, clock=lambda: now[0])
+        ticketId = registry.create()
+        registry.resolve(ticketId, {"status": "Success"})
+        self.assertTrue(registry.result(ticketId, 0) == {"status": "Success"})
+        now[0] = 11.0
+        with self.assertRaises(KeyError):
+            registry.result(ticketId, 0)
+
+    """
+    Test the polling endpoint, including long polling with wait.
+    """
+    def test_polling_endpoint(self):
+        client = TestClient(api.api)
+        ticketId = receiveQuery("Where is DCC?", "user1")
+        response = client.get(f"/results/{ticketId}", params={"wait": 5}).json()
+        self.assertTrue(response["status"] == "Success")
+        self.assertTrue(client.get("/results/not_a_ticket").status_code == 404)
+        self.assertTrue(client.get(f"/results/{ticketId}", params={"wait": -1}).status_code == 400)
+
+    """
+    Test that long polling waits at most MAX_RESULT_WAIT.
+    """
+    def test_polling_wait_limit(self):
+        client = TestClient(api.api)
+        ticketId = api.tickets.create()
+        try:
+            with unittest.mock.patch("src.api.MAX_RESULT_WAIT", 0.1):
+                startTime = time.perf_counter()
+                response = client.get(f"/results/{ticketId}", params={"wait": 3600}).json()
+            self.assertTrue(response == {"status": "Pending"} and time.perf_counter() - startTime < 1.0)
+        finally:
+            api.tickets.discard(ticketId)
+
+"""
+Tests for submitting queries over HTTP
+"""
+class TestQueryEndpoint(PipelineTestCase):
+    documents = DOCUMENTS
+
+    def setUp(self):
+        super().setUp()
+        self.originalQueue, api.processingQueue = api.processingQueue, QueryWorkerPool(numWorkers=2)
+
+    def tearDown(self):
+        api.processingQueue.shutdown()
+        api.processingQueue = self.originalQueue
+        super().tearDown()
+
+    """
+    Test that the app starts the workers, that a posted query's ticket is answered, and
+    that the workers stop with the app.
+    """
+    def test_post_query(self):
+        with TestClient(api.api) as client:
+            self.assertTrue(len(api.processingQueue.workers) == 2)
+            response = client.post("/queries", json={"query": "Where is DCC?", "userId": "user1"})
+            self.assertTrue(response.status_code == 202)
+            result = client.get(f"/results/{response.json()['ticketId']}", params={"wait": 5}).json()
+            self.assertTrue(result["status"] == "Success" and result["documents"][0]["_id"] == "doc_dcc")
+            self.assertTrue(client.post("/queries", json={"query": "to be"}).status_code == 400)
+            self.assertTrue(client.post("/queries", json={"query": "dcc", "cursor": "garbage"}).status_code == 400)
+        self.assertTrue(api.processingQueue.workers == [])
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
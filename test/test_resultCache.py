@@ -0,0 +1,96 @@
+import unittest
+from src import api, documentStore
+from src.pagination import resolvePage
+from src.rankingClient import ScoredDocument, setRankingClient
+from src.resultCache import InMemoryBackend, ResultCache, cacheKey
+from pipelineFixtures import installDocuments
+
+# Ranking client stand-in that counts how often the ranking service is called
+class CountingRankingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def getDocumentScores(self, userId, query):
+        self.calls += 1
+        return [ScoredDocument("doc_dcc", 1.0)]
+
+    def close(self):
+        pass
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+"""
+Unit Tests for the query result cache
+"""
+class TestResultCache(unittest.TestCase):
+    """
+    Test that the least recently used entry is evicted first.
+    """
+    def test_lru(self):
+        backend = InMemoryBackend(maxEntries=2)
+        backend.set("a", 1, 60)
+        backend.set("b", 2, 60)
+        backend.get("a")
+        backend.set("c", 3, 60)
+        self.assertTrue(backend.get("b") is None)
+        self.assertTrue(backend.get("a") == 1)
+        self.assertTrue(backend.get("c") == 3)
+
+    """
+    Test that entries expire after their TTL.
+    """
+    def test_ttl(self):
+        clock = FakeClock()
+        backend = InMemoryBackend(clock=clock)
+        backend.set("a", 1, 10)
+        clock.now = 9.9
+        self.assertTrue(backend.get("a") == 1)
+        clock.now = 10.0
+        self.assertTrue(backend.get("a") is None)
+        self.assertTrue(len(backend) == 0)
+
+    def test_counters(self):
+        cache = ResultCache()
+        cache.rankings.get("dcc")
+        cache.rankings.set("dcc", ["doc_dcc"])
+        cache.rankings.get("dcc")
+        self.assertTrue(cache.stats()["rankings"] == {"hits": 1, "misses": 1, "hitRate": 0.5})
+
+    def test_rankings_only(self):
+        cache = ResultCache(cacheDocuments=False)
+        self.assertTrue(cache.documents is None)
+        self.assertTrue("documents" not in cache.stats())
+
+    """
+    Test that differently worded queries with the same tokens share one entry.
+    """
+    def test_normalized_key(self):
+        self.assertTrue(cacheKey(api.parseSearchQuery("Where is DCC?")) == cacheKey(api.parseSearchQuery("where dcc")))
+
+    """
+    Test that a repeated query skips the ranking service and the document store.
+    """
+    def test_execute_query(self):
+        installDocuments([{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "DCC", "text_length": 3}])
+        ranking = CountingRankingClient()
+        setRankingClient(ranking)
+        originalCache, api.resultCache = api.resultCache, ResultCache()
+        try:
+            first = api.executeQuery("user1", resolvePage("Where is DCC?"))[0]
+            second = api.executeQuery("user2", resolvePage("where dcc"))[0]
+            self.assertTrue(first == second)
+            self.assertTrue(first[0]["_id"] == "doc_dcc")
+            self.assertTrue(ranking.calls == 1)
+            self.assertTrue(api.resultCache.stats()["documents"]["hits"] == 1)
+        finally:
+            api.resultCache = originalCache
+            setRankingClient(None)
+            documentStore.closeClient()
+
+if __name__ == "__main__":
+    unittest.main()
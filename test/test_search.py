@@ -0,0 +1,93 @@
+import asyncio
+import json
+import unittest
+import unittest.mock
+from fastapi.testclient import TestClient
+from src import api, documentStore
+from pipelineFixtures import PipelineTestCase
+
+DOCUMENTS = [
+    {"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "title": "DCC", "type": "html",
+     "text": "Campus map. The DCC is next to the Union.", "text_length": 41},
+    {"_id": "doc_union", "url": "https://rpi.edu/union", "title": "Union", "type": "html",
+     "text": "The Union hosts clubs. Find the DCC across the street.", "text_length": 54},
+]
+
+def readLines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+"""
+Tests for the /search and /search/batch endpoints
+"""
+class TestSearch(PipelineTestCase):
+    documents = DOCUMENTS
+    # "dcc" matches both documents (and one that is gone), everything else matches nothing
+    rankedIds = ["doc_union", "missing", "doc_dcc"]
+    rankedTerms = {"dcc"}
+
+    def setUp(self):
+        super().setUp()
+        self.client = TestClient(api.api)
+
+    """
+    Test that results stream as NDJSON in rank order with snippets and without full text.
+    """
+    def test_search(self):
+        response = self.client.get("/search", params={"q": "Where is DCC?", "userId": "user1"})
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = readLines(response)
+        self.assertTrue(lines[0] == {"status": "Success", "query": "dcc", "page": 1, "pageSize": 10,
+                                     "total": 3, "nextCursor": None})
+        self.assertTrue([line["_id"] for line in lines[1:]] == ["doc_union", "doc_dcc"])
+        self.assertTrue(lines[1]["snippet"] == "The Union hosts clubs. Find the <b>DCC</b> across the street.")
+        self.assertTrue("text" not in lines[1])
+
+    """
+    Test that a page is fetched with one $in query per batch rather than one lookup per document.
+    """
+    def test_one_query_per_page(self):
+        with unittest.mock.patch("src.documentStore._find", wraps=documentStore._find) as find:
+            lines = readLines(self.client.get("/search", params={"q": "dcc"}))
+        self.assertTrue(len(lines) == 3)
+        self.assertTrue(find.call_count == 1)
+        self.assertTrue(find.call_args[0][0]["_id"] == {"$in": ["doc_union", "missing", "doc_dcc"]})
+
+    def test_no_results(self):
+        lines = readLines(self.client.get("/search", params={"q": "big chungus"}))
+        self.assertTrue(lines == [{"status": "No Results", "query": "big chungu", "page": 1, "pageSize": 10,
+                                   "total": 0, "nextCursor": None}])
+
+    """
+    Test that the batch endpoint answers every query and tags each line with its index.
+    """
+    def test_batch(self):
+        response = self.client.post("/search/batch", json={"queries": ["dcc", "big chungus"], "userId": "user1"})
+        lines = sorted(readLines(response), key=lambda line: line["index"])
+        self.assertTrue([line["status"] for line in lines] == ["Success", "No Results"])
+        self.assertTrue(len(lines[0]["documents"]) == 2)
+        self.assertTrue(lines[1]["documents"] == [])
+
+    """
+    Test that oversized batches are refused and that a batch runs a bounded number of
+    queries at once.
+    """
+    def test_batch_limits(self):
+        running, peak = [0], [0]
+
+        async def fakeSearch(query, userId=None, page=None):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            yield {"status": "No Results", "page": 1, "pageSize": 10, "total": 0, "nextCursor": None}
+
+        queries = [f"dcc {index}" for index in range(6)]
+        with unittest.mock.patch("src.api.MAX_BATCH_QUERIES", 5):
+            self.assertTrue(self.client.post("/search/batch", json={"queries": queries}).status_code == 413)
+        with unittest.mock.patch("src.api.BATCH_CONCURRENCY", 2), unittest.mock.patch("src.api.iterSearch", fakeSearch):
+            lines = readLines(self.client.post("/search/batch", json={"queries": queries}))
+        self.assertTrue(sorted(line["index"] for line in lines) == list(range(6)) and peak[0] == 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import unittest
+from src import api
+from src.pagination import resolvePage
+from src.searchResult import SearchResult
+from src.serialization import encodeJson
+from pipelineFixtures import PipelineTestCase
+
+LONG_TEXT = "Filler words about nothing. " * 40000 + "The DCC is at the end."
+
+"""
+Unit Tests for the compact result model
+"""
+class TestSearchResult(PipelineTestCase):
+    documents = [{"_id": "doc_large", "url": "https://rpi.edu/large", "title": "Large", "type": "html",
+                  "text": LONG_TEXT, "text_length": len(LONG_TEXT)}]
+
+    def test_result(self):
+        result = SearchResult.fromDocument({"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "title": "DCC",
+                                            "type": "html", "text": "The DCC."}, "The <b>DCC</b>.")
+        self.assertTrue(not hasattr(result, "__dict__"))
+        self.assertTrue(result.toDict() == {"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "title": "DCC",
+                                            "type": "html", "snippet": "The <b>DCC</b>."})
+        self.assertTrue(result["_id"] == "doc_dcc" and result.get("text") is None)
+        self.assertTrue(json.loads(encodeJson({"documents": [result]})) == {"documents": [result.toDict()]})
+
+    """
+    Test that queries on a large document keep and send only the result fields, and
+    that the text searched for the snippet is cut to SNIPPET_SCAN_CHARS.
+    """
+    def test_large_document(self):
+        results = api.executeQuery("user1", resolvePage("filler"))[0]
+        self.assertTrue(isinstance(results[0], SearchResult) and "<b>" in results[0].snippet)
+        self.assertTrue(api.resultCache.documents.get("filler#0+10") == results)
+        # The only mention of DCC is past the scanned prefix
+        self.assertTrue(api.executeQuery("user1", resolvePage("dcc"))[0][0].snippet == "")
+
+        response = api.sendDocuments(results)
+        self.assertTrue(set(response["documents"][0]) == {"_id", "url", "title", "type", "snippet"})
+
+if __name__ == "__main__":
+    unittest.main()
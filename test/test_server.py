@@ -0,0 +1,150 @@
+import gc
+import os
+import json
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+from src import api, documentStore, server
+from src.autocomplete import PrefixIndex, setAutocomplete
+from src.admission import AdmissionController
+from src.localIndex import setLocalIndex
+from src.queryNormalizer import getNormalizer
+from src.rankingClient import setRankingClient
+from src.sharedState import SharedState
+from src.tickets import TicketRegistry
+from src.workerPool import QueryWorkerPool
+from pipelineFixtures import FakeRankingClient, installDocuments
+
+# Worker body that reports what it sees of the parent's state through a pipe
+def reportWorker(index, writer, failOnce):
+    if failOnce is not None and index == 1 and not os.path.exists(failOnce):
+        open(failOnce, "w").close()
+        raise RuntimeError("worker crashed")
+    normalizer = getNormalizer()
+    message = {"index": index, "pid": os.getpid(), "normalizer": id(normalizer),
+               "stems": normalizer.stem.cache_info().currsize}
+    os.write(writer, (json.dumps(message) + "\n").encode())
+
+# Worker body that submits a query over HTTP and reports the answer to its ticket
+def ticketWorker(index, writer):
+    with TestClient(api.api) as client:
+        ticketId = client.post("/queries", json={"query": "Where is DCC?", "userId": "user1"}).json()["ticketId"]
+        response = client.get(f"/results/{ticketId}", params={"wait": 5}).json()
+    os.write(writer, (json.dumps(response) + "\n").encode())
+
+# Worker body for two workers sharing their state: worker 0 takes a query and passes its
+# ticket on, worker 1 collects the response and then uses up the user's rate limit
+def sharedWorker(index, shared, tickets, writer):
+    api.shareState(shared, index)
+    ticketReader, ticketWriter = tickets
+    with TestClient(api.api) as client:
+        if index == 0:
+            ticketId = client.post("/queries", json={"query": "Where is DCC?", "userId": "user1"}).json()["ticketId"]
+            os.write(ticketWriter, ticketId.encode())
+            message = {"index": index}
+        else:
+            ticketId = os.read(ticketReader, 32).decode()
+            response = client.get(f"/results/{ticketId}", params={"wait": 5}).json()
+            statuses = [client.post("/queries", json={"query": "DCC", "userId": "user1"}).status_code
+                        for _ in range(2)]
+            message = {"index": index, "response": response, "statuses": statuses}
+    os.write(writer, (json.dumps(message) + "\n").encode())
+
+"""
+Unit Tests for the pre-fork serving mode
+"""
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        index = PrefixIndex()
+        for phrase in ("library hours", "west hall dining", "union parking"):
+            index.add(phrase)
+        setAutocomplete(index)
+        setLocalIndex(None)
+
+    def tearDown(self):
+        gc.unfreeze()
+        setAutocomplete(None)
+        setLocalIndex(None)
+
+    """
+    Test that preloading builds the shared state and freezes it for copy-on-write.
+    """
+    def test_preload(self):
+        stats = server.preloadSharedState()
+        self.assertTrue(stats["phrases"] == 3 and stats["localIndex"] is False)
+        self.assertTrue(stats["stems"] >= 3 and stats["frozenObjects"] > 0)
+        self.assertTrue(getNormalizer().stem.cache_info().currsize >= 3)
+
+    """
+    Test that forked workers share the parent's preloaded objects and that a crashed
+    worker is replaced.
+    """
+    def test_workers(self):
+        server.preloadSharedState()
+        parentNormalizer = id(getNormalizer())
+        reader, writer = os.pipe()
+        with tempfile.TemporaryDirectory() as directory:
+            statuses = server.superviseWorkers(3, reportWorker, writer, os.path.join(directory, "failed"))
+        os.close(writer)
+        with os.fdopen(reader) as output:
+            messages = [json.loads(line) for line in output]
+
+        self.assertTrue(statuses == {0: 0, 1: 0, 2: 0})
+        self.assertTrue(sorted(message["index"] for message in messages) == [0, 1, 2])
+        self.assertTrue(len({message["pid"] for message in messages} | {os.getpid()}) == 4)
+        self.assertTrue(all(message["normalizer"] == parentNormalizer for message in messages))
+        self.assertTrue(all(message["stems"] >= 3 for message in messages))
+
+    """
+    Test that a forked worker starts its own query workers and answers a ticket.
+    """
+    def test_worker_tickets(self):
+        installDocuments([{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "DCC", "text_length": 3}])
+        setRankingClient(FakeRankingClient(["doc_dcc"]))
+        originalQueue, api.processingQueue = api.processingQueue, QueryWorkerPool(numWorkers=2)
+        try:
+            reader, writer = os.pipe()
+            statuses = server.superviseWorkers(1, ticketWorker, writer, restart=False)
+            os.close(writer)
+            with os.fdopen(reader) as output:
+                responses = [json.loads(line) for line in output]
+        finally:
+            api.processingQueue = originalQueue
+            setRankingClient(None)
+            documentStore.closeClient()
+
+        self.assertTrue(statuses == {0: 0} and len(responses) == 1)
+        self.assertTrue(responses[0]["status"] == "Success" and responses[0]["documents"][0]["_id"] == "doc_dcc")
+
+    """
+    Test that workers sharing their state answer each other's tickets and draw on one
+    rate limit per user.
+    """
+    def test_shared_workers(self):
+        installDocuments([{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "DCC", "text_length": 3}])
+        setRankingClient(FakeRankingClient(["doc_dcc"]))
+        originals = api.processingQueue, api.tickets, api.admission
+        api.processingQueue, api.tickets = QueryWorkerPool(numWorkers=2), TicketRegistry()
+        api.admission = AdmissionController(rate=0.001, burst=2)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                shared = SharedState(os.path.join(directory, "shared.db"))
+                tickets = os.pipe()
+                reader, writer = os.pipe()
+                statuses = server.superviseWorkers(2, sharedWorker, shared, tickets, writer, restart=False)
+                for fd in tickets + (writer,):
+                    os.close(fd)
+                with os.fdopen(reader) as output:
+                    messages = sorted((json.loads(line) for line in output), key=lambda message: message["index"])
+        finally:
+            api.processingQueue, api.tickets, api.admission = originals
+            setRankingClient(None)
+            documentStore.closeClient()
+
+        self.assertTrue(statuses == {0: 0, 1: 0} and len(messages) == 2)
+        response = messages[1]["response"]
+        self.assertTrue(response["status"] == "Success" and response["documents"][0]["_id"] == "doc_dcc")
+        self.assertTrue(messages[1]["statuses"] == [202, 429])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from src.admission import AdmissionController, RATE_LIMITED, SHED
+from src.sharedState import SharedState
+from src.tickets import TicketRegistry
+from src.workerPool import QueryWorkerPool
+
+"""
+Unit Tests for the state pre-forked workers share; each worker is played by its own
+registry or controller
+"""
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.shared = SharedState(os.path.join(self.directory.name, "shared.db"))
+        self.now = [0.0]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def registry(self):
+        registry = TicketRegistry(ttl=10, clock=lambda: self.now[0])
+        registry.share(self.shared)
+        return registry
+
+    def controller(self, worker, pool=None):
+        controller = AdmissionController(rate=1, burst=2, maxInFlight=5, clock=lambda: self.now[0])
+        controller.share(self.shared, worker, pool)
+        return controller
+
+    """
+    Test that a ticket created by one worker is collected from another.
+    """
+    def test_tickets(self):
+        owner, other = self.registry(), self.registry()
+        ticketId = owner.create()
+        with self.assertRaises(FutureTimeoutError):
+            other.result(ticketId, 0)
+        owner.resolve(ticketId, {"status": "Success", "documents": [{"_id": "doc_dcc"}]})
+        self.assertTrue(other.result(ticketId, 0) == {"status": "Success", "documents": [{"_id": "doc_dcc"}]})
+        self.assertTrue(asyncio.run(other.awaitResult(ticketId, 1)) == owner.result(ticketId, 0))
+
+        failedId = owner.create()
+        owner.fail(failedId, ValueError("ranking failed"))
+        with self.assertRaises(RuntimeError):
+            other.result(failedId, 0)
+        with self.assertRaises(KeyError):
+            other.result("unknown", 0)
+
+        discardedId = owner.create()
+        owner.discard(discardedId)
+        self.now[0] = 11
+        for expired in (ticketId, discardedId):
+            with self.assertRaises(KeyError):
+                other.result(expired, 0)
+
+    """
+    Test that a pending ticket from another worker is waited for, and times out.
+    """
+    def test_wait(self):
+        owner, other = TicketRegistry(ttl=10), TicketRegistry(ttl=10)
+        owner.share(self.shared)
+        other.share(self.shared)
+        ticketId = owner.create()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(other.awaitResult(ticketId, 0.05))
+
+        async def resolveLater():
+            await asyncio.sleep(0.05)
+            owner.resolve(ticketId, {"status": "No Results"})
+
+        async def waitAndResolve():
+            return (await asyncio.gather(other.awaitResult(ticketId, 1), resolveLater()))[0]
+
+        self.assertTrue(asyncio.run(waitAndResolve()) == {"status": "No Results"})
+
+    """
+    Test that workers draw on one bucket per user.
+    """
+    def test_rate_limit(self):
+        first, second = self.controller(0), self.controller(1)
+        self.assertTrue(first.admit("user1", "library") is None and second.admit("user1", "library") is None)
+        self.assertTrue(first.admit("user1", "library") == RATE_LIMITED)
+        self.assertTrue(second.retryAfter(RATE_LIMITED, "user1") == 1)
+        self.now[0] = 1
+        self.assertTrue(second.admit("user1", "library") is None)
+        self.assertTrue(first.admit("user1", "library") == RATE_LIMITED)
+
+    """
+    Test that queries in flight on any worker count towards MAX_IN_FLIGHT, and stop
+    counting when they finish.
+    """
+    def test_in_flight(self):
+        pool = QueryWorkerPool(numWorkers=1)
+        first, second = self.controller(0, pool), self.controller(1)
+        pool.onLoadChange = first.publish
+        for userId in ("user1", "user2", "user3"):
+            pool.submit(userId, (userId,))
+        second.begin(2)
+        self.assertTrue(second.admit(None, "library") == SHED)
+        pool.start(lambda userId: None)
+        self.assertTrue(pool.join(1))
+        self.assertTrue(second.admit(None, "library") is None)
+        second.end(2)
+        pool.shutdown()
+        self.assertTrue(self.shared.publishLoad(1, 0) == 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import time
+import threading
+import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from src import api, documentStore
+from src.singleFlight import SingleFlight
+from src.deadline import Deadline, DeadlineExceeded, flightWithin
+from src.rankingClient import ScoredDocument, setRankingClient
+from src.resultCache import ResultCache
+from src.workerPool import QueryWorkerPool
+from pipelineFixtures import installDocuments
+
+DOCUMENTS = [{"_id": "doc_dcc", "url": "https://rpi.edu/dcc", "text": "The DCC.", "text_length": 8}]
+
+# Ranking client stand-in that takes a while to answer and counts its calls
+class SlowRankingClient:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def getDocumentScores(self, userId, query):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return [ScoredDocument("doc_dcc", 1.0)]
+
+    def close(self):
+        pass
+
+"""
+Unit Tests for coalescing concurrent identical queries
+"""
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test that callers arriving during a call share its result or exception.
+    """
+    def test_do(self):
+        flights = SingleFlight()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.2)
+            return [value]
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: flights.do("key", slow, "a"), range(5)))
+        self.assertTrue(results == [["a"]] * 5 and calls == ["a"])
+        self.assertTrue(flights.stats() == {"executed": 1, "coalesced": 4, "inFlight": 0})
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("ranking service is down")
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(flights.do, "key", fail) for _ in range(3)]
+        for future in futures:
+            self.assertTrue(isinstance(future.exception(), ValueError))
+        self.assertTrue(flights.do("key", lambda: "again") == "again")
+
+    """
+    Test that callers sharing a call that ran out of time get its stages on their own
+    deadlines, whether it returned a cut-short result or raised.
+    """
+    def test_flight_within(self):
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def cutShort(value, deadline):
+            started.set()
+            time.sleep(0.2)
+            deadline.expire("fetch")
+            return [value]
+
+        leaderDeadline, followerDeadline = Deadline(0.1), Deadline(5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flightWithin, flights, "key", cutShort, ("a",), leaderDeadline, "fetch")
+            started.wait()
+            follower = pool.submit(flightWithin, flights, "key", cutShort, ("a",), followerDeadline, "fetch")
+        self.assertTrue(leader.result() == follower.result() == ["a"])
+        self.assertTrue(leaderDeadline.exceeded == followerDeadline.exceeded == ["fetch"])
+
+        def timesOut(deadline):
+            started.set()
+            time.sleep(0.2)
+            deadline.expire("rank")
+            raise DeadlineExceeded("rank")
+
+        started.clear()
+        followerDeadline = Deadline(5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flightWithin, flights, "key", timesOut, (), Deadline(0.1), "rank")
+            started.wait()
+            follower = pool.submit(flightWithin, flights, "key", timesOut, (), followerDeadline, "rank")
+        self.assertTrue(isinstance(follower.exception(), DeadlineExceeded))
+        self.assertTrue(followerDeadline.exceeded == ["rank"])
+
+    """
+    Test that identical queued queries from different users make one ranking call and
+    one fetch, and that every user's ticket gets the response.
+    """
+    def test_queue(self):
+        installDocuments(DOCUMENTS)
+        ranking = SlowRankingClient()
+        setRankingClient(ranking)
+        originalCache, api.resultCache = api.resultCache, ResultCache()
+        originalQueue, api.processingQueue = api.processingQueue, QueryWorkerPool(numWorkers=8)
+        originalFlights = api.rankingFlights, api.retrievalFlights
+        api.rankingFlights, api.retrievalFlights = SingleFlight(), SingleFlight()
+        api.processQueue()
+        try:
+            with unittest.mock.patch("src.api.retrieveDocuments", wraps=api.retrieveDocuments) as fetch:
+                ticketIds = [api.receiveQuery(query, f"user{i}") for i, query in
+                             enumerate(["Where is DCC?", "where dcc", "DCC", "dcc!"] * 2)]
+                responses = [api.getQueryResult(ticketId, timeout=5) for ticketId in ticketIds]
+            self.assertTrue(all(response["documents"][0]["_id"] == "doc_dcc" for response in responses))
+            self.assertTrue(ranking.calls == 1 and fetch.call_count == 1)
+            self.assertTrue(api.rankingFlights.stats()["executed"] == 1)
+            self.assertTrue(api.rankingFlights.stats()["coalesced"] == 7)
+        finally:
+            api.processingQueue.shutdown()
+            api.processingQueue = originalQueue
+            api.resultCache = originalCache
+            api.rankingFlights, api.retrievalFlights = originalFlights
+            setRankingClient(None)
+            documentStore.closeClient()
+
+    """
+    Test that /search shares the ranking call and the page fetch with a queued query.
+    """
+    def test_search(self):
+        installDocuments(DOCUMENTS)
+        ranking = SlowRankingClient()
+        setRankingClient(ranking)
+        originalCache, api.resultCache = api.resultCache, ResultCache()
+        originalQueue, api.processingQueue = api.processingQueue, QueryWorkerPool(numWorkers=2)
+        originalFlights = api.rankingFlights, api.retrievalFlights
+        api.rankingFlights, api.retrievalFlights = SingleFlight(), SingleFlight()
+        api.processQueue()
+        try:
+            with unittest.mock.patch("src.api.retrieveDocuments", wraps=api.retrieveDocuments) as fetch, \
+                    ThreadPoolExecutor(max_workers=1) as pool:
+                search = pool.submit(TestClient(api.api).get, "/search", params={"q": "where is the DCC"})
+                ticketId = api.receiveQuery("dcc", "user1")
+                response = api.getQueryResult(ticketId, timeout=5)
+                self.assertTrue('"_id":"doc_dcc"' in search.result().text.replace(" ", ""))
+            self.assertTrue(response["documents"][0]["_id"] == "doc_dcc")
+            self.assertTrue(ranking.calls == 1 and fetch.call_count == 1)
+        finally:
+            api.processingQueue.shutdown()
+            api.processingQueue = originalQueue
+            api.resultCache = originalCache
+            api.rankingFlights, api.retrievalFlights = originalFlights
+            setRankingClient(None)
+            documentStore.closeClient()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import mongomock
+from src.snippetIndex import SnippetIndex, buildSentenceIndex
+from src.snippetEngine import generatePassage, generateSnippet
+from src.api import parseSearchQuery
+
+TEXTS = [
+    "Here is a bunch of text. This is where you find the words from the query. Here is more text.",
+    "Here is a bunch of text. Here is more text. Here are some query words to find.",
+    "fish fishes fisherman. fisherman",
+    "This is really short!",
+    "",
+]
+
+"""
+Unit Tests for the precomputed snippet index
+"""
+class TestSnippetIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SnippetIndex(os.path.join(self.directory.name, "snippetIndex.db"))
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    """
+    Test that snippets from the index match snippets computed from the text.
+    """
+    def test_matches_engine(self):
+        for query in ["find the words from the query", "fish fish fisherman", "dinosaur", ""]:
+            tokens = parseSearchQuery(query)
+            for text in TEXTS:
+                entry = buildSentenceIndex(text)
+                self.assertTrue(entry.snippet(text, tokens) == generateSnippet(text, tokens))
+                self.assertTrue(entry.passage(text, tokens) == generatePassage(text, tokens))
+
+    """
+    Test that entries survive a round trip through the sidecar store.
+    """
+    def test_round_trip(self):
+        text = TEXTS[0]
+        self.index.put("doc_a", buildSentenceIndex(text))
+        entry = self.index.get("doc_a")
+        tokens = parseSearchQuery("query words")
+        self.assertTrue(entry.snippet(text, tokens) == "This is where you find the words from the query.")
+        self.assertTrue(self.index.get("missing") is None)
+
+    """
+    Test that an entry is ignored once the document's text_length changes.
+    """
+    def test_staleness(self):
+        document = {"_id": "doc_a", "text": TEXTS[0], "text_length": len(TEXTS[0])}
+        self.index.update(document)
+        self.assertTrue(self.index.lookup(document) is not None)
+        document["text"] = TEXTS[1]
+        document["text_length"] = len(TEXTS[1])
+        self.assertTrue(self.index.lookup(document) is None)
+
+    """
+    Test that backfill streams the collection in batches and skips up-to-date entries.
+    """
+    def test_backfill(self):
+        collection = mongomock.MongoClient().test.RAW
+        collection.insert_many([{"_id": f"doc{i}", "text": text, "text_length": len(text)}
+                                for i, text in enumerate(TEXTS)])
+        self.assertTrue(self.index.backfill(collection, batchSize=2) == {"scanned": 5, "built": 5, "skipped": 0})
+
+        collection.update_one({"_id": "doc3"}, {"$set": {"text": "Longer text now.", "text_length": 16}})
+        self.assertTrue(self.index.backfill(collection, batchSize=2) == {"scanned": 5, "built": 1, "skipped": 4})
+        self.assertTrue(self.index.backfill(collection, force=True)["built"] == 5)
+
+if __name__ == "__main__":
+    unittest.main()
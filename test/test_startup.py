@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+
+TEST_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Run a snippet in a fresh interpreter from the test/ directory and decode its JSON output
+def runFresh(code, env=None):
+    output = subprocess.run([sys.executable, "-c", code], cwd=TEST_DIRECTORY, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+"""
+Tests that importing the pipeline stays cheap
+"""
+class TestStartup(unittest.TestCase):
+    """
+    Test that importing src.api doesn't load the NLP, Mongo or HTTP backends.
+    """
+    def test_lazy_imports(self):
+        loaded = runFresh("import sys, json\n"
+                          "import src.api\n"
+                          "print(json.dumps([m for m in ('spacy', 'nltk', 'pymongo', 'requests') if m in sys.modules]))")
+        self.assertTrue(loaded == [])
+
+    """
+    Test that missing NLTK data is reported without touching the network.
+    """
+    def test_no_download_at_request_time(self):
+        with tempfile.TemporaryDirectory() as emptyDirectory:
+            result = runFresh("import json, nltk\n"
+                              f"nltk.data.path[:] = [{emptyDirectory!r}]\n"
+                              "def download(*args, **kwargs): raise AssertionError('download attempted')\n"
+                              "nltk.download = download\n"
+                              "from src.queryNormalizer import QueryNormalizer\n"
+                              "try:\n"
+                              "    QueryNormalizer()\n"
+                              "    print(json.dumps('loaded'))\n"
+                              "except LookupError as e:\n"
+                              "    print(json.dumps(str(e)))",
+                              env={**os.environ, "NLTK_DOWNLOAD": "0"})
+        self.assertTrue(result.startswith("Missing NLTK data: punkt_tab, stopwords"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import time
+import queue
+import unittest
+from src.workerPool import QueryWorkerPool
+
+"""
+Unit Tests for the query worker pool
+"""
+class TestQueryWorkerPool(unittest.TestCase):
+    """
+    Test that a user flooding the queue does not starve other users.
+    """
+    def test_fairness(self):
+        pool = QueryWorkerPool(numWorkers=1)
+        for i in range(5):
+            pool.submit("spammer", ("spammer", i))
+        pool.submit("user1", ("user1", 0))
+        pool.submit("user2", ("user2", 0))
+
+        order = []
+        pool.start(lambda userId, i: order.append(userId))
+        pool.shutdown()
+        self.assertTrue(order[:3] == ["spammer", "user1", "user2"])
+        self.assertTrue(len(order) == 7)
+
+    """
+    Test that submitting past total or per-user capacity is rejected.
+    """
+    def test_backpressure(self):
+        pool = QueryWorkerPool(maxQueueSize=3, maxPerUser=2)
+        pool.submit("user1", ("user1",))
+        pool.submit("user1", ("user1",))
+        with self.assertRaises(queue.Full):
+            pool.submit("user1", ("user1",))
+        pool.submit("user2", ("user2",))
+        with self.assertRaises(queue.Full):
+            pool.submit("user3", ("user3",))
+        self.assertTrue(pool.metrics()["rejected"] == 2)
+        self.assertTrue(pool.metrics()["queueDepth"] == 3)
+
+    """
+    Test that several workers process queries at the same time.
+    """
+    def test_concurrency(self):
+        pool = QueryWorkerPool(numWorkers=4)
+        pool.start(lambda i: time.sleep(0.2))
+        startTime = time.perf_counter()
+        for i in range(4):
+            pool.submit(f"user{i}", (i,))
+        self.assertTrue(pool.join(timeout=5))
+        self.assertTrue(time.perf_counter() - startTime < 0.6)
+        metrics = pool.metrics()
+        pool.shutdown()
+        self.assertTrue(metrics["completed"] == 4)
+        self.assertTrue(metrics["utilization"] > 0)
+
+    """
+    Test that shutdown drains queued work and then refuses new work.
+    """
+    def test_graceful_shutdown(self):
+        pool = QueryWorkerPool(numWorkers=2)
+        done = []
+        pool.start(lambda i: (time.sleep(0.05), done.append(i)))
+        for i in range(6):
+            pool.submit("user1", (i,))
+        pool.shutdown(drain=True)
+        self.assertTrue(sorted(done) == list(range(6)))
+        with self.assertRaises(queue.Full):
+            pool.submit("user1", (7,))
+
+    """
+    Test that a failing query does not kill its worker.
+    """
+    def test_handler_error(self):
+        pool = QueryWorkerPool(numWorkers=1)
+        seen = []
+        def handler(i):
+            if i == 0:
+                raise RuntimeError("ranking failed")
+            seen.append(i)
+        pool.start(handler)
+        pool.submit("user1", (0,))
+        pool.submit("user1", (1,))
+        pool.shutdown()
+        self.assertTrue(seen == [1])
+        self.assertTrue(pool.metrics()["failed"] == 1)
+
+if __name__ == "__main__":
+    unittest.main()